@@ -0,0 +1,116 @@
+"""
+Công cụ dòng lệnh cho các tác vụ quản trị (chạy trong thư mục backend)
+
+Ví dụ:
+    python -m app.cli export --format csv --output candidates.csv
+    python -m app.cli export --format ndjson --columns id,full_name,skills > candidates.ndjson
+    python -m app.cli storage-server
+"""
+import sys
+import asyncio
+import argparse
+import contextlib
+
+import yaml
+
+from app.services.vector_store import VectorStore
+from app.services.export import EXPORT_FORMATS, parse_columns, stream_export
+from app.services.storage import StorageServer, RemoteVectorStore
+from app.services.search_sessions import SearchSessions
+
+CONFIG_PATH = "./app/services/config.yaml"
+DB_PATH = "./data/chroma_db"
+
+
+def load_config() -> dict:
+    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def load_vector_store():
+    """
+    Vector store chỉ đọc cho lệnh chạy song song với server: storage.mode
+    remote đọc qua storage server (tiến trình ghi duy nhất), local mở
+    collection trực tiếp mà không chạy các bước khởi động có ghi
+    """
+    config = load_config()
+    storage_cfg = config.get("storage", {})
+
+    # Log khởi tạo ra stderr để stdout chỉ chứa dữ liệu export
+    with contextlib.redirect_stdout(sys.stderr):
+        if storage_cfg.get("mode", "local") == "remote":
+            return RemoteVectorStore(
+                socket_path=storage_cfg.get("socket_path", "./data/storage.sock"),
+                pool_size=1,
+                timeout=storage_cfg.get("connect_timeout", 120)
+            )
+        return VectorStore.open_read_only(db_path=DB_PATH, config=config.get("vector_store", {}))
+
+
+def cmd_export(args):
+    try:
+        vector_store = load_vector_store()
+    except ValueError as e:
+        print(f"❌ Chưa có collection ứng viên để export: {e}", file=sys.stderr)
+        sys.exit(1)
+    columns = parse_columns(args.columns)
+    rows = vector_store.iter_candidates(columns=columns, page_size=args.page_size)
+
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    count = -1 if args.format == "csv" else 0
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            for chunk in stream_export(rows, args.format, columns):
+                out.write(chunk)
+                count += 1
+    finally:
+        if args.output:
+            out.close()
+
+    print(f"✅ Đã export {count} ứng viên ({args.format})", file=sys.stderr)
+
+
+def cmd_storage_server(args):
+    config = load_config()
+    storage_cfg = config.get("storage", {})
+
+    vector_store = VectorStore(
+        db_path=DB_PATH,
+        config=config.get("vector_store", {}),
+        embedding_model=config.get("embedding", {}).get("model_name", "all-MiniLM-L6-v2")
+    )
+    server = StorageServer(
+        vector_store,
+        socket_path=args.socket or storage_cfg.get("socket_path", "./data/storage.sock"),
+        group_commit_ms=storage_cfg.get("group_commit_ms", 5),
+        max_batch=storage_cfg.get("max_batch", 64),
+        read_workers=storage_cfg.get("read_workers", 8),
+        search_sessions=SearchSessions(config.get("search_sessions", {}))
+    )
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        print("🛑 Storage server đã dừng")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="Export toàn bộ ứng viên dạng NDJSON / CSV")
+    export.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    export.add_argument("--columns", help="Danh sách cột, phân tách bằng dấu phẩy")
+    export.add_argument("--output", help="File đầu ra (mặc định: stdout)")
+    export.add_argument("--page-size", type=int, default=500)
+    export.set_defaults(func=cmd_export)
+
+    storage = sub.add_parser("storage-server", help="Tiến trình duy nhất sở hữu vector store (storage.mode: remote)")
+    storage.add_argument("--socket", help="Đường dẫn Unix socket (mặc định: storage.socket_path)")
+    storage.set_defaults(func=cmd_storage_server)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
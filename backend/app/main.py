@@ -1,21 +1,41 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response, FileResponse
 
 from typing import Optional, List
 from datetime import datetime
-import shutil
 import os
 import re
+import threading
+import functools
+import math
+from urllib.parse import quote
 
-from app.services.pdf_parser import parse_pdf
+from app.services.pdf_parser import extract_text_from_pdf
 from app.services.ai_engine import AIEngine
-from app.services.vector_store import VectorStore
+from app.services.vector_store import VectorStore, EmbeddingModelChanged, create_blob_store
+from app.services.blob_store import BlobStore
+from app.services.reindex import ReindexJob
+from app.services.section_index import SCORING_MODES, SectionIndexUnavailable
+from app.services.watchlists import WatchlistNotFound, WatchlistsUnavailable
+from app.services.storage import RemoteVectorStore, RemoteSearchSessions
+from app.services.concurrency import StagePool
+from app.services.cancellation import RequestDeadlines, CancellationMiddleware
+from app.services.search_cache import SearchCache, normalize_text, normalize_list
+from app.services.search_sessions import SearchSessions, InvalidCursor, SearchSessionExpired, read_page
+from app.services.reranker import Reranker
+from app.services.prescreen import ResumePrescreen, describe_reasons
+from app.services.metadata_columns import SORT_COLUMNS, GROUP_COLUMNS, parse_created_at
+from app.services.export import EXPORT_FORMATS, MEDIA_TYPES, parse_columns, stream_export
+from app.services import metrics
+from app.services.metrics import timed
+from app.services.profiling import RequestProfiler, ProfilingMiddleware
 
 from app.models.schemas import (
     UploadResponse, SearchRequest, SearchResponse,
     CandidateMatch, StatsResponse, ErrorResponse,
-    CandidateData
+    CandidateData, BatchSearchRequest, BatchSearchResponse,
+    BatchSearchResult
 )
 
 # ====================================================================
@@ -35,14 +55,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Dump"],
 )
 
+# Profile theo request (header X-Profile: <admin token>), bỏ qua khi tắt
+app.add_middleware(ProfilingMiddleware, get_profiler=lambda: profiler)
+
+# Hủy xử lý khi client ngắt kết nối hoặc quá deadline của route (block deadlines)
+app.add_middleware(CancellationMiddleware, get_deadlines=lambda: deadlines)
+
 # ====================================================================
 # GLOBAL SERVICES (Singleton)
 # ====================================================================
 
 ai_engine: Optional[AIEngine] = None
 vector_store: Optional[VectorStore] = None
+reranker: Optional[Reranker] = None
+reindex_job: Optional[ReindexJob] = None
+stages: Optional[StagePool] = None
+search_cache: Optional[SearchCache] = None
+search_sessions: Optional[SearchSessions] = None
+profiler: Optional[RequestProfiler] = None
+blob_store: Optional[BlobStore] = None
+prescreen: Optional[ResumePrescreen] = None
+deadlines: Optional[RequestDeadlines] = None
+
+SEARCH_MODES = ("vector", "hybrid", "lexical", "sections")
 
 
 @app.on_event("startup")
@@ -50,7 +88,7 @@ async def startup_event():
     """
     Khởi động hệ thống và load các service chung.
     """
-    global ai_engine, vector_store
+    global ai_engine, vector_store, reranker, reindex_job, stages, search_cache, profiler, blob_store, prescreen, deadlines, search_sessions
 
     print("=" * 60)
     print("🚀 LOCAL SMART ATS - BACKEND STARTING...")
@@ -62,7 +100,58 @@ async def startup_event():
 
     try:
         ai_engine = AIEngine(config_path="./app/services/config.yaml")
-        vector_store = VectorStore(db_path="./data/chroma_db")
+        storage_cfg = ai_engine.config.get("storage", {})
+        if storage_cfg.get("mode", "local") == "remote":
+            # Nhiều worker: storage process (python -m app.cli storage-server) giữ DB
+            vector_store = RemoteVectorStore(
+                socket_path=storage_cfg.get("socket_path", "./data/storage.sock"),
+                pool_size=storage_cfg.get("pool_size", 8),
+                timeout=storage_cfg.get("connect_timeout", 120)
+            )
+        else:
+            vector_store = VectorStore(
+                db_path="./data/chroma_db",
+                config=ai_engine.config.get("vector_store", {}),
+                embedding_model=ai_engine.embedding_model_name
+            )
+            reindex_job = ReindexJob(
+                vector_store,
+                ai_engine,
+                config=ai_engine.config.get("vector_store", {}).get("reindex", {})
+            )
+            if vector_store.sections is not None:
+                # Embed section cho ứng viên có từ trước khi bật section index (chạy nền)
+                threading.Thread(target=reindex_job.sync_sections, name="section-sync", daemon=True).start()
+        reranker = Reranker(ai_engine.config.get("rerank", {}))
+        # Lọc file không phải CV trước LLM (so embedding với CV mẫu bằng model trong config)
+        prescreen = ResumePrescreen(
+            ai_engine.config.get("prescreen", {}),
+            embed=lambda texts: ai_engine.create_embeddings(texts)
+        )
+        # File gốc ghi thẳng vào blob store (an toàn nhiều tiến trình), tham chiếu do vector store giữ
+        blob_store = create_blob_store(ai_engine.config.get("vector_store", {}).get("blobs", {}), "./data")
+        # Mỗi bước blocking (parse / LLM / embed / DB / file) chạy trên executor riêng
+        stages = StagePool(ai_engine.config.get("concurrency", {}))
+
+        cache_cfg = ai_engine.config.get("search_cache", {})
+        if cache_cfg.get("enabled", True):
+            search_cache = SearchCache(
+                max_entries=cache_cfg.get("max_entries", 512),
+                max_bytes=cache_cfg.get("max_bytes", 32 * 1024 * 1024)
+            )
+
+        # Phân trang sâu: lưu ranking + embedding của JD, trang sau không query lại;
+        # nhiều worker thì session nằm trong storage process (cursor đọc được ở mọi worker)
+        if isinstance(vector_store, RemoteVectorStore):
+            search_sessions = RemoteSearchSessions(vector_store, ai_engine.config.get("search_sessions", {}))
+        else:
+            search_sessions = SearchSessions(ai_engine.config.get("search_sessions", {}))
+
+        profiler = RequestProfiler(ai_engine.config.get("profiling", {}))
+        deadlines = RequestDeadlines(ai_engine.config.get("deadlines", {}))
+
+        # /metrics đọc độ sâu hàng đợi, cache và số ứng viên lúc scrape
+        metrics.bind(stages=stages, search_cache=search_cache, vector_store=vector_store, token_budget=ai_engine.token_budget)
 
         print("=" * 60)
         print("ALL SERVICES READY!")
@@ -73,6 +162,287 @@ async def startup_event():
         raise
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if stages is not None:
+        stages.shutdown()
+
+
+# ====================================================================
+# HELPERS
+# ====================================================================
+
+def build_candidate_matches(results: dict) -> List[CandidateMatch]:
+    """
+    Chuyển kết quả query (format Chroma, 1 query) thành danh sách CandidateMatch.
+    """
+    candidates = []
+    if results["ids"] and len(results["ids"][0]) > 0:
+        for i in range(len(results["ids"][0])):
+            if results.get("scores"):
+                similarity_score = results["scores"][0][i]
+            else:
+                similarity_score = 1 - results["distances"][0][i]
+            meta = results["metadatas"][0][i]
+
+            candidates.append(
+                CandidateMatch(
+                    id=results["ids"][0][i],
+                    score=round(similarity_score, 4),
+                    full_name=meta.get("full_name", "N/A"),
+                    email=meta.get("email", "N/A"),
+                    role=meta.get("role", "N/A"),
+                    years_exp=meta.get("years_exp", 0),
+                    skills=meta.get("skills_list", "").split(", ")
+                    if meta.get("skills_list")
+                    else [],
+                    education=[],
+                    projects=[],
+                    file_source=meta.get("file_source", ""),
+                    created_at=meta.get("created_at", ""),
+                    score_breakdown=results["score_breakdown"][0][i]
+                    if results.get("score_breakdown")
+                    else None,
+                    matched_section=results["matched_sections"][0][i]
+                    if results.get("matched_sections")
+                    else None
+                )
+            )
+
+    return candidates
+
+
+def parse_metadata_filters(
+    min_exp: Optional[int] = None,
+    max_exp: Optional[int] = None,
+    min_gpa: Optional[float] = None,
+    max_gpa: Optional[float] = None,
+    min_project_score: Optional[float] = None,
+    max_project_score: Optional[float] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    role: Optional[str] = None
+) -> Optional[dict]:
+    """
+    Tham số lọc của request -> bộ lọc của metadata cache (None nếu không lọc gì)
+
+    created_from / created_to: "YYYY-MM-DD" hoặc "YYYY-MM-DD HH:MM:SS";
+    created_to chỉ có ngày thì tính hết ngày đó. role: nhiều giá trị cách
+    nhau bởi dấu phẩy.
+    """
+    created = []
+    for value, end_of_day in ((created_from, False), (created_to, True)):
+        if not value:
+            created.append(None)
+            continue
+        epoch = parse_created_at(value)
+        if epoch < 0:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Ngày không hợp lệ: {value} (YYYY-MM-DD hoặc YYYY-MM-DD HH:MM:SS)"
+            )
+        created.append(epoch + 86399 if end_of_day and len(value.strip()) == 10 else epoch)
+
+    filters = {
+        "years_exp": [min_exp, max_exp],
+        "gpa": [min_gpa, max_gpa],
+        "project_score": [min_project_score, max_project_score],
+        "created_at": created,
+    }
+    filters = {column: bounds for column, bounds in filters.items() if bounds != [None, None]}
+
+    roles = [r.strip() for r in (role or "").split(",") if r.strip()]
+    if roles:
+        filters["role"] = roles
+
+    return filters or None
+
+
+def filter_results(results: dict, keep: List[bool]) -> dict:
+    """
+    Bỏ các ứng viên không đạt bộ lọc khỏi kết quả vector store ({key: [[...]]})
+    """
+    n = len(keep)
+    return {
+        key: [[item for item, ok in zip(value[0], keep) if ok]]
+        if isinstance(value, list) and value and isinstance(value[0], list) and len(value[0]) == n
+        else value
+        for key, value in results.items()
+    }
+
+
+def truncate_results(results: dict, n_results: int) -> dict:
+    return {
+        key: [value[0][:n_results]] if isinstance(value, list) and value and isinstance(value[0], list) else value
+        for key, value in results.items()
+    }
+
+
+async def fetch_ranking(
+    mode: str,
+    jd_text: str,
+    query_vector: Optional[List[float]],
+    n_results: int,
+    min_exp: int = 0,
+    skills_list: Optional[List[str]] = None,
+    partition_list: Optional[List[str]] = None,
+    section_scoring: Optional[str] = None,
+    use_rerank: bool = False,
+    filters: Optional[dict] = None,
+    report: Optional[dict] = None
+) -> List[CandidateMatch]:
+    """
+    Query vector store (theo mode) với embedding JD đã tính, rerank nếu bật
+
+    Args:
+        filters: Bộ lọc metadata cache (gpa, project_score, created_at, role).
+            Ít ứng viên khớp (<= `columns.allowlist_max`, mode vector): tính
+            cosine trực tiếp trên đúng các ứng viên đó. Còn lại: lấy dư theo
+            tỷ lệ ứng viên khớp * `columns.overfetch` (tối đa `columns.max_fetch`)
+            rồi lọc sau
+        report: Dict nhận "exhausted" (vector store đã trả hết ứng viên, tính
+            trước các bộ lọc sau) và "filter" (strategy, matched, fetched, truncated)
+
+    Returns:
+        List[CandidateMatch]: tối đa n_results ứng viên theo thứ tự xếp hạng
+    """
+    # Rerank: lấy dư kết quả từ vector store rồi xếp hạng lại bằng NumPy
+    n_fetch = reranker.fetch_size(n_results) if use_rerank else n_results
+
+    strategy = None
+    if filters:
+        columns_cfg = columns_config()
+        counts = await stages.run("search", vector_store.count_candidates, filters)
+        info = {"matched": counts["total"], "truncated": False}
+        if not counts["total"]:
+            strategy = "empty"
+        elif mode == "vector" and counts["total"] <= columns_cfg.get("allowlist_max", 5000):
+            strategy = "allowlist"
+        else:
+            # Cache biết trước bao nhiêu ứng viên khớp: lấy dư tỷ lệ nghịch với độ chọn lọc,
+            # có trần để bộ lọc quá chặt không biến thành một query ANN lấy cả collection
+            strategy = "post_filter"
+            wanted = min(
+                counts["population"],
+                math.ceil(n_fetch * columns_cfg.get("overfetch", 2) * counts["population"] / counts["total"])
+            )
+            n_fetch = min(wanted, max(columns_cfg.get("max_fetch", 1000), n_fetch))
+            info.update(fetched=n_fetch, truncated=n_fetch < wanted)
+        if report is not None:
+            report["filter"] = {"strategy": strategy, **info}
+        if strategy == "empty":
+            if report is not None:
+                report["exhausted"] = True
+            return []
+
+    if strategy == "allowlist":
+        results = await stages.run(
+            "search",
+            vector_store.search_allowlist,
+            query_embedding=query_vector,
+            filters=filters,
+            n_results=n_fetch,
+            min_exp=min_exp,
+            required_skills=skills_list,
+            partitions=partition_list
+        )
+    elif mode == "lexical":
+        results = await stages.run(
+            "search",
+            vector_store.lexical_search,
+            query_text=jd_text,
+            n_results=n_fetch,
+            min_exp=min_exp,
+            required_skills=skills_list,
+            partitions=partition_list
+        )
+    elif mode == "sections":
+        # So JD với từng section của CV, gom điểm theo ứng viên
+        results = await stages.run(
+            "search",
+            vector_store.section_search,
+            query_embedding=query_vector,
+            n_results=n_fetch,
+            min_exp=min_exp,
+            required_skills=skills_list,
+            scoring=section_scoring,
+            partitions=partition_list
+        )
+    elif mode == "hybrid":
+        results = await stages.run(
+            "search",
+            vector_store.hybrid_search,
+            query_text=jd_text,
+            query_embedding=query_vector,
+            n_results=n_fetch,
+            min_exp=min_exp,
+            required_skills=skills_list,
+            partitions=partition_list
+        )
+    else:
+        results = await stages.run(
+            "search",
+            vector_store.search_candidates,
+            query_embedding=query_vector,
+            n_results=n_fetch,
+            min_exp=min_exp,
+            required_skills=skills_list,
+            partitions=partition_list
+        )
+
+    if report is not None:
+        returned = len(results["ids"][0]) if results.get("ids") else 0
+        report["exhausted"] = results.get("exhausted", returned < n_fetch)
+
+    if strategy == "post_filter" and results.get("ids") and results["ids"][0]:
+        keep = await stages.run("search", vector_store.filter_ids, results["ids"][0], filters)
+        results = filter_results(results, keep)
+
+    if use_rerank:
+        results = reranker.rerank(results, n_results)
+    elif strategy == "post_filter":
+        results = truncate_results(results, n_results)
+
+    return build_candidate_matches(results)
+
+
+async def fetch_session_ranking(spec: dict, depth: int):
+    """
+    Lấy sâu hơn cho session phân trang theo tham số truy vấn đã lưu (spec)
+
+    Returns:
+        tuple: (ranking dạng dict, exhausted)
+    """
+    report = {}
+    matches = await fetch_ranking(n_results=depth, report=report, **spec)
+    return [match.dict() for match in matches], report["exhausted"]
+
+
+def columns_config() -> dict:
+    return ai_engine.config.get("vector_store", {}).get("columns", {})
+
+
+def sections_enabled() -> bool:
+    return bool(ai_engine.config.get("vector_store", {}).get("sections", {}).get("enabled", False))
+
+
+def embed_candidate(cv_data: dict, model: Optional[str], embedding_model: Optional[str]):
+    """
+    Embedding của ứng viên: semantic text và (khi bật section index) từng
+    section của CV, encode chung một batch nên chi phí gần bằng một lần embed
+
+    Returns:
+        tuple: (vector, sections) với sections = {"kinds", "embeddings"} hoặc None
+    """
+    sections = ai_engine.create_section_texts(cv_data) if sections_enabled() else []
+    texts = [ai_engine.create_semantic_text(cv_data)] + [text for _, text in sections]
+    embeddings = ai_engine.create_embeddings(texts, model=model, embedding_model=embedding_model)
+
+    if not sections:
+        return embeddings[0], None
+    return embeddings[0], {"kinds": [kind for kind, _ in sections], "embeddings": embeddings[1:]}
+
+
 # ====================================================================
 # ENDPOINTS
 # ====================================================================
@@ -93,9 +463,12 @@ async def root():
 @app.get("/api/stats", response_model=StatsResponse)
 async def get_stats():
     try:
-        stats = vector_store.get_stats()
+        stats = await stages.run("search", vector_store.get_stats)
         return stats
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -126,10 +499,15 @@ async def upload_cv(
                 detail=error_msg
             )
 
+    # Từ chối sớm khi hàng đợi LLM đã đầy, trước khi tốn công đọc PDF
+    stages["llm"].ensure_capacity()
+
     try:
-        # STEP 1 — Đọc PDF
+        # STEP 1 — Đọc PDF (process pool, không chặn event loop)
         print(f"📄 Đang xử lý file: {file.filename}")
-        raw_text = await parse_pdf(file)
+        content = await file.read()
+        with timed("pdf_parse"):
+            raw_text = await stages.run("parse", extract_text_from_pdf, content)
 
         if not raw_text or len(raw_text) < 50:
             raise HTTPException(
@@ -137,9 +515,24 @@ async def upload_cv(
                 detail="Không thể đọc nội dung từ PDF hoặc nội dung quá ngắn"
             )
 
+        # STEP 1.5 — Lọc nhanh: hóa đơn / thư / file scan bị từ chối trước khi tốn token LLM
+        screening = None
+        if prescreen.enabled:
+            with timed("prescreen"):
+                screening = await stages.run("embed", prescreen.evaluate, raw_text)
+            if screening["verdict"] == "reject":
+                raise HTTPException(
+                    status_code=400,
+                    detail=(
+                        f"File không giống CV (độ tin cậy {screening['confidence']:.2f}): "
+                        f"{describe_reasons(screening['reasons'])}"
+                    )
+                )
+
         # STEP 2 — AI trích xuất dữ liệu
         print("🤖 Đang trích xuất thông tin...")
-        extracted_data = ai_engine.extract_json_from_cv(raw_text, model=model)
+        with timed("llm_extract"):
+            extracted_data = await stages.run("llm", ai_engine.extract_json_from_cv, raw_text, model=model)
 
         # Lưu thông tin model đã dùng
         if model:
@@ -186,23 +579,52 @@ async def upload_cv(
 
         # STEP 3 — EMBEDDING
         print("🔢 Đang tạo vector embedding...")
-        semantic_text = ai_engine.create_semantic_text(extracted_data)
-        vector = ai_engine.create_embedding(semantic_text, model=model)
-
-        # STEP 4 — SAVE DB
-        print("💾 Đang lưu vào database...")
-        doc_id = vector_store.save_candidate(
-            cv_text=raw_text,
-            cv_data=extracted_data,
-            embedding=vector,
-            file_name=file.filename
+        # Dùng model của collection đang hoạt động (có thể khác config khi chưa re-index)
+        embedding_model = vector_store.embedding_model
+        vector, sections = await stages.run(
+            "embed", embed_candidate, extracted_data, model=model, embedding_model=embedding_model
         )
 
-        # Lưu file gốc
-        storage_path = f"./data/uploaded_cvs/{doc_id}_{file.filename}"
-        await file.seek(0)
-        with open(storage_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # STEP 4 — DEDUPE
+        with timed("dedupe_check"):
+            duplicate = await stages.run("search", vector_store.check_duplicate, raw_text, extracted_data, vector)
+
+        # STEP 5 — SAVE DB
+        # Lưu file gốc trước (blob theo SHA-256) để ứng viên tham chiếu tới nó
+        with timed("file_io"):
+            blob = await stages.run("io", blob_store.put, content)
+
+        print("💾 Đang lưu vào database...")
+        try:
+            doc_id = await stages.run(
+                "write",
+                vector_store.save_candidate,
+                cv_text=raw_text,
+                cv_data=extracted_data,
+                embedding=vector,
+                file_name=file.filename,
+                duplicate=duplicate,
+                embedding_model=embedding_model,
+                blob=blob,
+                sections=sections
+            )
+        except EmbeddingModelChanged as e:
+            # Re-index vừa chuyển collection -> embed lại bằng model mới
+            vector, sections = await stages.run(
+                "embed", embed_candidate, extracted_data, model=model, embedding_model=str(e)
+            )
+            doc_id = await stages.run(
+                "write",
+                vector_store.save_candidate,
+                cv_text=raw_text,
+                cv_data=extracted_data,
+                embedding=vector,
+                file_name=file.filename,
+                duplicate=duplicate,
+                embedding_model=str(e),
+                blob=blob,
+                sections=sections
+            )
 
         print(f"✅ Hoàn thành xử lý CV: {file.filename}")
 
@@ -216,11 +638,19 @@ async def upload_cv(
                 detail=f"Lỗi format dữ liệu trả về: {str(e)}"
             )
 
+        message = f"Đã xử lý thành công CV của {candidate_model.full_name}"
+        if duplicate:
+            message += f" (trùng với ứng viên {duplicate['matched_id']}, xử lý: {duplicate['action']})"
+        if screening and screening["verdict"] == "review":
+            message += f" (cần xem lại: {describe_reasons(screening['reasons'])})"
+
         return UploadResponse(
             status="success",
             id=doc_id,
             data=candidate_model,
-            message=f"Đã xử lý thành công CV của {candidate_model.full_name}"
+            message=message,
+            duplicate=duplicate,
+            prescreen=screening
         )
 
     except HTTPException:
@@ -243,9 +673,31 @@ async def search_candidates(
     min_exp: int = Form(0),
     top_k: int = Form(10),
     required_skills: Optional[str] = Form(None),
-    model: Optional[str] = Form(None)
+    model: Optional[str] = Form(None),
+    mode: str = Form("vector"),
+    rerank: Optional[bool] = Form(None),
+    partitions: Optional[str] = Form(None),
+    section_scoring: Optional[str] = Form(None),
+    paginate: bool = Form(False),
+    min_gpa: Optional[float] = Form(None),
+    min_project_score: Optional[float] = Form(None),
+    created_from: Optional[str] = Form(None),
+    created_to: Optional[str] = Form(None),
+    role: Optional[str] = Form(None)
 ):
     try:
+        if mode not in SEARCH_MODES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"mode không hợp lệ. Chỉ hỗ trợ: {', '.join(SEARCH_MODES)}"
+            )
+
+        if section_scoring and section_scoring not in SCORING_MODES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"section_scoring không hợp lệ. Chỉ hỗ trợ: {', '.join(SCORING_MODES)}"
+            )
+
         # Check if requested model is available
         if model:
             is_available, error_msg = ai_engine.is_model_available(model)
@@ -262,53 +714,122 @@ async def search_candidates(
                 s.strip() for s in required_skills.split(",") if s.strip()
             ]
 
-        print(f"🔍 Đang tìm kiếm với JD: {jd_text[:100]}...")
+        partition_list = None
+        if partitions:
+            partition_list = [
+                p.strip() for p in partitions.split(",") if p.strip()
+            ]
 
-        query_vector = ai_engine.create_embedding(jd_text, model=model)
+        if paginate and not search_sessions.enabled:
+            raise HTTPException(
+                status_code=400,
+                detail="Phân trang bằng cursor đang tắt (search_sessions.enabled)"
+            )
+        if paginate and not 1 <= top_k <= search_sessions.max_page_size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"top_k phải trong khoảng 1-{search_sessions.max_page_size} khi phân trang"
+            )
 
-        results = vector_store.search_candidates(
-            query_embedding=query_vector,
-            n_results=top_k,
-            min_exp=min_exp,
-            required_skills=skills_list
+        use_rerank = reranker.enabled if rerank is None else rerank
+
+        # Lọc theo metadata cache (min_exp vẫn đi qua where của vector store)
+        filters = parse_metadata_filters(
+            min_gpa=min_gpa, min_project_score=min_project_score,
+            created_from=created_from, created_to=created_to, role=role
         )
 
-        candidates = []
-        if results["ids"] and len(results["ids"][0]) > 0:
-            for i in range(len(results["ids"][0])):
-                similarity_score = 1 - results["distances"][0][i]
-                meta = results["metadatas"][0][i]
-
-                candidates.append(
-                    CandidateMatch(
-                        id=results["ids"][0][i],
-                        score=round(similarity_score, 4),
-                        full_name=meta.get("full_name", "N/A"),
-                        email=meta.get("email", "N/A"),
-                        role=meta.get("role", "N/A"),
-                        years_exp=meta.get("years_exp", 0),
-                        skills=meta.get("skills_list", "").split(", ")
-                        if meta.get("skills_list")
-                        else [],
-                        education=[],
-                        projects=[],
-                        file_source=meta.get("file_source", ""),
-                        created_at=meta.get("created_at", "")
-                    )
-                )
+        # Cache: đọc generation trước khi tính, ghi/xóa ứng viên sẽ làm entry hết hạn
+        # (bỏ qua khi phân trang: cursor trỏ vào session riêng của lần gọi này)
+        generation = vector_store.generation
+        cache_key = (
+            normalize_text(jd_text), min_exp, top_k, normalize_list(skills_list),
+            model or "", mode, use_rerank, normalize_list(partition_list),
+            vector_store.embedding_model, section_scoring or "",
+            repr(sorted((filters or {}).items()))
+        )
+        if search_cache is not None and not paginate:
+            cached = search_cache.get(cache_key, generation)
+            if cached is not None:
+                return cached.copy(update={"query_info": {**cached.query_info, "cache": "hit"}})
+
+        print(f"🔍 Đang tìm kiếm với JD: {jd_text[:100]}...")
+
+        query_vector = None
+        if mode != "lexical":
+            # BM25 thuần (lexical) không cần gọi embedder
+            query_vector = await stages.run(
+                "embed",
+                ai_engine.create_embedding,
+                jd_text,
+                model=model,
+                embedding_model=vector_store.embedding_model
+            )
+
+        # Tham số truy vấn (JSON được): session phân trang dùng lại để lấy sâu hơn
+        spec = {
+            "mode": mode,
+            "jd_text": jd_text,
+            "query_vector": [float(v) for v in query_vector] if query_vector is not None else None,
+            "min_exp": min_exp,
+            "skills_list": skills_list,
+            "partition_list": partition_list,
+            "section_scoring": section_scoring,
+            "use_rerank": use_rerank,
+            "filters": filters
+        }
+        report = {}
+        # Phân trang: xếp hạng sẵn initial_depth kết quả cho các trang sau
+        depth = max(search_sessions.initial_depth, top_k) if paginate else top_k
+        candidates = await fetch_ranking(n_results=depth, report=report, **spec)
+
+        query_info = {
+            "jd_length": len(jd_text),
+            "min_exp": min_exp,
+            "top_k": top_k,
+            "required_skills": skills_list,
+            "model": model,
+            "mode": mode,
+            "rerank": use_rerank,
+            "partitions": partition_list,
+            "section_scoring": section_scoring if mode == "sections" else None,
+            "filters": filters,
+            "filter_info": report.get("filter"),
+            "cache": "miss" if search_cache is not None and not paginate else "disabled"
+        }
+
+        next_cursor = None
+        if paginate:
+            run = functools.partial(stages.run, "search")
+            cursor = await run(
+                search_sessions.create, query_info, spec, [c.dict() for c in candidates],
+                depth, report["exhausted"], generation
+            )
+            page = await read_page(run, search_sessions, cursor, top_k, fetch_session_ranking)
+            candidates, next_cursor = page["matches"], page["next_cursor"]
+            query_info = {**query_info, "offset": 0}
 
         print(f"✅ Tìm thấy {len(candidates)} ứng viên")
 
-        return SearchResponse(
+        response = SearchResponse(
             total=len(candidates),
             matches=candidates,
-            query_info={
-                "jd_length": len(jd_text),
-                "min_exp": min_exp,
-                "top_k": top_k,
-                "required_skills": skills_list,
-                "model": model
-            }
+            query_info=query_info,
+            next_cursor=next_cursor
+        )
+
+        if search_cache is not None and not paginate:
+            search_cache.put(cache_key, generation, response)
+
+        return response
+
+    except HTTPException:
+        raise
+
+    except SectionIndexUnavailable as e:
+        raise HTTPException(
+            status_code=409,
+            detail=str(e)
         )
 
     except Exception as e:
@@ -319,18 +840,521 @@ async def search_candidates(
         )
 
 
+# =======================
+# SEARCH CACHE
+# =======================
+@app.get("/api/search/cache")
+async def search_cache_stats():
+    if search_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "generation": vector_store.generation, **search_cache.stats()}
+
+
+@app.delete("/api/search/cache")
+async def clear_search_cache():
+    if search_cache is not None:
+        search_cache.clear()
+    return {"status": "success", "message": "Đã xóa cache tìm kiếm"}
+
+
+# =======================
+# SEARCH PAGES (cursor)
+# =======================
+@app.get("/api/search/page", response_model=SearchResponse)
+async def search_page(cursor: str, limit: Optional[int] = None):
+    """
+    Trang tiếp theo của một lần tìm kiếm paginate=true, cắt từ ranking đã lưu
+
+    Args:
+        cursor: next_cursor của trang trước
+        limit: số kết quả của trang (mặc định = top_k lúc tạo session)
+    """
+    try:
+        page = await read_page(
+            functools.partial(stages.run, "search"), search_sessions, cursor, limit, fetch_session_ranking
+        )
+        return SearchResponse(
+            total=len(page["matches"]),
+            matches=page["matches"],
+            query_info={
+                **page["query_info"],
+                "offset": page["offset"],
+                "cache": "session",
+                "stale": page["generation"] != vector_store.generation
+            },
+            next_cursor=page["next_cursor"]
+        )
+
+    except HTTPException:
+        raise
+
+    except InvalidCursor:
+        raise HTTPException(
+            status_code=400,
+            detail="Cursor không hợp lệ"
+        )
+
+    except SearchSessionExpired:
+        raise HTTPException(
+            status_code=410,
+            detail="Phiên tìm kiếm đã hết hạn, vui lòng tìm kiếm lại"
+        )
+
+    except SectionIndexUnavailable as e:
+        raise HTTPException(
+            status_code=409,
+            detail=str(e)
+        )
+
+    except Exception as e:
+        print(f"❌ Lỗi khi lấy trang kết quả: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Lỗi khi lấy trang kết quả: {str(e)}"
+        )
+
+
+@app.get("/api/search/sessions")
+async def search_session_stats():
+    return await stages.run("search", search_sessions.stats)
+
+
+# =======================
+# BATCH SEARCH (MULTI-JD)
+# =======================
+@app.post("/api/search/batch", response_model=BatchSearchResponse)
+async def batch_search_candidates(request: BatchSearchRequest):
+    try:
+        if request.model:
+            is_available, error_msg = ai_engine.is_model_available(request.model)
+            if not is_available:
+                raise HTTPException(
+                    status_code=400,
+                    detail=error_msg
+                )
+
+        print(f"🔍 Đang tìm kiếm hàng loạt với {len(request.queries)} JD...")
+
+        # Encode toàn bộ JD trong một lần gọi embedder
+        query_vectors = await stages.run(
+            "embed",
+            ai_engine.create_embeddings,
+            [q.jd_text for q in request.queries],
+            model=request.model,
+            embedding_model=vector_store.embedding_model
+        )
+
+        use_rerank = reranker.enabled if request.rerank is None else request.rerank
+
+        batch_results = await stages.run("search", vector_store.search_candidates_batch, [
+            {
+                "query_embedding": query_vectors[i],
+                "n_results": reranker.fetch_size(q.top_k) if use_rerank else q.top_k,
+                "min_exp": q.min_exp,
+                "required_skills": q.required_skills,
+                "partitions": q.partitions
+            }
+            for i, q in enumerate(request.queries)
+        ])
+
+        grouped = []
+        for i, q in enumerate(request.queries):
+            results = batch_results[i]
+            if use_rerank:
+                results = reranker.rerank(results, q.top_k)
+
+            candidates = build_candidate_matches(results)
+            grouped.append(
+                BatchSearchResult(
+                    index=i,
+                    jd_id=q.jd_id,
+                    total=len(candidates),
+                    matches=candidates,
+                    query_info={
+                        "jd_length": len(q.jd_text),
+                        "min_exp": q.min_exp,
+                        "top_k": q.top_k,
+                        "required_skills": q.required_skills,
+                        "model": request.model,
+                        "rerank": use_rerank
+                    }
+                )
+            )
+
+        print(f"✅ Hoàn thành tìm kiếm {len(grouped)} JD")
+
+        return BatchSearchResponse(
+            total_queries=len(grouped),
+            results=grouped
+        )
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        print(f"❌ Lỗi khi tìm kiếm hàng loạt: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Lỗi khi tìm kiếm hàng loạt: {str(e)}"
+        )
+
+
+# =======================
+# PARTITIONS
+# =======================
+@app.get("/api/partitions")
+async def list_partitions():
+    try:
+        return {"partitions": await stages.run("search", vector_store.list_partitions)}
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Lỗi khi lấy danh sách partition: {str(e)}"
+        )
+
+
+@app.post("/api/partitions/{partition}/archive")
+async def archive_partition(partition: str):
+    try:
+        return await stages.run("write", vector_store.archive_partition, partition)
+
+    except HTTPException:
+        raise
+
+    except KeyError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Không tìm thấy partition đang hoạt động: {partition}"
+        )
+
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Lỗi khi lưu trữ partition: {str(e)}"
+        )
+
+
+@app.post("/api/partitions/{partition}/restore")
+async def restore_partition(partition: str):
+    try:
+        result = await stages.run("write", vector_store.restore_partition, partition)
+        if reindex_job is not None and vector_store.sections is not None:
+            # Section vector bị bỏ khi lưu trữ: embed lại cho ứng viên vừa khôi phục
+            threading.Thread(target=reindex_job.sync_sections, name="section-sync", daemon=True).start()
+        return result
+
+    except HTTPException:
+        raise
+
+    except KeyError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Không tìm thấy partition đã lưu trữ: {partition}"
+        )
+
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Lỗi khi khôi phục partition: {str(e)}"
+        )
+
+
+# =======================
+# CONCURRENCY STAGES
+# =======================
+@app.get("/api/stages")
+async def stage_stats():
+    return {"stages": stages.stats()}
+
+
+@app.get("/api/llm/usage")
+async def llm_usage():
+    """
+    Token đã dùng và max_tokens thích ứng hiện tại theo provider / model
+    """
+    return ai_engine.token_budget.stats()
+
+
+@app.get("/api/storage")
+async def storage_stats():
+    if not isinstance(vector_store, RemoteVectorStore):
+        return {"mode": "local"}
+    try:
+        return {"mode": "remote", **await stages.run("search", vector_store.server_stats)}
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Không kết nối được storage server: {str(e)}")
+
+
+# =======================
+# PROMETHEUS METRICS
+# =======================
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    body, content_type = metrics.render()
+    # Đặt header trực tiếp: CONTENT_TYPE_LATEST đã kèm charset
+    return Response(content=body, headers={"Content-Type": content_type})
+
+
+# =======================
+# RE-INDEX (ĐỔI MODEL EMBEDDING)
+# =======================
+def require_reindex_job() -> ReindexJob:
+    if reindex_job is None:
+        raise HTTPException(
+            status_code=409,
+            detail="Re-index chỉ chạy được khi storage.mode là local"
+        )
+    return reindex_job
+
+
+@app.get("/api/reindex")
+async def reindex_status():
+    return require_reindex_job().status()
+
+
+@app.post("/api/reindex", status_code=202)
+async def start_reindex(
+    embedding_model: Optional[str] = Form(None),
+    keep_previous: Optional[bool] = Form(None)
+):
+    job = require_reindex_job()
+    try:
+        return job.start(embedding_model=embedding_model, keep_previous=keep_previous)
+
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Lỗi khi bắt đầu re-index: {str(e)}"
+        )
+
+
+@app.post("/api/reindex/cancel")
+async def cancel_reindex():
+    job = require_reindex_job()
+    if not job.cancel():
+        raise HTTPException(status_code=409, detail="Không có re-index đang chạy")
+    return job.status()
+
+
+# =======================
+# SECTION INDEX
+# =======================
+@app.get("/api/sections")
+async def section_index_status():
+    stats = await stages.run("search", vector_store.section_stats)
+    if reindex_job is not None:
+        stats["sync"] = reindex_job.sections_state
+    return stats
+
+
+@app.post("/api/sections/sync", status_code=202)
+async def sync_section_index():
+    job = require_reindex_job()
+    if not sections_enabled():
+        raise HTTPException(status_code=409, detail="Section index chưa được bật (vector_store.sections.enabled)")
+    if job.sections_state.get("status") == "running":
+        raise HTTPException(status_code=409, detail="Section index đang được đồng bộ")
+
+    threading.Thread(target=job.sync_sections, name="section-sync", daemon=True).start()
+    return {"status": "started"}
+
+
+# =======================
+# WATCHLISTS (JD đã lưu)
+# =======================
+def watchlist_error(e: Exception) -> HTTPException:
+    if isinstance(e, WatchlistNotFound):
+        return HTTPException(status_code=404, detail="Không tìm thấy watchlist")
+    return HTTPException(status_code=409, detail=str(e))
+
+
+@app.post("/api/watchlists", status_code=201)
+async def create_watchlist(
+    name: str = Form(..., min_length=1),
+    jd_text: str = Form(..., min_length=10),
+    min_exp: int = Form(0),
+    required_skills: Optional[str] = Form(None),
+    threshold: Optional[float] = Form(None),
+    model: Optional[str] = Form(None)
+):
+    """
+    Lưu JD: ứng viên upload sau đó có điểm >= threshold (và đạt bộ lọc) được
+    thêm vào feed của JD, đọc qua GET /api/watchlists/{id}/feed
+    """
+    if threshold is None:
+        threshold = ai_engine.config.get("vector_store", {}).get("watchlists", {}).get("default_threshold", 0.5)
+    if not 0 <= threshold <= 1:
+        raise HTTPException(status_code=400, detail="threshold phải trong khoảng 0-1")
+
+    skills_list = [s.strip() for s in required_skills.split(",") if s.strip()] if required_skills else None
+
+    try:
+        embedding_model = vector_store.embedding_model
+        try:
+            vector = await stages.run("embed", ai_engine.create_embedding, jd_text, model=model, embedding_model=embedding_model)
+            watchlist = await stages.run(
+                "write", vector_store.create_watchlist, name, jd_text, vector,
+                embedding_model=embedding_model, min_exp=min_exp, required_skills=skills_list, threshold=threshold
+            )
+        except EmbeddingModelChanged as e:
+            # Re-index vừa chuyển collection -> embed JD bằng model mới
+            vector = await stages.run("embed", ai_engine.create_embedding, jd_text, model=model, embedding_model=str(e))
+            watchlist = await stages.run(
+                "write", vector_store.create_watchlist, name, jd_text, vector,
+                embedding_model=str(e), min_exp=min_exp, required_skills=skills_list, threshold=threshold
+            )
+    except (WatchlistNotFound, WatchlistsUnavailable) as e:
+        raise watchlist_error(e)
+
+    print(f"👀 Đã lưu watchlist: {name}")
+    return {"status": "success", "watchlist": watchlist}
+
+
+@app.get("/api/watchlists")
+async def list_watchlists():
+    try:
+        watchlists = await stages.run("search", vector_store.list_watchlists)
+    except (WatchlistNotFound, WatchlistsUnavailable) as e:
+        raise watchlist_error(e)
+    stats = await stages.run("search", vector_store.watchlist_stats)
+    return {"total": len(watchlists), "watchlists": watchlists, "stats": stats}
+
+
+@app.get("/api/watchlists/{watchlist_id}/feed")
+async def watchlist_feed(watchlist_id: str, since: int = 0, limit: int = 50):
+    """
+    Ứng viên mới khớp JD sau `since` (next_since của lần đọc trước), cũ trước
+    """
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="limit phải trong khoảng 1-500")
+    try:
+        return await stages.run("search", vector_store.watchlist_feed, watchlist_id, since=since, limit=limit)
+    except (WatchlistNotFound, WatchlistsUnavailable) as e:
+        raise watchlist_error(e)
+
+
+@app.delete("/api/watchlists/{watchlist_id}")
+async def delete_watchlist(watchlist_id: str):
+    try:
+        deleted = await stages.run("write", vector_store.delete_watchlist, watchlist_id)
+    except (WatchlistNotFound, WatchlistsUnavailable) as e:
+        raise watchlist_error(e)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Không tìm thấy watchlist")
+    return {"status": "success", "message": f"Đã xóa watchlist {watchlist_id}"}
+
+
+# =======================
+# EXPORT CANDIDATES (STREAMING)
+# =======================
+@app.get("/api/candidates/export")
+async def export_candidates(
+    format: str = "ndjson",
+    columns: Optional[str] = None,
+    page_size: int = 500
+):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"format phải là một trong: {', '.join(EXPORT_FORMATS)}"
+        )
+
+    selected = parse_columns(columns)
+    rows = vector_store.iter_candidates(columns=selected, page_size=max(1, page_size))
+    file_name = f"candidates_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+
+    # Generator đồng bộ -> Starlette chạy từng bước trong threadpool, không chặn event loop
+    return StreamingResponse(
+        stream_export(rows, format, selected),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'}
+    )
+
+
 # =======================
 # LIST ALL CANDIDATES
 # =======================
 @app.get("/api/candidates")
-async def list_candidates(limit: int = 100):
+async def list_candidates(
+    limit: int = 100,
+    offset: int = 0,
+    sort_by: Optional[str] = None,
+    order: str = "desc",
+    min_exp: Optional[int] = None,
+    max_exp: Optional[int] = None,
+    min_gpa: Optional[float] = None,
+    max_gpa: Optional[float] = None,
+    min_project_score: Optional[float] = None,
+    max_project_score: Optional[float] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    role: Optional[str] = None
+):
+    """
+    Danh sách ứng viên, lọc theo khoảng / sắp xếp bằng metadata cache
+
+    Args:
+        sort_by: years_exp | gpa | project_score | created_at (mặc định: thứ tự lưu)
+        order: desc | asc
+        role: lọc theo role (nhiều giá trị cách nhau bởi dấu phẩy)
+    """
     try:
-        results = vector_store.get_all_candidates(limit=limit)
+        if sort_by is not None and sort_by not in SORT_COLUMNS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"sort_by không hợp lệ. Chỉ hỗ trợ: {', '.join(SORT_COLUMNS)}"
+            )
+        if order not in ("asc", "desc"):
+            raise HTTPException(
+                status_code=400,
+                detail="order không hợp lệ. Chỉ hỗ trợ: asc, desc"
+            )
+        if limit < 1 or offset < 0:
+            raise HTTPException(
+                status_code=400,
+                detail="limit phải >= 1 và offset phải >= 0"
+            )
+
+        filters = parse_metadata_filters(
+            min_exp=min_exp, max_exp=max_exp, min_gpa=min_gpa, max_gpa=max_gpa,
+            min_project_score=min_project_score, max_project_score=max_project_score,
+            created_from=created_from, created_to=created_to, role=role
+        )
+        page = await stages.run(
+            "search",
+            vector_store.list_candidates,
+            filters,
+            sort_by=sort_by,
+            descending=order == "desc",
+            offset=offset,
+            limit=limit
+        )
         return {
-            "total": len(results),
-            "candidates": results
+            "total": len(page["candidates"]),
+            "matched": page["total"],
+            "offset": offset,
+            "candidates": page["candidates"]
         }
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -338,13 +1362,97 @@ async def list_candidates(limit: int = 100):
         )
 
 
+# =======================
+# ĐẾM ỨNG VIÊN (metadata cache)
+# =======================
+@app.get("/api/candidates/counts")
+async def count_candidates(
+    group_by: Optional[str] = None,
+    min_exp: Optional[int] = None,
+    max_exp: Optional[int] = None,
+    min_gpa: Optional[float] = None,
+    max_gpa: Optional[float] = None,
+    min_project_score: Optional[float] = None,
+    max_project_score: Optional[float] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    role: Optional[str] = None
+):
+    """
+    Số ứng viên khớp bộ lọc, gom nhóm theo role / llm_model / years_exp nếu cần
+    """
+    if group_by is not None and group_by not in GROUP_COLUMNS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"group_by không hợp lệ. Chỉ hỗ trợ: {', '.join(GROUP_COLUMNS)}"
+        )
+
+    filters = parse_metadata_filters(
+        min_exp=min_exp, max_exp=max_exp, min_gpa=min_gpa, max_gpa=max_gpa,
+        min_project_score=min_project_score, max_project_score=max_project_score,
+        created_from=created_from, created_to=created_to, role=role
+    )
+    try:
+        counts = await stages.run("search", vector_store.count_candidates, filters, group_by=group_by)
+        return {**counts, "filters": filters, "group_by": group_by}
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Lỗi khi đếm ứng viên: {str(e)}"
+        )
+
+
+# =======================
+# DOWNLOAD CV GỐC (STREAMING)
+# =======================
+@app.get("/api/candidates/{candidate_id}/file")
+async def download_cv(candidate_id: str):
+    try:
+        ref = await stages.run("search", vector_store.get_file_ref, candidate_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Lỗi khi tìm file CV: {str(e)}"
+        )
+
+    if ref is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy file CV của ứng viên")
+
+    filename = ref.get("filename") or f"{candidate_id}.pdf"
+    headers = {
+        "Content-Disposition": f"attachment; filename=\"{candidate_id}.pdf\"; filename*=UTF-8''{quote(filename)}"
+    }
+
+    # CV upload trước khi có blob store
+    if "path" in ref:
+        return FileResponse(ref["path"], media_type="application/pdf", headers=headers)
+
+    if not blob_store.exists(ref["sha256"]):
+        raise HTTPException(status_code=404, detail="File CV gốc không còn trong kho lưu trữ")
+
+    # Đọc từng khối (giải nén nếu cần), không nạp cả file vào bộ nhớ
+    if ref.get("size"):
+        headers["Content-Length"] = str(ref["size"])
+    return StreamingResponse(
+        blob_store.iter_chunks(ref["sha256"]),
+        media_type="application/pdf",
+        headers=headers
+    )
+
+
 # =======================
 # DELETE CANDIDATE
 # =======================
 @app.delete("/api/candidates/{candidate_id}")
 async def delete_candidate(candidate_id: str):
     try:
-        success = vector_store.delete_candidate(candidate_id)
+        success = await stages.run("write", vector_store.delete_candidate, candidate_id)
 
         if success:
             return {
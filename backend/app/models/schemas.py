@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 # =======================
@@ -48,6 +48,12 @@ class UploadResponse(BaseModel):
     data: CandidateData
     message: Optional[str] = None
 
+    # Thông tin CV trùng (action, matched_id, reasons, jaccard, similarity)
+    duplicate: Optional[dict] = None
+
+    # Kết quả lọc nhanh trước LLM (verdict, confidence, signals, reasons)
+    prescreen: Optional[dict] = None
+
 
 # =======================
 # SEARCH REQUEST
@@ -79,6 +85,12 @@ class CandidateMatch(BaseModel):
     file_source: Optional[str] = None
     created_at: Optional[str] = None
 
+    # Đóng góp của từng tín hiệu khi rerank (similarity, gpa, project_score, years_exp)
+    score_breakdown: Optional[Dict[str, float]] = None
+
+    # mode=sections: loại section khớp JD nhất (summary, skills, project, education)
+    matched_section: Optional[str] = None
+
 
 # =======================
 # SEARCH RESPONSE
@@ -88,14 +100,62 @@ class SearchResponse(BaseModel):
     matches: List[CandidateMatch]
     query_info: dict
 
+    # paginate=true: truyền vào GET /api/search/page để lấy trang kế (None = hết)
+    next_cursor: Optional[str] = None
+
+
+# =======================
+# BATCH SEARCH
+# =======================
+class BatchSearchQuery(BaseModel):
+    jd_id: Optional[str] = None
+    jd_text: str = Field(..., min_length=10)
+    min_exp: int = Field(default=0, ge=0)
+    top_k: int = Field(default=10, ge=1, le=50)
+    required_skills: Optional[List[str]] = None
+    partitions: Optional[List[str]] = None
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchSearchQuery] = Field(..., min_length=1, max_length=100)
+    model: Optional[str] = None
+    rerank: Optional[bool] = None
+
+
+class BatchSearchResult(BaseModel):
+    index: int
+    jd_id: Optional[str] = None
+    total: int
+    matches: List[CandidateMatch]
+    query_info: dict
+
+
+class BatchSearchResponse(BaseModel):
+    total_queries: int
+    results: List[BatchSearchResult]
+
 
 # =======================
 # STATS
 # =======================
+class SkillCount(BaseModel):
+    skill: str
+    count: int
+
+
 class StatsResponse(BaseModel):
     total_candidates: int
     collection_name: str
 
+    # Thống kê tổng hợp (cập nhật tăng dần, không quét collection)
+    top_skills: List[SkillCount] = []
+    experience_histogram: Dict[str, int] = {}
+    avg_gpa: Optional[float] = None
+    avg_project_score: Optional[float] = None
+    uploads_per_day: Dict[str, int] = {}
+    models_used: Dict[str, int] = {}
+    top_roles: Dict[str, int] = {}
+
 
 # =======================
 # ERROR RESPONSE
@@ -0,0 +1,221 @@
+import os
+import json
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Iterable
+
+
+class CandidateAggregates:
+    """
+    Thống kê tổng hợp của kho ứng viên, cập nhật tăng dần khi save/delete
+
+    Gồm: tổng số, tần suất kỹ năng, histogram số năm kinh nghiệm, GPA /
+    điểm dự án trung bình, số upload theo ngày, số CV theo model LLM.
+
+    Lưu trữ: snapshot JSON + journal delta (JSON lines); journal được gộp
+    vào snapshot sau mỗi `snapshot_every` thao tác. Có thể rebuild từ đầu
+    bằng cách duyệt toàn bộ metadata.
+    """
+
+    def __init__(
+        self,
+        state_dir: str = "./data/aggregates",
+        experience_bins: Optional[List[int]] = None,
+        snapshot_every: int = 200
+    ):
+        self.state_dir = state_dir
+        self.snapshot_path = os.path.join(state_dir, "snapshot.json")
+        self.journal_path = os.path.join(state_dir, "journal.log")
+        self.experience_bins = sorted(experience_bins or [0, 1, 3, 5, 10])
+        self.snapshot_every = snapshot_every
+
+        self._lock = threading.Lock()
+        self._reset()
+
+        os.makedirs(state_dir, exist_ok=True)
+        self._load()
+
+    def _reset(self):
+        self.total = 0
+        self.skills: Counter = Counter()
+        self.experience: Counter = Counter()
+        self.roles: Counter = Counter()
+        self.uploads_per_day: Counter = Counter()
+        self.models: Counter = Counter()
+        self.gpa_sum = 0.0
+        self.gpa_count = 0
+        self.project_score_sum = 0.0
+        self.project_score_count = 0
+        self._journal_ops = 0
+
+    # ------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------
+    def add(self, metadata: Dict):
+        self._update(metadata, 1)
+
+    def remove(self, metadata: Dict):
+        self._update(metadata, -1)
+
+    def _update(self, metadata: Dict, sign: int):
+        delta = self._delta(metadata)
+        with self._lock:
+            self._apply(delta, sign)
+            self._append_journal({"sign": sign, **delta})
+
+    def rebuild(self, metadatas: Iterable[Dict]):
+        """
+        Tính lại toàn bộ thống kê từ metadata (duyệt một lần)
+        """
+        with self._lock:
+            self._reset()
+            for metadata in metadatas:
+                self._apply(self._delta(metadata), 1)
+            self._snapshot()
+
+    def _delta(self, metadata: Dict) -> Dict:
+        """
+        Rút gọn metadata thành các khóa cần cộng/trừ
+        """
+        skills = [
+            s.strip().lower()
+            for s in str(metadata.get("skills_list") or "").split(",")
+            if s.strip()
+        ]
+        gpa = _to_float(metadata.get("gpa"))
+        project_score = _to_float(metadata.get("project_score"))
+
+        return {
+            "skills": sorted(set(skills)),
+            "experience": self.experience_bucket(int(_to_float(metadata.get("years_exp")))),
+            "role": str(metadata.get("role") or "N/A"),
+            "day": str(metadata.get("created_at") or "")[:10] or "unknown",
+            "model": str(metadata.get("llm_model") or "default"),
+            "gpa": gpa if gpa > 0 else None,
+            "project_score": project_score if project_score > 0 else None,
+        }
+
+    def _apply(self, delta: Dict, sign: int):
+        self.total += sign
+        for skill in delta["skills"]:
+            self.skills[skill] += sign
+        self.experience[delta["experience"]] += sign
+        self.roles[delta["role"]] += sign
+        self.uploads_per_day[delta["day"]] += sign
+        self.models[delta["model"]] += sign
+
+        if delta["gpa"] is not None:
+            self.gpa_sum += sign * delta["gpa"]
+            self.gpa_count += sign
+        if delta["project_score"] is not None:
+            self.project_score_sum += sign * delta["project_score"]
+            self.project_score_count += sign
+
+        # Counter giữ khóa có giá trị 0 -> dọn để snapshot gọn
+        for counter in (self.skills, self.experience, self.roles, self.uploads_per_day, self.models):
+            for key in [k for k, v in counter.items() if v <= 0]:
+                del counter[key]
+
+    def experience_bucket(self, years: int) -> str:
+        bins = self.experience_bins
+        # Dưới cận nhỏ nhất (số năm âm / bins không bắt đầu từ 0) -> bucket đầu
+        years = max(years, bins[0])
+        for low, high in zip(bins, bins[1:]):
+            if low <= years < high:
+                return f"{low}" if high - low == 1 else f"{low}-{high - 1}"
+        return f"{bins[-1]}+"
+
+    # ------------------------------------------------------------
+    # Read
+    # ------------------------------------------------------------
+    def summary(self, top_skills: int = 20, days: int = 30) -> Dict:
+        """
+        Thống kê phục vụ dashboard, không phụ thuộc số lượng ứng viên
+        """
+        with self._lock:
+            bucket_order = [self.experience_bucket(b) for b in self.experience_bins]
+            return {
+                "top_skills": [
+                    {"skill": skill, "count": count}
+                    for skill, count in self.skills.most_common(top_skills)
+                ],
+                "experience_histogram": {b: self.experience.get(b, 0) for b in bucket_order},
+                "avg_gpa": round(self.gpa_sum / self.gpa_count, 3) if self.gpa_count else None,
+                "avg_project_score": (
+                    round(self.project_score_sum / self.project_score_count, 3)
+                    if self.project_score_count else None
+                ),
+                "uploads_per_day": dict(sorted(self.uploads_per_day.items())[-days:]),
+                "models_used": dict(self.models.most_common()),
+                "top_roles": dict(self.roles.most_common(10)),
+            }
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+    def _append_journal(self, entry: Dict):
+        try:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._journal_ops += 1
+
+            if self._journal_ops >= self.snapshot_every:
+                self._snapshot()
+        except Exception as e:
+            print(f"⚠️ Lỗi khi ghi journal thống kê: {e}")
+
+    def _snapshot(self):
+        state = {
+            "total": self.total,
+            "experience_bins": self.experience_bins,
+            "skills": self.skills,
+            "experience": self.experience,
+            "roles": self.roles,
+            "uploads_per_day": self.uploads_per_day,
+            "models": self.models,
+            "gpa_sum": self.gpa_sum,
+            "gpa_count": self.gpa_count,
+            "project_score_sum": self.project_score_sum,
+            "project_score_count": self.project_score_count,
+        }
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, self.snapshot_path)
+
+        open(self.journal_path, "w").close()
+        self._journal_ops = 0
+
+    def _load(self):
+        try:
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                if state.get("experience_bins") != self.experience_bins:
+                    # Histogram chia theo bins khác (đổi config / snapshot cũ) -> dựng lại
+                    print("⚠️ Bucket kinh nghiệm đã đổi, cần rebuild thống kê")
+                    return
+                self.total = state["total"]
+                for key in ("skills", "experience", "roles", "uploads_per_day", "models"):
+                    setattr(self, key, Counter(state[key]))
+                for key in ("gpa_sum", "gpa_count", "project_score_sum", "project_score_count"):
+                    setattr(self, key, state[key])
+
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if line:
+                            entry = json.loads(line)
+                            self._apply(entry, entry.pop("sign"))
+                            self._journal_ops += 1
+        except Exception as e:
+            print(f"⚠️ Thống kê bị lỗi, cần rebuild: {e}")
+            self._reset()
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
@@ -2,14 +2,38 @@ import yaml
 import os
 import json
 import re
-from typing import Dict, List, Optional, Any
+import time
+import inspect
+import threading
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from gpt4all import GPT4All
 from sentence_transformers import SentenceTransformer
 from openai import OpenAI as OpenAIClient
 import openai
 from dotenv import load_dotenv
+
+from app.services.metrics import (
+    timed, LLM_SECONDS, LLM_REQUESTS, LLM_JSON_FAILURES, LLM_FALLBACKS, model_label
+)
+from app.services.cancellation import CancelToken, RequestCancelled, current_token, check_cancelled
+from app.services.token_budget import TokenBudget, estimate_tokens
 load_dotenv()
 
+# Prompt trích xuất CV: không thụt lề / dòng trống (token input trả tiền như
+# nội dung), yêu cầu JSON không thụt lề để phản hồi ngắn hơn
+EXTRACTION_PROMPT = (
+    "You parse CVs/resumes. Return ONLY a valid JSON object (no markdown, no indentation) in this format:\n"
+    '{"full_name":string,"email":string,"role":string,"years_exp":integer,'
+    '"education":[{"school":string,"degree":string,"major":string,"gpa":number|null,"time":string}],'
+    '"skills":[string],'
+    '"projects":[{"name":string,"description":string,"score":number}]}\n'
+    "Rules:\n"
+    "- gpa is a NUMBER (e.g. 3.2), null if not found.\n"
+    "- projects is [] if none found.\n"
+    "- score 0-10 (0 = very weak, 10 = excellent) based on complexity, technologies used, real-world applicability.\n"
+    "CV TEXT:\n"
+)
+
 
 class AIEngine:
     """
@@ -25,12 +49,16 @@ class AIEngine:
         # ========= RUNTIME CONFIG =========
         runtime_cfg = self.config.get("runtime", {})
         self.max_input_chars = runtime_cfg.get("max_input_chars", 3000)
+        # max_tokens thích ứng theo độ dài phản hồi đã gặp, trần = max_tokens cấu hình
+        self.token_budget = TokenBudget(runtime_cfg.get("token_budget", {}))
 
         # ========= EMBEDDING CONFIG =========
         embed_cfg = self.config.get("embedding", {})
+        self.embedding_model_name = embed_cfg.get("model_name", "all-MiniLM-L6-v2")
+        self._embedders: Dict[str, Any] = {}
+        self._embedders_lock = threading.Lock()
         try:
-            self.embedder = SentenceTransformer(embed_cfg.get("model_name", "all-MiniLM-L6-v2"))
-            print(f"Đã tải Embedding Model: {embed_cfg.get('model_name')}")
+            self.embedder = self.get_embedder(self.embedding_model_name)
         except Exception as e:
             raise Exception(f"Không thể tải Embedding Model: {e}")
 
@@ -166,6 +194,11 @@ class AIEngine:
     # Placeholder for custom provider initializers
     # def _init_provider_gemini(self, cfg): ...
     # def _init_provider_claude(self, cfg): ...
+    #
+    # Custom initializers return {"models": [{"id": ...}], "generate": fn}
+    # where fn(prompt, model_id=None, max_tokens=None) -> str (raw LLM output);
+    # extract_json_from_cv calls it like the builtin providers, with the adaptive
+    # max_tokens and, if fn accepts it, cancel=CancelToken.
 
     def is_model_available(self, model: Optional[str] = None) -> tuple[bool, Optional[str]]:
         """
@@ -219,16 +252,25 @@ class AIEngine:
             available_models = list(provider_data.get("models", {}).keys())
             if model_id and model_id.lower() not in [m.lower() for m in available_models]:
                 return False, f"Model GPT4All '{model_id}' không khả dụng. Các model có sẵn: {', '.join(available_models) if available_models else 'không có'}"
+        else:
+            available_models = [m.get("id") if isinstance(m, dict) else m for m in provider_data.get("models", [])]
+            if model_id and model_id.lower() not in [str(m).lower() for m in available_models]:
+                return False, f"Model {provider} '{model_id}' không khả dụng. Các model có sẵn: {', '.join(map(str, available_models)) if available_models else 'không có'}"
 
         return True, None
 
     # ==========================================================
     # ================= CHATGPT CALLER =========================
     # ==========================================================
-    def _call_chatgpt(self, user_prompt: str, model: Optional[str] = None, max_tokens: Optional[int] = None) -> str:
+    def _call_chatgpt(self, user_prompt: str, model: Optional[str] = None, max_tokens: Optional[int] = None,
+                      cancel: Optional[CancelToken] = None, usage: Optional[Dict] = None) -> str:
         """
         Unified wrapper to call OpenAI Responses API (or fallback openai package).
         model and max_tokens may be overridden.
+        With a cancel token the response is streamed and closed as soon as the
+        request is cancelled (client disconnect / deadline).
+        If `usage` is given it is filled with input_tokens / output_tokens /
+        truncated reported by the API.
         """
         if not max_tokens:
             max_tokens = self.max_tokens
@@ -239,7 +281,7 @@ class AIEngine:
             client = None
             if "openai" in self.loaded_providers:
                 client = self.loaded_providers["openai"]["client"]
-            elif self._openai_client is not None:
+            elif getattr(self, "_openai_client", None) is not None:
                 client = self._openai_client
             else:
                 # fallback to openai package if available
@@ -247,21 +289,25 @@ class AIEngine:
 
             # Some clients (OpenAIClient) use .responses.create, others (openai) may have different interface.
             if hasattr(client, "responses") and hasattr(client.responses, "create"):
+                request_input = [
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "input_text",
+                                "text": user_prompt
+                            }
+                        ]
+                    }
+                ]
+                if cancel is not None:
+                    return self._stream_chatgpt(client, model_to_use, request_input, max_tokens, cancel, usage)
                 resp = client.responses.create(
                     model=model_to_use,
-                    input=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "input_text",
-                                    "text": user_prompt
-                                }
-                            ]
-                        }
-                    ],
+                    input=request_input,
                     max_output_tokens=max_tokens
                 )
+                self._read_openai_usage(resp, usage)
                 # OpenAI SDK returns different structures; try to normalize
                 if hasattr(resp, "output_text"):
                     return resp.output_text.strip()
@@ -281,13 +327,114 @@ class AIEngine:
                     messages=[{"role": "user", "content": user_prompt}],
                     max_tokens=max_tokens
                 )
+                self._read_openai_usage(resp, usage)
                 if resp and "choices" in resp and len(resp["choices"]) > 0:
                     return resp["choices"][0]["message"]["content"].strip()
                 return str(resp)
 
+        except RequestCancelled:
+            raise
         except Exception as e:
             raise RuntimeError(f"Lỗi khi gọi OpenAI Response API: {e}")
 
+    def _stream_chatgpt(self, client, model: str, request_input: List[Dict], max_tokens: int, cancel: CancelToken,
+                        usage: Optional[Dict] = None) -> str:
+        """
+        Stream Responses API, dừng đọc và đóng kết nối khi request bị hủy
+        (OpenAI ngừng sinh token khi stream bị đóng)
+        """
+        kwargs = {}
+        remaining = cancel.remaining()
+        if remaining is not None:
+            kwargs["timeout"] = max(remaining, 1.0)
+
+        stream = client.responses.create(
+            model=model,
+            input=request_input,
+            max_output_tokens=max_tokens,
+            stream=True,
+            **kwargs
+        )
+        parts = []
+        try:
+            for event in stream:
+                if cancel.cancelled:
+                    break
+                event_type = getattr(event, "type", None)
+                if event_type == "response.output_text.delta":
+                    parts.append(event.delta)
+                elif event_type in ("response.completed", "response.incomplete"):
+                    self._read_openai_usage(getattr(event, "response", None), usage)
+        finally:
+            close = getattr(stream, "close", None)
+            if callable(close):
+                close()
+
+        cancel.check()
+        return "".join(parts).strip()
+
+    @staticmethod
+    def _read_openai_usage(resp, usage: Optional[Dict]):
+        """
+        Đọc token usage từ response Responses API / ChatCompletion (object hoặc dict)
+        """
+        if usage is None or resp is None:
+            return
+
+        def field(obj, name):
+            if obj is None:
+                return None
+            return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+        data = field(resp, "usage")
+        input_tokens = field(data, "input_tokens") or field(data, "prompt_tokens")
+        output_tokens = field(data, "output_tokens") or field(data, "completion_tokens")
+        if isinstance(input_tokens, int):
+            usage["input_tokens"] = input_tokens
+        if isinstance(output_tokens, int):
+            usage["output_tokens"] = output_tokens
+
+        choices = field(resp, "choices") or [None]
+        usage["truncated"] = (
+            field(field(resp, "incomplete_details"), "reason") == "max_output_tokens"
+            or field(choices[0], "finish_reason") == "length"
+        )
+
+    def _generate_with_budget(self, provider: str, model_id: Optional[str], ceiling: int, prompt: str,
+                              call: Callable[[int], Tuple[Any, Dict]]) -> Any:
+        """
+        Gọi LLM với max_tokens thích ứng (TokenBudget) và ghi nhận token
+
+        Args:
+            ceiling: max_tokens cấu hình của model
+            call: call(max_tokens) -> (response, usage); usage thiếu trường
+                nào thì ước lượng từ prompt / response
+
+        Phản hồi bị cắt ở giới hạn thích ứng mà không parse được JSON thì gọi
+        lại một lần với trần cấu hình.
+        """
+        max_tokens = self.token_budget.max_tokens(provider, model_id, ceiling)
+        while True:
+            response, usage = call(max_tokens)
+            output_tokens = usage.get("output_tokens")
+            if output_tokens is None:
+                output_tokens = estimate_tokens(response if isinstance(response, str) else json.dumps(response))
+            truncated = usage.get("truncated")
+            if truncated is None:
+                truncated = output_tokens >= max_tokens
+            self.token_budget.record(
+                provider, model_id,
+                input_tokens=usage.get("input_tokens") or estimate_tokens(prompt),
+                output_tokens=output_tokens,
+                truncated=truncated
+            )
+
+            if not truncated or max_tokens >= ceiling or self._parse_json_response(response):
+                return response
+            check_cancelled()
+            print(f"⚠️ Phản hồi {provider} bị cắt ở {max_tokens} token, gọi lại với {ceiling}")
+            max_tokens = ceiling
+
     # ==========================================================
     # ================= CV JSON EXTRACTION =====================
     # ==========================================================
@@ -302,54 +449,12 @@ class AIEngine:
                 - "model_id" (provider inferred from active_provider)
                 - None (use active provider + active model)
         """
-        text_truncated = text[:self.max_input_chars]
-
-        prompt = f"""
-        You are an AI assistant specialized in parsing CV/Resume.
-
-        Extract the following information and return ONLY a valid JSON object.
-
-        Required format:
-        {{
-        "full_name": string,
-        "email": string,
-        "role": string,
-        "years_exp": integer,
-
-        "education": [
-            {{
-            "school": string,
-            "degree": string,
-            "major": string,
-            "gpa": number | null,
-            "time": string
-            }}
-        ],
-
-        "skills": array of strings,
-
-        "projects": [
-            {{
-            "name": string,
-            "description": string,
-            "score": number (0-10)
-            }}
-        ]
-        }}
-
-        Rules:
-        - GPA must be a NUMBER (example: 3.2), not string.
-        - If GPA is not found, return null.
-        - If no project found, return empty array [].
-        - "score" must be based on:
-        + complexity
-        + technologies used
-        + real-world applicability
-        (0 = very weak, 10 = excellent)
-
-        CV TEXT:
-        {text_truncated}
-        """
+        # Request đã bị hủy (client ngắt kết nối / quá deadline) thì không gọi LLM
+        cancel = current_token()
+        if cancel is not None:
+            cancel.check()
+
+        prompt = EXTRACTION_PROMPT + text[:self.max_input_chars]
 
         # ---------- Determine provider & model ----------
         provider = None
@@ -369,11 +474,15 @@ class AIEngine:
 
         use_chat = False
         use_llm = False
+        generate = None
 
         if provider == "openai":
             use_chat = True
         elif provider == "gpt4all":
             use_llm = True
+        elif callable(self.loaded_providers.get(provider, {}).get("generate")):
+            # provider tùy biến (_init_provider_<name>) cung cấp hàm generate
+            generate = self.loaded_providers[provider]["generate"]
         else:
             if "openai" in self.loaded_providers:
                 use_chat = True
@@ -382,6 +491,8 @@ class AIEngine:
 
         # ---------- Call the selected model ----------
         if use_chat:
+            chat_model = model_id or self.chatgpt_model
+            start = time.perf_counter()
             try:
                 # locate desired max_tokens if model configured in providers
                 max_toks = None
@@ -390,10 +501,24 @@ class AIEngine:
                         if m.get("id") == model_id:
                             max_toks = m.get("max_tokens")
                             break
-                response = self._call_chatgpt(user_prompt=prompt, model=model_id or self.chatgpt_model, max_tokens=max_toks or self.max_tokens)
+
+                def call_openai(max_tokens: int):
+                    usage = {}
+                    output = self._call_chatgpt(user_prompt=prompt, model=chat_model, max_tokens=max_tokens, cancel=cancel, usage=usage)
+                    return output, usage
+
+                response = self._generate_with_budget("openai", chat_model, max_toks or self.max_tokens, prompt, call_openai)
+                LLM_SECONDS.labels("openai", model_label(chat_model)).observe(time.perf_counter() - start)
+                LLM_REQUESTS.labels("openai", model_label(chat_model), "ok").inc()
                 extracted = self._parse_json_response(response)
+                if not extracted:
+                    LLM_JSON_FAILURES.labels("openai", model_label(chat_model)).inc()
                 return self._validate_extracted_data(extracted)
+            except RequestCancelled:
+                LLM_REQUESTS.labels("openai", model_label(chat_model), "cancelled").inc()
+                raise
             except Exception as e:
+                LLM_REQUESTS.labels("openai", model_label(chat_model), "error").inc()
                 print(f"⚠️ Lỗi ChatGPT: {e}")
 
         if use_llm:
@@ -405,14 +530,64 @@ class AIEngine:
                 if model_instance is None:
                     raise RuntimeError("Không tìm thấy GPT4All model để chạy")
 
-                with model_instance.chat_session():
-                    response = model_instance.generate(prompt, max_tokens=600 if not self.max_tokens else self.max_tokens, temp=0.1)
+                def call_gpt4all(max_tokens: int):
+                    generated = [0]
+
+                    def on_token(token_id, piece):
+                        # Gọi mỗi token sinh ra; trả False -> GPT4All dừng sinh
+                        generated[0] += 1
+                        return cancel is None or not cancel.cancelled
+
+                    with model_instance.chat_session():
+                        output = model_instance.generate(prompt, max_tokens=max_tokens, temp=0.1, callback=on_token)
+                    if cancel is not None:
+                        cancel.check()
+                    return output, {"output_tokens": generated[0] or None}
+
+                start = time.perf_counter()
+                response = self._generate_with_budget("gpt4all", model_id, 600 if not self.max_tokens else self.max_tokens, prompt, call_gpt4all)
+                LLM_SECONDS.labels("gpt4all", model_label(model_id)).observe(time.perf_counter() - start)
+                LLM_REQUESTS.labels("gpt4all", model_label(model_id), "ok").inc()
                 extracted = self._parse_json_response(response)
+                if not extracted:
+                    LLM_JSON_FAILURES.labels("gpt4all", model_label(model_id)).inc()
                 return self._validate_extracted_data(extracted)
+            except RequestCancelled:
+                LLM_REQUESTS.labels("gpt4all", model_label(model_id), "cancelled").inc()
+                raise
             except Exception as e:
+                LLM_REQUESTS.labels("gpt4all", model_label(model_id), "error").inc()
                 print(f"⚠️ Lỗi GPT4All: {e}")
 
+        if generate is not None:
+            start = time.perf_counter()
+            try:
+                generate_kwargs = {}
+                if cancel is not None and "cancel" in inspect.signature(generate).parameters:
+                    generate_kwargs["cancel"] = cancel
+
+                def call_provider(max_tokens: int):
+                    output = generate(prompt, model_id=model_id, max_tokens=max_tokens, **generate_kwargs)
+                    if cancel is not None:
+                        cancel.check()
+                    return output, {}
+
+                response = self._generate_with_budget(provider, model_id, self.max_tokens, prompt, call_provider)
+                LLM_SECONDS.labels(provider, model_label(model_id)).observe(time.perf_counter() - start)
+                LLM_REQUESTS.labels(provider, model_label(model_id), "ok").inc()
+                extracted = self._parse_json_response(response)
+                if not extracted:
+                    LLM_JSON_FAILURES.labels(provider, model_label(model_id)).inc()
+                return self._validate_extracted_data(extracted)
+            except RequestCancelled:
+                LLM_REQUESTS.labels(provider, model_label(model_id), "cancelled").inc()
+                raise
+            except Exception as e:
+                LLM_REQUESTS.labels(provider, model_label(model_id), "error").inc()
+                print(f"⚠️ Lỗi provider {provider}: {e}")
+
         # fallback: simple extraction heuristics
+        LLM_FALLBACKS.inc()
         return self._simple_extraction(text)
 
     # ==========================================================
@@ -523,14 +698,51 @@ class AIEngine:
     # ==========================================================
     # ================= EMBEDDING ==============================
     # ==========================================================
-    def create_embedding(self, text: str, model: Optional[str] = None) -> List[float]:
+    def get_embedder(self, embedding_model: Optional[str] = None):
+        """
+        Return a SentenceTransformer for `embedding_model` (default: the one in
+        config.yaml). Loaded models are cached, so the model of the active
+        collection and a re-index target can be served side by side.
+        """
+        name = embedding_model or self.embedding_model_name
+        with self._embedders_lock:
+            if name not in self._embedders:
+                self._embedders[name] = SentenceTransformer(name)
+                print(f"Đã tải Embedding Model: {name}")
+            return self._embedders[name]
+
+    def create_embedding(
+        self,
+        text: str,
+        model: Optional[str] = None,
+        embedding_model: Optional[str] = None
+    ) -> List[float]:
         """
         Create embedding for given text. `model` is accepted for future extension.
-        Currently uses the configured SentenceTransformer embedder.
+        `embedding_model` selects the SentenceTransformer (default: config.yaml);
+        callers pass the model of the collection they query or write to.
         """
-        embedding = self.embedder.encode(text)
+        with timed("embedding"):
+            embedding = self.get_embedder(embedding_model).encode(text)
         return embedding.tolist()
 
+    def create_embeddings(
+        self,
+        texts: List[str],
+        model: Optional[str] = None,
+        batch_size: int = 32,
+        embedding_model: Optional[str] = None
+    ) -> List[List[float]]:
+        """
+        Batched version of create_embedding: encodes all texts in a single
+        embedder call so the model runs over full batches instead of one text at a time.
+        """
+        if not texts:
+            return []
+        with timed("embedding"):
+            embeddings = self.get_embedder(embedding_model).encode(texts, batch_size=batch_size)
+        return embeddings.tolist()
+
     # ==========================================================
     # ================= SEMANTIC TEXT ==========================
     # ==========================================================
@@ -548,3 +760,42 @@ class AIEngine:
         ]
 
         return ". ".join(semantic_parts)
+
+    def create_section_texts(self, cv_data: Dict) -> List[Tuple[str, str]]:
+        """
+        Text của từng section để embed riêng (section index): summary, skills,
+        mỗi project, mỗi education
+
+        Returns:
+            List[Tuple[str, str]]: (loại section, text), bỏ qua section rỗng
+        """
+        role = cv_data.get('role') or 'N/A'
+        skills = [str(s) for s in cv_data.get('skills') or [] if s]
+        years_exp = cv_data.get('years_exp', 0)
+
+        summary = f"{role} with {years_exp} years of experience"
+        if skills:
+            summary += f". Main skills: {', '.join(skills[:5])}"
+        sections = [("summary", summary)]
+
+        if skills:
+            sections.append(("skills", f"Skills: {', '.join(skills)}"))
+
+        for project in cv_data.get('projects') or []:
+            if not isinstance(project, dict):
+                project = {"description": str(project)}
+            name, description = str(project.get('name') or ''), str(project.get('description') or '')
+            text = description if name in description else ". ".join(p for p in (name, description) if p)
+            if text:
+                sections.append(("project", f"Project: {text}"))
+
+        for item in cv_data.get('education') or []:
+            if not isinstance(item, dict):
+                item = {"school": str(item)}
+            text = ", ".join(
+                str(item[k]) for k in ("degree", "major", "school") if item.get(k)
+            )
+            if text:
+                sections.append(("education", f"Education: {text}"))
+
+        return sections
@@ -0,0 +1,350 @@
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+CHUNK_SIZE = 64 * 1024
+DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+COMPRESSIONS = ("none", "zstd")
+
+
+class BlobStore:
+    """
+    Kho file gốc (PDF) định địa chỉ theo nội dung
+
+    Mỗi blob được đặt tên theo SHA-256 của nội dung gốc, chia thư mục theo
+    tiền tố (ab/cd/abcd...); file giống nhau chỉ lưu một lần. Blob nén zstd
+    có hậu tố `.zst`, đọc ra luôn là nội dung gốc.
+
+    Chỉ gồm thao tác trên file (ghi nguyên tử, đọc stream), an toàn khi
+    nhiều tiến trình dùng chung thư mục; số tham chiếu do BlobRefs quản lý.
+    """
+
+    def __init__(self, root: str = "./data/blobs", compression: str = "zstd", level: int = 3, shard_depth: int = 2):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"blobs.compression không hợp lệ: {compression}")
+
+        self.root = root
+        self.level = int(level)
+        self.shard_depth = max(0, int(shard_depth))
+        self.compression = compression
+
+        if compression == "zstd":
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                print("⚠️ Chưa cài zstandard, blob mới sẽ được lưu không nén")
+                self.compression = "none"
+
+        os.makedirs(root, exist_ok=True)
+
+    # ------------------------------------------------------------
+    # Paths
+    # ------------------------------------------------------------
+    def _base_path(self, digest: str) -> str:
+        shards = [digest[i * 2:i * 2 + 2] for i in range(self.shard_depth)]
+        return os.path.join(self.root, *shards, digest)
+
+    def path(self, digest: str) -> Optional[str]:
+        """
+        Đường dẫn blob trên đĩa (nén hoặc không), None nếu không tồn tại
+        """
+        base = self._base_path(digest)
+        for candidate in (base + ".zst", base):
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest) is not None
+
+    # ------------------------------------------------------------
+    # Write / delete
+    # ------------------------------------------------------------
+    def put(self, content: bytes) -> Dict:
+        """
+        Lưu nội dung (bỏ qua nếu blob đã có)
+
+        Returns:
+            Dict: {"sha256", "size", "stored_size", "compressed", "existed"}
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        existing = self.path(digest)
+        if existing is not None:
+            # Đánh dấu vừa dùng: release / GC không xóa blob sắp được tham chiếu lại
+            os.utime(existing)
+            return {
+                "sha256": digest,
+                "size": len(content),
+                "stored_size": os.path.getsize(existing),
+                "compressed": existing.endswith(".zst"),
+                "existed": True
+            }
+
+        data = content
+        target = self._base_path(digest)
+        if self.compression == "zstd":
+            import zstandard
+            data = zstandard.ZstdCompressor(level=self.level).compress(content)
+            target += ".zst"
+
+        # Ghi file tạm cùng thư mục rồi rename: tiến trình khác không bao giờ thấy blob dở dang
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+
+        return {
+            "sha256": digest,
+            "size": len(content),
+            "stored_size": len(data),
+            "compressed": self.compression == "zstd",
+            "existed": False
+        }
+
+    def delete(self, digest: str) -> bool:
+        path = self.path(digest)
+        if path is None:
+            return False
+        os.remove(path)
+        return True
+
+    def release(self, digest: str, grace_seconds: float = 300) -> bool:
+        """
+        Xóa blob vừa hết tham chiếu, trừ khi nó vừa được put (có thể một
+        upload khác cùng nội dung sắp tham chiếu lại); caller hẹn dọn lại
+        blob giữ lại (VectorStore.sweep_blob_releases), GC lúc khởi động là
+        lưới an toàn cuối cùng
+
+        Returns:
+            bool: True nếu đã xóa
+        """
+        path = self.path(digest)
+        if path is None or os.path.getmtime(path) > time.time() - grace_seconds:
+            return False
+        os.remove(path)
+        return True
+
+    # ------------------------------------------------------------
+    # Read
+    # ------------------------------------------------------------
+    def iter_chunks(self, digest: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Đọc nội dung gốc theo từng khối, không nạp cả file vào bộ nhớ
+        """
+        path = self.path(digest)
+        if path is None:
+            raise FileNotFoundError(digest)
+
+        with open(path, "rb") as f:
+            if path.endswith(".zst"):
+                import zstandard
+                reader = zstandard.ZstdDecompressor().stream_reader(f)
+            else:
+                reader = f
+            while True:
+                chunk = reader.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def collect_garbage(self, referenced, grace_seconds: float = 3600) -> int:
+        """
+        Xóa blob không còn tham chiếu và cũ hơn `grace_seconds` (upload lỗi
+        giữa chừng); blob mới được giữ lại vì có thể đang chờ lưu ứng viên
+
+        Returns:
+            int: Số blob đã xóa
+        """
+        removed = 0
+        cutoff = time.time() - grace_seconds
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".tmp"):
+                    path = os.path.join(root, name)
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                    continue
+
+                digest = name[:-4] if name.endswith(".zst") else name
+                if not DIGEST_RE.fullmatch(digest) or digest in referenced:
+                    continue
+                path = os.path.join(root, name)
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+
+class BlobRefs:
+    """
+    Tham chiếu ứng viên -> blob (sha256, tên file, kích thước) và số tham chiếu
+    mỗi blob; blob chỉ được giải phóng khi không còn ứng viên nào dùng
+
+    Lưu trữ: snapshot JSON + journal (JSON lines), gộp sau `snapshot_every`
+    thao tác. Chỉ tiến trình sở hữu VectorStore ghi vào đây.
+    """
+
+    def __init__(self, state_dir: str = "./data/blob_refs", snapshot_every: int = 500):
+        self.state_dir = state_dir
+        self.snapshot_path = os.path.join(state_dir, "snapshot.json")
+        self.journal_path = os.path.join(state_dir, "journal.log")
+        self.snapshot_every = snapshot_every
+
+        self._lock = threading.Lock()
+        self._reset()
+
+        # False khi snapshot / journal hỏng: cần rebuild trước khi dọn blob
+        self.healthy = True
+        os.makedirs(state_dir, exist_ok=True)
+        self._load()
+
+    def _reset(self):
+        self.refs: Dict[str, Dict] = {}
+        self.counts: Counter = Counter()
+        self._journal_ops = 0
+
+    def get(self, candidate_id: str) -> Optional[Dict]:
+        with self._lock:
+            ref = self.refs.get(candidate_id)
+            return dict(ref) if ref else None
+
+    def count(self, digest: str) -> int:
+        with self._lock:
+            return self.counts.get(digest, 0)
+
+    def referenced(self) -> set:
+        with self._lock:
+            return set(self.counts)
+
+    def matches(self, entries: Dict[str, Dict]) -> bool:
+        """
+        Tham chiếu hiện có khớp đúng {candidate_id: {"sha256", ...}} (thường
+        dựng từ metadata collection) hay không
+        """
+        with self._lock:
+            if len(self.refs) != len(entries):
+                return False
+            return all(
+                self.refs.get(candidate_id, {}).get("sha256") == entry["sha256"]
+                for candidate_id, entry in entries.items()
+            )
+
+    def add(self, candidate_id: str, ref: Dict) -> Optional[str]:
+        """
+        Gắn blob cho ứng viên (thay tham chiếu cũ nếu có, ví dụ khi merge)
+
+        Returns:
+            Optional[str]: sha256 của blob cũ nếu nó không còn tham chiếu nào
+        """
+        entry = {
+            "sha256": ref["sha256"],
+            "filename": ref.get("filename", ""),
+            "size": ref.get("size", 0)
+        }
+        with self._lock:
+            freed = self._apply_remove(candidate_id)
+            self._apply_add(candidate_id, entry)
+            self._append_journal({"op": "add", "id": candidate_id, **entry})
+        return freed if freed != entry["sha256"] else None
+
+    def remove(self, candidate_id: str) -> Optional[str]:
+        """
+        Bỏ tham chiếu của ứng viên
+
+        Returns:
+            Optional[str]: sha256 của blob nếu nó không còn tham chiếu nào
+        """
+        with self._lock:
+            if candidate_id not in self.refs:
+                return None
+            freed = self._apply_remove(candidate_id)
+            self._append_journal({"op": "remove", "id": candidate_id})
+        return freed
+
+    def _apply_add(self, candidate_id: str, entry: Dict):
+        self.refs[candidate_id] = entry
+        self.counts[entry["sha256"]] += 1
+
+    def _apply_remove(self, candidate_id: str) -> Optional[str]:
+        entry = self.refs.pop(candidate_id, None)
+        if entry is None:
+            return None
+        digest = entry["sha256"]
+        self.counts[digest] -= 1
+        if self.counts[digest] <= 0:
+            del self.counts[digest]
+            return digest
+        return None
+
+    def rebuild(self, entries: Iterable[Tuple[str, Dict]]):
+        """
+        Dựng lại tham chiếu từ (candidate_id, {"sha256", "filename", "size"})
+        """
+        with self._lock:
+            self._reset()
+            for candidate_id, entry in entries:
+                self._apply_add(candidate_id, entry)
+            self._snapshot()
+            self.healthy = True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "candidates": len(self.refs),
+                "blobs": len(self.counts),
+                "shared_blobs": sum(1 for c in self.counts.values() if c > 1)
+            }
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+    def _append_journal(self, entry: Dict):
+        try:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._journal_ops += 1
+
+            if self._journal_ops >= self.snapshot_every:
+                self._snapshot()
+        except Exception as e:
+            print(f"⚠️ Lỗi khi ghi journal blob: {e}")
+
+    def _snapshot(self):
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.refs, f, ensure_ascii=False)
+        os.replace(tmp, self.snapshot_path)
+
+        open(self.journal_path, "w").close()
+        self._journal_ops = 0
+
+    def _load(self):
+        try:
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    for candidate_id, entry in json.load(f).items():
+                        self._apply_add(candidate_id, entry)
+
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        entry = json.loads(line)
+                        op, candidate_id = entry.pop("op"), entry.pop("id")
+                        self._apply_remove(candidate_id)
+                        if op == "add":
+                            self._apply_add(candidate_id, entry)
+                        self._journal_ops += 1
+        except Exception as e:
+            print(f"⚠️ Tham chiếu blob bị lỗi, cần rebuild: {e}")
+            self._reset()
+            self.healthy = False
@@ -0,0 +1,240 @@
+import time
+import asyncio
+import threading
+import contextvars
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.services.metrics import REQUESTS_CANCELLED
+
+# Token hủy của request hiện tại (None = không có deadline / không theo dõi ngắt kết nối)
+_current: contextvars.ContextVar = contextvars.ContextVar("cancel_token", default=None)
+
+# Lý do hủy -> (status code, thông báo); 499 = client đóng kết nối (quy ước nginx)
+CANCEL_REASONS = {
+    "disconnected": (499, "Client đã ngắt kết nối, dừng xử lý"),
+    "deadline": (504, "Xử lý quá thời gian cho phép, đã hủy"),
+}
+
+
+class RequestCancelled(HTTPException):
+    """
+    Request đã bị hủy (client ngắt kết nối hoặc quá deadline), dừng xử lý
+    """
+
+    def __init__(self, reason: str):
+        status_code, detail = CANCEL_REASONS.get(reason, CANCEL_REASONS["deadline"])
+        super().__init__(status_code=status_code, detail=detail)
+        self.reason = reason
+
+
+class CancelToken:
+    """
+    Trạng thái hủy của một request, dùng chung giữa event loop và các thread
+    executor (truyền qua contextvars, Stage.run sao chép context)
+
+    Code blocking kiểm tra `check()` / `cancelled` tại các điểm dừng được,
+    hoặc ngủ bằng `wait()` để thức dậy ngay khi bị hủy.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.timeout = timeout
+        self._event = threading.Event()
+        self._reason: Optional[str] = None
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str], None]] = []
+
+    @property
+    def reason(self) -> Optional[str]:
+        if self._reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+        return self._reason
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def remaining(self) -> Optional[float]:
+        """
+        Số giây còn lại trước deadline (None = không giới hạn)
+        """
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason: str):
+        with self._lock:
+            if self._reason is not None:
+                return
+            self._reason = reason
+            listeners, self._listeners = self._listeners, []
+        self._event.set()
+        for listener in listeners:
+            listener(reason)
+
+    def check(self):
+        """
+        Raise RequestCancelled nếu request đã bị hủy
+        """
+        reason = self.reason
+        if reason is not None:
+            raise RequestCancelled(reason)
+
+    def wait(self, seconds: float) -> bool:
+        """
+        Ngủ tối đa `seconds` giây, thức dậy sớm khi bị hủy / tới deadline
+
+        Returns:
+            bool: True nếu request đã bị hủy
+        """
+        remaining = self.remaining()
+        if remaining is not None and remaining < seconds:
+            self._event.wait(remaining)
+        else:
+            self._event.wait(seconds)
+        return self.cancelled
+
+    def add_listener(self, listener: Callable[[str], None]):
+        """
+        Gọi `listener(reason)` khi bị hủy (ngay lập tức nếu đã hủy); có thể
+        được gọi từ thread bất kỳ
+        """
+        with self._lock:
+            if self._reason is None:
+                self._listeners.append(listener)
+                return
+        listener(self._reason)
+
+    def remove_listener(self, listener: Callable[[str], None]):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current.get()
+
+
+def check_cancelled():
+    """
+    Điểm dừng: raise RequestCancelled nếu request hiện tại đã bị hủy
+    """
+    token = _current.get()
+    if token is not None:
+        token.check()
+
+
+async def wait_cancelled(token: CancelToken, future: asyncio.Future):
+    """
+    Chờ `future` hoặc tới khi token bị hủy / quá deadline, cái nào trước
+
+    Raises:
+        RequestCancelled: token bị hủy trước khi future xong
+    """
+    loop = asyncio.get_running_loop()
+    cancelled = loop.create_future()
+
+    def on_cancel(reason: str):
+        def resolve():
+            if not cancelled.done():
+                cancelled.set_result(reason)
+        loop.call_soon_threadsafe(resolve)
+
+    token.add_listener(on_cancel)
+    try:
+        done, _ = await asyncio.wait({future, cancelled}, timeout=token.remaining(), return_when=asyncio.FIRST_COMPLETED)
+        if future in done:
+            return future.result()
+        token.check()
+        raise RequestCancelled(token.reason or "deadline")
+    finally:
+        token.remove_listener(on_cancel)
+        if not cancelled.done():
+            cancelled.cancel()
+
+
+class RequestDeadlines:
+    """
+    Thời gian xử lý tối đa theo route, từ block `deadlines` trong config.yaml
+
+    Client có thể yêu cầu ngắn hơn qua header (ví dụ X-Request-Timeout: 20),
+    không được dài hơn giới hạn của route.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.default_seconds = float(config.get("default_seconds", 0) or 0)
+        self.routes = {
+            key.strip(): float(value or 0)
+            for key, value in (config.get("routes") or {}).items()
+        }
+        self.header = str(config.get("header", "X-Request-Timeout")).lower().encode("latin-1")
+
+    def timeout_for(self, scope) -> Optional[float]:
+        limit = self.routes.get(f"{scope['method']} {scope['path']}", self.default_seconds)
+
+        requested = None
+        for name, value in scope.get("headers", []):
+            if name == self.header:
+                try:
+                    requested = float(value.decode("latin-1"))
+                except ValueError:
+                    pass
+                break
+
+        if requested and requested > 0:
+            limit = min(limit, requested) if limit else requested
+        return limit or None
+
+
+class CancellationMiddleware:
+    """
+    ASGI middleware: gắn CancelToken (deadline theo route) cho mỗi request
+    HTTP và hủy token khi client ngắt kết nối
+
+    Sau khi app đọc hết body, một task nhận message tiếp theo từ server;
+    http.disconnect nghĩa là client đã đóng kết nối. Message đó được trả lại
+    cho app nếu app cũng gọi receive (StreamingResponse theo dõi disconnect).
+    """
+
+    def __init__(self, app, get_deadlines: Callable[[], Optional[RequestDeadlines]]):
+        self.app = app
+        self.get_deadlines = get_deadlines
+
+    async def __call__(self, scope, receive, send):
+        deadlines = self.get_deadlines() if scope["type"] == "http" else None
+        if deadlines is None or not deadlines.enabled:
+            return await self.app(scope, receive, send)
+
+        cancel_token = CancelToken(deadlines.timeout_for(scope))
+        watcher: Optional[asyncio.Task] = None
+
+        async def watch_disconnect():
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                cancel_token.cancel("disconnected")
+            return message
+
+        async def receive_and_watch():
+            nonlocal watcher
+            if watcher is not None:
+                return await asyncio.shield(watcher)
+            message = await receive()
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                watcher = asyncio.ensure_future(watch_disconnect())
+            elif message["type"] == "http.disconnect":
+                cancel_token.cancel("disconnected")
+            return message
+
+        token = _current.set(cancel_token)
+        try:
+            await self.app(scope, receive_and_watch, send)
+        finally:
+            _current.reset(token)
+            if watcher is not None and not watcher.done():
+                watcher.cancel()
+            if cancel_token._reason is not None:
+                REQUESTS_CANCELLED.labels(cancel_token._reason).inc()
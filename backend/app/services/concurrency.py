@@ -0,0 +1,222 @@
+import time
+import asyncio
+import contextvars
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.services.metrics import EXECUTOR_SECONDS, EXECUTOR_REJECTED, EXECUTOR_DROPPED
+from app.services.profiling import current_session
+from app.services.cancellation import RequestCancelled, current_token, wait_cancelled
+
+# Cấu hình mặc định khi config.yaml không có block `concurrency.stages`
+DEFAULT_STAGES = {
+    "parse": {"kind": "process", "workers": 2, "queue": 8},
+    "llm": {"kind": "thread", "workers": 1, "queue": 4},
+    "embed": {"kind": "thread", "workers": 2, "queue": 32},
+    "search": {"kind": "thread", "workers": 4, "queue": 64},
+    "write": {"kind": "thread", "workers": 1, "queue": 32},
+    "io": {"kind": "thread", "workers": 4, "queue": 64},
+}
+
+
+class StageBusy(HTTPException):
+    """
+    Stage đã đủ việc (đang chạy + đang chờ) -> trả 503/429 kèm Retry-After
+    """
+
+    def __init__(self, stage: str, status_code: int = 503, retry_after: int = 5):
+        super().__init__(
+            status_code=status_code,
+            detail=f"Hệ thống đang quá tải ở bước {stage}, vui lòng thử lại sau {retry_after} giây",
+            headers={"Retry-After": str(retry_after)}
+        )
+        self.stage = stage
+
+
+class Stage:
+    """
+    Một bước xử lý có executor riêng và giới hạn số việc tồn đọng
+
+    Tối đa `workers` việc chạy đồng thời và `queue` việc chờ; vượt quá thì
+    từ chối ngay (StageBusy) thay vì xếp hàng vô hạn.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kind: str = "thread",
+        workers: int = 1,
+        queue: int = 0,
+        retry_after: int = 5,
+        status_code: int = 503
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Loại executor không hợp lệ cho stage {name}: {kind}")
+
+        self.name = name
+        self.kind = kind
+        self.workers = max(1, int(workers))
+        self.capacity = self.workers + max(0, int(queue))
+        self.retry_after = int(retry_after)
+        self.status_code = int(status_code)
+
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    @property
+    def executor(self) -> Executor:
+        # Khởi tạo lười: process pool chỉ được tạo khi thật sự cần
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    # spawn: không fork tiến trình đang giữ thread của Chroma / torch
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix=f"stage-{self.name}"
+                    )
+            return self._executor
+
+    def has_capacity(self) -> bool:
+        return self._inflight < self.capacity
+
+    def ensure_capacity(self):
+        """
+        Từ chối sớm nếu stage đã đầy (không giữ chỗ)
+        """
+        if not self.has_capacity():
+            with self._lock:
+                self._rejected += 1
+            EXECUTOR_REJECTED.labels(self.name).inc()
+            raise StageBusy(self.name, self.status_code, self.retry_after)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Chạy `fn(*args, **kwargs)` trên executor của stage, không chặn event loop
+
+        Thread executor chạy trong bản sao contextvars của request hiện tại;
+        process executor yêu cầu fn và tham số pickle được.
+
+        Request bị hủy (ngắt kết nối / quá deadline): việc còn trong hàng đợi
+        bị bỏ, việc đang chạy được để chạy nốt (hoặc tự dừng ở điểm kiểm tra)
+        nhưng caller nhận RequestCancelled ngay; việc đó vẫn chiếm chỗ trong
+        stage cho tới khi thật sự xong.
+        """
+        token = current_token()
+        if token is not None and token.cancelled:
+            EXECUTOR_DROPPED.labels(self.name).inc()
+            raise RequestCancelled(token.reason)
+
+        with self._lock:
+            if self._inflight >= self.capacity:
+                self._rejected += 1
+                EXECUTOR_REJECTED.labels(self.name).inc()
+                raise StageBusy(self.name, self.status_code, self.retry_after)
+            self._inflight += 1
+
+        start = time.perf_counter()
+        release = True
+        try:
+            call = functools.partial(fn, *args, **kwargs)
+            if self.kind == "thread":
+                session = current_session()
+                if session is not None:
+                    # Request đang profile: lấy mẫu cả thread executor
+                    call = session.track(call)
+                if token is not None:
+                    call = functools.partial(self._skip_if_cancelled, token, call)
+                call = functools.partial(contextvars.copy_context().run, call)
+
+            future = self.executor.submit(call)
+            if token is None:
+                return await asyncio.wrap_future(future)
+
+            try:
+                return await wait_cancelled(token, asyncio.wrap_future(future))
+            except RequestCancelled:
+                EXECUTOR_DROPPED.labels(self.name).inc()
+                if not future.cancel():
+                    # Đang chạy: giữ chỗ tới khi xong để không nhận quá sức
+                    release = False
+                    future.add_done_callback(lambda f: self._release(start))
+                raise
+        finally:
+            if release:
+                self._release(start)
+
+    def _skip_if_cancelled(self, token, call: Callable) -> Any:
+        # Việc chờ trong hàng đợi tới lượt sau khi request đã bị hủy
+        token.check()
+        return call()
+
+    def _release(self, start: float):
+        EXECUTOR_SECONDS.labels(self.name).observe(time.perf_counter() - start)
+        with self._lock:
+            self._inflight -= 1
+            self._completed += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "capacity": self.capacity,
+                "inflight": self._inflight,
+                "completed": self._completed,
+                "rejected": self._rejected
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+class StagePool:
+    """
+    Tập các stage theo block `concurrency` trong config.yaml
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        config = config or {}
+        retry_after = config.get("retry_after", 5)
+        status_code = config.get("status_code", 503)
+
+        stages_cfg = {**DEFAULT_STAGES, **(config.get("stages") or {})}
+        self.stages: Dict[str, Stage] = {
+            name: Stage(
+                name,
+                kind=cfg.get("kind", "thread"),
+                workers=cfg.get("workers", 1),
+                queue=cfg.get("queue", 0),
+                retry_after=cfg.get("retry_after", retry_after),
+                status_code=cfg.get("status_code", status_code)
+            )
+            for name, cfg in stages_cfg.items()
+        }
+
+    def __getitem__(self, name: str) -> Stage:
+        return self.stages[name]
+
+    async def run(self, stage: str, fn: Callable, *args, **kwargs) -> Any:
+        return await self.stages[stage].run(fn, *args, **kwargs)
+
+    def stats(self) -> Dict[str, Dict]:
+        return {name: stage.stats() for name, stage in self.stages.items()}
+
+    def shutdown(self):
+        for stage in self.stages.values():
+            stage.shutdown()
@@ -0,0 +1,300 @@
+import os
+import re
+import json
+import zlib
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Set, Iterable, Tuple
+
+import numpy as np
+
+from app.services.lexical_index import tokenize
+
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+def normalize_email(email) -> Optional[str]:
+    email = str(email or "").strip().lower()
+    if not email or email == "n/a" or "@" not in email:
+        return None
+    return email
+
+
+def normalize_name(name) -> Optional[str]:
+    """
+    Chuẩn hóa tên để so khớp: bỏ dấu tiếng Việt, lowercase, gộp khoảng trắng
+    """
+    name = str(name or "").strip().lower().replace("đ", "d")
+    if not name or name == "n/a":
+        return None
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    name = re.sub(r"[^a-z0-9 ]+", " ", name)
+    name = re.sub(r"\s+", " ", name).strip()
+    return name if len(name) >= 3 else None
+
+
+class DuplicateDetector:
+    """
+    Phát hiện CV trùng lặp (cùng một người upload nhiều bản) khi ingest
+
+    Kết hợp 3 tín hiệu:
+        - khóa email / họ tên đã chuẩn hóa (dict tra cứu O(1))
+        - MinHash trên shingle của cv_text, tra cứu qua LSH banding
+        - cosine similarity giữa embedding mới và embedding của ứng viên nghi trùng
+
+    Các chỉ mục được cập nhật tăng dần (journal JSON lines) nên thời gian
+    kiểm tra không phụ thuộc kích thước kho ứng viên.
+    """
+
+    def __init__(self, index_dir: str = "./data/dedupe_index", config: Optional[Dict] = None):
+        config = config or {}
+
+        self.index_dir = index_dir
+        self.journal_path = os.path.join(index_dir, "journal.log")
+
+        self.num_perm = int(config.get("num_perm", 64))
+        self.bands = int(config.get("bands", 16))
+        if self.num_perm % self.bands:
+            raise ValueError("num_perm phải chia hết cho bands")
+        self.rows = self.num_perm // self.bands
+        self.shingle_size = int(config.get("shingle_size", 5))
+
+        self.minhash_threshold = float(config.get("minhash_threshold", 0.85))
+        self.name_minhash_threshold = float(config.get("name_minhash_threshold", 0.5))
+        self.embedding_threshold = float(config.get("embedding_threshold", 0.9))
+
+        rng = np.random.default_rng(int(config.get("seed", 42)))
+        self._a = rng.integers(1, MERSENNE_PRIME, size=self.num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, size=self.num_perm, dtype=np.uint64)
+
+        self._lock = threading.Lock()
+        self._reset()
+
+        os.makedirs(index_dir, exist_ok=True)
+        self._load()
+
+    def _reset(self):
+        self._email: Dict[str, Set[str]] = {}
+        self._name: Dict[str, Set[str]] = {}
+        self._bands: List[Dict[bytes, Set[str]]] = [{} for _ in range(self.bands)]
+        self._records: Dict[str, Dict] = {}
+        self._journal_ops = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    # ------------------------------------------------------------
+    # MinHash
+    # ------------------------------------------------------------
+    def signature(self, text: str) -> np.ndarray:
+        """
+        MinHash signature (num_perm giá trị uint32) trên shingle từ của cv_text
+        """
+        tokens = tokenize(text)
+        k = self.shingle_size
+        if len(tokens) < k:
+            shingles = {" ".join(tokens)}
+        else:
+            shingles = {" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) & MERSENNE_PRIME for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % MERSENNE_PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[b * self.rows:(b + 1) * self.rows].tobytes()
+            for b in range(self.bands)
+        ]
+
+    # ------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------
+    def find_candidates(self, cv_text: str, cv_data: Dict) -> List[Dict]:
+        """
+        Tìm các ứng viên nghi trùng qua khóa email/tên và LSH
+
+        Returns:
+            List[Dict]: mỗi phần tử gồm id, email_match, name_match, jaccard
+        """
+        email = normalize_email(cv_data.get("email"))
+        name = normalize_name(cv_data.get("full_name"))
+        signature = self.signature(cv_text)
+
+        with self._lock:
+            matches: Dict[str, Dict] = {}
+
+            def entry(cid):
+                return matches.setdefault(cid, {"id": cid, "email_match": False, "name_match": False})
+
+            if email:
+                for cid in self._email.get(email, ()):
+                    entry(cid)["email_match"] = True
+            if name:
+                for cid in self._name.get(name, ()):
+                    entry(cid)["name_match"] = True
+            for band, key in zip(self._bands, self._band_keys(signature)):
+                for cid in band.get(key, ()):
+                    entry(cid)
+
+            for cid, match in matches.items():
+                other = self._records[cid]["sig"]
+                match["jaccard"] = round(float(np.mean(signature == other)), 4)
+
+        return list(matches.values())
+
+    def decide(self, candidates: List[Dict], similarities: Dict[str, float]) -> Optional[Dict]:
+        """
+        Chọn ứng viên trùng tốt nhất từ các tín hiệu; None nếu không trùng
+
+        Quy tắc:
+            - cùng email -> trùng
+            - cùng tên và (embedding >= embedding_threshold hoặc jaccard >= name_minhash_threshold) -> trùng
+            - jaccard >= minhash_threshold (cùng nội dung, khác bản export) -> trùng
+        """
+        best = None
+        for match in candidates:
+            similarity = similarities.get(match["id"])
+            reasons = []
+
+            if match["email_match"]:
+                reasons.append("email")
+            if match["name_match"] and (
+                (similarity is not None and similarity >= self.embedding_threshold)
+                or match["jaccard"] >= self.name_minhash_threshold
+            ):
+                reasons.append("name")
+            if match["jaccard"] >= self.minhash_threshold:
+                reasons.append("minhash")
+
+            if not reasons:
+                continue
+
+            result = {**match, "similarity": similarity, "reasons": reasons}
+            rank = (len(reasons), match["jaccard"], similarity or 0.0)
+            if best is None or rank > best[0]:
+                best = (rank, result)
+
+        return best[1] if best else None
+
+    # ------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------
+    def add(self, candidate_id: str, cv_text: str, cv_data: Dict):
+        record = {
+            "email": normalize_email(cv_data.get("email")),
+            "name": normalize_name(cv_data.get("full_name")),
+            "sig": self.signature(cv_text)
+        }
+        with self._lock:
+            self._apply_add(candidate_id, record)
+            self._append_journal({
+                "op": "add",
+                "id": candidate_id,
+                "email": record["email"],
+                "name": record["name"],
+                "sig": record["sig"].tolist()
+            })
+
+    def remove(self, candidate_id: str):
+        with self._lock:
+            if candidate_id not in self._records:
+                return
+            self._apply_remove(candidate_id)
+            self._append_journal({"op": "del", "id": candidate_id})
+
+    def rebuild(self, rows: Iterable[Tuple[str, str, Dict]]):
+        """
+        Xây lại chỉ mục từ (id, cv_text, metadata)
+        """
+        with self._lock:
+            self._reset()
+            for cid, text, meta in rows:
+                self._apply_add(cid, {
+                    "email": normalize_email(meta.get("email")),
+                    "name": normalize_name(meta.get("full_name")),
+                    "sig": self.signature(text or "")
+                })
+            self._compact()
+
+    def _apply_add(self, cid: str, record: Dict):
+        if cid in self._records:
+            self._apply_remove(cid)
+
+        self._records[cid] = record
+        if record["email"]:
+            self._email.setdefault(record["email"], set()).add(cid)
+        if record["name"]:
+            self._name.setdefault(record["name"], set()).add(cid)
+        for band, key in zip(self._bands, self._band_keys(record["sig"])):
+            band.setdefault(key, set()).add(cid)
+
+    def _apply_remove(self, cid: str):
+        record = self._records.pop(cid)
+        for table, key in ((self._email, record["email"]), (self._name, record["name"])):
+            if key and key in table:
+                table[key].discard(cid)
+                if not table[key]:
+                    del table[key]
+        for band, key in zip(self._bands, self._band_keys(record["sig"])):
+            bucket = band.get(key)
+            if bucket is not None:
+                bucket.discard(cid)
+                if not bucket:
+                    del band[key]
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+    def _append_journal(self, entry: Dict):
+        try:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._journal_ops += 1
+
+            if self._journal_ops > 2 * max(len(self._records), 512):
+                self._compact()
+        except Exception as e:
+            print(f"⚠️ Lỗi khi ghi journal dedupe index: {e}")
+
+    def _compact(self):
+        tmp = self.journal_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for cid, record in self._records.items():
+                f.write(json.dumps({
+                    "op": "add",
+                    "id": cid,
+                    "email": record["email"],
+                    "name": record["name"],
+                    "sig": record["sig"].tolist()
+                }, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.journal_path)
+        self._journal_ops = len(self._records)
+
+    def _load(self):
+        if not os.path.exists(self.journal_path):
+            return
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    entry = json.loads(line)
+                    if entry["op"] == "add":
+                        self._apply_add(entry["id"], {
+                            "email": entry.get("email"),
+                            "name": entry.get("name"),
+                            "sig": np.asarray(entry["sig"], dtype=np.uint32)
+                        })
+                    elif entry["op"] == "del" and entry["id"] in self._records:
+                        self._apply_remove(entry["id"])
+                    self._journal_ops += 1
+        except Exception as e:
+            print(f"⚠️ Dedupe index bị lỗi, cần rebuild: {e}")
+            self._reset()
@@ -0,0 +1,76 @@
+import io
+import csv
+import json
+from typing import Dict, Iterator, List, Optional
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+# Cột mặc định khi xuất CSV mà không chỉ định --columns
+DEFAULT_CSV_COLUMNS = [
+    "id", "full_name", "email", "role", "years_exp", "gpa", "project_score",
+    "skills_list", "file_source", "created_at"
+]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def parse_columns(columns: Optional[str]) -> Optional[List[str]]:
+    """
+    "id,full_name, email" -> ["id", "full_name", "email"]; None/rỗng -> None
+    """
+    if not columns:
+        return None
+    parsed = [c.strip() for c in columns.split(",") if c.strip()]
+    return parsed or None
+
+
+def iter_ndjson(rows: Iterator[Dict], columns: Optional[List[str]] = None) -> Iterator[str]:
+    """
+    Mỗi ứng viên một dòng JSON
+    """
+    for row in rows:
+        if columns:
+            row = {c: row.get(c) for c in columns}
+        yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
+
+
+def iter_csv(rows: Iterator[Dict], columns: Optional[List[str]] = None) -> Iterator[str]:
+    """
+    CSV có header; giá trị list/dict được ghi dạng JSON trong một ô
+    """
+    columns = columns or DEFAULT_CSV_COLUMNS
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+
+    # BOM để Excel đọc đúng tiếng Việt
+    writer.writerow(columns)
+    yield "\ufeff" + flush()
+
+    for row in rows:
+        writer.writerow([_csv_cell(row.get(c)) for c in columns])
+        yield flush()
+
+
+def stream_export(rows: Iterator[Dict], fmt: str, columns: Optional[List[str]] = None) -> Iterator[str]:
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Định dạng export không hợp lệ: {fmt}")
+    if fmt == "csv":
+        return iter_csv(rows, columns)
+    return iter_ndjson(rows, columns)
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
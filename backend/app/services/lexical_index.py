@@ -0,0 +1,327 @@
+import os
+import re
+import io
+import json
+import math
+import heapq
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple, Iterable
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[.+#-]\w+)*[+#]*", re.UNICODE)
+
+SEGMENT_MAGIC = b"BM25"
+SEGMENT_VERSION = 1
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tách từ đơn giản cho BM25: lowercase, giữ các token dạng c++, c#, node.js, aws-saa
+    """
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+# ====================================================================
+# VARINT ENCODING (postings nén trên đĩa)
+# ====================================================================
+
+def _write_varint(buf: io.BytesIO, value: int):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            buf.write(bytes((byte | 0x80,)))
+        else:
+            buf.write(bytes((byte,)))
+            return
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _write_str(buf: io.BytesIO, value: str):
+    raw = value.encode("utf-8")
+    _write_varint(buf, len(raw))
+    buf.write(raw)
+
+
+def _read_str(data: bytes, pos: int) -> Tuple[str, int]:
+    length, pos = _read_varint(data, pos)
+    return data[pos:pos + length].decode("utf-8"), pos + length
+
+
+class LexicalIndex:
+    """
+    Chỉ mục BM25 cục bộ trên nội dung CV (cv_text)
+
+    Lưu trữ gồm 2 file:
+        - segment.bin: snapshot postings nén (doc id delta + tf dạng varint)
+        - journal.log: nhật ký add/delete (JSON lines) kể từ snapshot gần nhất
+
+    Mỗi lần cập nhật chỉ ghi thêm 1 dòng vào journal; khi journal vượt
+    ngưỡng `compact_every` thì gộp lại thành segment mới.
+    """
+
+    def __init__(
+        self,
+        index_dir: str = "./data/lexical_index",
+        k1: float = 1.2,
+        b: float = 0.75,
+        compact_every: int = 500
+    ):
+        self.index_dir = index_dir
+        self.segment_path = os.path.join(index_dir, "segment.bin")
+        self.journal_path = os.path.join(index_dir, "journal.log")
+        self.k1 = k1
+        self.b = b
+        self.compact_every = compact_every
+
+        self._lock = threading.Lock()
+        self._reset()
+
+        os.makedirs(index_dir, exist_ok=True)
+        self._load()
+
+    def _reset(self):
+        self._doc_ids: List[Optional[str]] = []
+        self._doc_index: Dict[str, int] = {}
+        self._doc_len: Dict[int, int] = {}
+        self._doc_terms: Dict[int, List[str]] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._total_len = 0
+        self._journal_ops = 0
+
+    # ------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._doc_index)
+
+    def add_document(self, doc_id: str, text: str):
+        """
+        Thêm (hoặc thay thế) một document vào chỉ mục
+
+        Args:
+            doc_id: ID ứng viên
+            text: Nội dung CV
+        """
+        tf = dict(Counter(tokenize(text)))
+        with self._lock:
+            self._apply_add(doc_id, tf)
+            self._append_journal({"op": "add", "id": doc_id, "tf": tf})
+
+    def remove_document(self, doc_id: str) -> bool:
+        """
+        Xóa document khỏi chỉ mục
+
+        Returns:
+            bool: True nếu document tồn tại
+        """
+        with self._lock:
+            if doc_id not in self._doc_index:
+                return False
+            self._apply_delete(doc_id)
+            self._append_journal({"op": "del", "id": doc_id})
+            return True
+
+    def search(self, query: str, n_results: int = 10) -> List[Tuple[str, float]]:
+        """
+        Tìm kiếm BM25
+
+        Args:
+            query: Câu truy vấn (JD, tên chứng chỉ, sản phẩm...)
+            n_results: Số lượng kết quả
+
+        Returns:
+            List[(doc_id, bm25_score)] sắp xếp giảm dần
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            n_docs = len(self._doc_index)
+            if n_docs == 0:
+                return []
+            avgdl = self._total_len / n_docs
+
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for doc, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc] / avgdl)
+                    scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            top = heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+            return [(self._doc_ids[doc], score) for doc, score in top]
+
+    def rebuild(self, documents: Iterable[Tuple[str, str]]):
+        """
+        Xây lại toàn bộ chỉ mục từ (doc_id, text) và ghi segment mới
+        """
+        with self._lock:
+            self._reset()
+            for doc_id, text in documents:
+                self._apply_add(doc_id, dict(Counter(tokenize(text or ""))))
+            self._compact()
+
+    def compact(self):
+        with self._lock:
+            self._compact()
+
+    # ------------------------------------------------------------
+    # In-memory mutations
+    # ------------------------------------------------------------
+    def _apply_add(self, doc_id: str, tf: Dict[str, int]):
+        if doc_id in self._doc_index:
+            self._apply_delete(doc_id)
+
+        doc = len(self._doc_ids)
+        self._doc_ids.append(doc_id)
+        self._doc_index[doc_id] = doc
+
+        length = sum(tf.values())
+        self._doc_len[doc] = length
+        self._doc_terms[doc] = list(tf.keys())
+        self._total_len += length
+
+        for term, count in tf.items():
+            self._postings.setdefault(term, {})[doc] = count
+
+    def _apply_delete(self, doc_id: str):
+        doc = self._doc_index.pop(doc_id)
+        self._doc_ids[doc] = None
+        self._total_len -= self._doc_len.pop(doc, 0)
+
+        for term in self._doc_terms.pop(doc, []):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc, None)
+            if not postings:
+                del self._postings[term]
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+    def _append_journal(self, entry: Dict):
+        try:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._journal_ops += 1
+
+            if self._journal_ops >= self.compact_every:
+                self._compact()
+        except Exception as e:
+            print(f"⚠️ Lỗi khi ghi journal lexical index: {e}")
+
+    def _compact(self):
+        """
+        Ghi snapshot postings hiện tại ra segment.bin (đánh lại số doc liên tục)
+        và xóa journal.
+        """
+        live = [doc for doc, did in enumerate(self._doc_ids) if did is not None]
+        remap = {doc: new for new, doc in enumerate(live)}
+
+        buf = io.BytesIO()
+        buf.write(SEGMENT_MAGIC)
+        buf.write(bytes((SEGMENT_VERSION,)))
+
+        _write_varint(buf, len(live))
+        for doc in live:
+            _write_str(buf, self._doc_ids[doc])
+            _write_varint(buf, self._doc_len[doc])
+
+        _write_varint(buf, len(self._postings))
+        for term, postings in self._postings.items():
+            _write_str(buf, term)
+            entries = sorted((remap[doc], tf) for doc, tf in postings.items())
+            _write_varint(buf, len(entries))
+            prev = 0
+            for doc, tf in entries:
+                _write_varint(buf, doc - prev)
+                _write_varint(buf, tf)
+                prev = doc
+
+        tmp_path = self.segment_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buf.getvalue())
+        os.replace(tmp_path, self.segment_path)
+
+        open(self.journal_path, "w").close()
+        self._journal_ops = 0
+
+        # Đồng bộ lại số doc trong bộ nhớ với segment vừa ghi
+        self._load_segment(buf.getvalue())
+
+    def _load(self):
+        try:
+            if os.path.exists(self.segment_path):
+                with open(self.segment_path, "rb") as f:
+                    self._load_segment(f.read())
+
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        entry = json.loads(line)
+                        if entry["op"] == "add":
+                            self._apply_add(entry["id"], entry["tf"])
+                        elif entry["op"] == "del" and entry["id"] in self._doc_index:
+                            self._apply_delete(entry["id"])
+                        self._journal_ops += 1
+
+            print(f"✅ Lexical index sẵn sàng. Số document: {len(self._doc_index)}")
+        except Exception as e:
+            print(f"⚠️ Lexical index bị lỗi, cần rebuild: {e}")
+            self._reset()
+
+    def _load_segment(self, data: bytes):
+        if data[:4] != SEGMENT_MAGIC or data[4] != SEGMENT_VERSION:
+            raise ValueError("Segment BM25 không hợp lệ")
+
+        journal_ops = self._journal_ops
+        self._reset()
+        self._journal_ops = journal_ops
+
+        pos = 5
+        n_docs, pos = _read_varint(data, pos)
+        for doc in range(n_docs):
+            doc_id, pos = _read_str(data, pos)
+            length, pos = _read_varint(data, pos)
+            self._doc_ids.append(doc_id)
+            self._doc_index[doc_id] = doc
+            self._doc_len[doc] = length
+            self._doc_terms[doc] = []
+            self._total_len += length
+
+        n_terms, pos = _read_varint(data, pos)
+        for _ in range(n_terms):
+            term, pos = _read_str(data, pos)
+            df, pos = _read_varint(data, pos)
+            postings = {}
+            doc = 0
+            for _ in range(df):
+                gap, pos = _read_varint(data, pos)
+                tf, pos = _read_varint(data, pos)
+                doc += gap
+                postings[doc] = tf
+                self._doc_terms[doc].append(term)
+            self._postings[term] = postings
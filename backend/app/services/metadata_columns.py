@@ -0,0 +1,346 @@
+import os
+import json
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Cột số: tên -> dtype; created_at lưu dạng epoch giây (-1 = không rõ)
+NUMERIC_COLUMNS = {
+    "years_exp": np.int32,
+    "gpa": np.float32,
+    "project_score": np.float32,
+    "created_at": np.int64,
+}
+# Cột phân loại: giá trị (chữ thường) được intern thành mã int32
+CATEGORICAL_COLUMNS = ("role", "llm_model")
+
+SORT_COLUMNS = tuple(NUMERIC_COLUMNS)
+GROUP_COLUMNS = CATEGORICAL_COLUMNS + ("years_exp",)
+
+CREATED_AT_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_created_at(value) -> int:
+    """
+    "YYYY-MM-DD HH:MM:SS" / "YYYY-MM-DD" -> epoch giây (-1 nếu không đọc được)
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value or "").strip()
+    for fmt in (CREATED_AT_FORMAT, "%Y-%m-%d"):
+        try:
+            return int(datetime.strptime(text, fmt).timestamp())
+        except ValueError:
+            continue
+    return -1
+
+
+class MetadataColumns:
+    """
+    Cache dạng cột (NumPy) của metadata số / phân loại của mọi ứng viên
+
+    ID ứng viên được intern thành slot int; mỗi cột là một mảng theo slot,
+    slot đã xóa đánh dấu trong `_alive` và được gộp lại khi ghi snapshot.
+    Lọc theo khoảng, sắp xếp và đếm / gom nhóm chạy bằng phép toán vector
+    trên mảng, không đọc collection:
+        filters = {"gpa": [3.0, None], "created_at": [lo, hi], "role": ["backend developer"]}
+
+    Lưu trữ: snapshot .npz + journal (JSON lines), gộp sau `snapshot_every`
+    thao tác; VectorStore dựng lại từ collection khi hỏng hoặc lệch số lượng.
+    """
+
+    def __init__(self, state_dir: str = "./data/metadata_columns", snapshot_every: int = 500):
+        self.state_dir = state_dir
+        self.snapshot_path = os.path.join(state_dir, "snapshot.npz")
+        self.journal_path = os.path.join(state_dir, "journal.log")
+        self.snapshot_every = snapshot_every
+
+        self._lock = threading.Lock()
+        self._reset()
+
+        # False khi snapshot / journal hỏng: cần dựng lại từ collection
+        self.healthy = True
+        os.makedirs(state_dir, exist_ok=True)
+        self._load()
+
+    def _reset(self):
+        self._ids: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._size = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._numeric = {name: np.zeros(0, dtype=dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+        self._codes = {name: np.zeros(0, dtype=np.int32) for name in CATEGORICAL_COLUMNS}
+        self._vocab: Dict[str, List[str]] = {name: [] for name in CATEGORICAL_COLUMNS}
+        self._vocab_index: Dict[str, Dict[str, int]] = {name: {} for name in CATEGORICAL_COLUMNS}
+        self._journal_ops = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, candidate_id: str) -> bool:
+        return candidate_id in self._slots
+
+    # ------------------------------------------------------------
+    # Cập nhật
+    # ------------------------------------------------------------
+    def add(self, candidate_id: str, metadata: Dict):
+        """
+        Thêm / ghi đè (merge) một ứng viên
+        """
+        row = self._row(metadata)
+        with self._lock:
+            self._apply_add(candidate_id, row)
+            self._append_journal({"op": "add", "id": candidate_id, "row": row})
+
+    def remove(self, candidate_id: str):
+        with self._lock:
+            if candidate_id not in self._slots:
+                return
+            self._apply_remove(candidate_id)
+            self._append_journal({"op": "remove", "id": candidate_id})
+
+    def rebuild(self, entries: Iterable[Tuple[str, Dict]]):
+        """
+        Dựng lại toàn bộ từ (candidate_id, metadata) của collection
+        """
+        with self._lock:
+            self._reset()
+            for candidate_id, metadata in entries:
+                self._apply_add(candidate_id, self._row(metadata))
+            self._snapshot()
+            self.healthy = True
+
+    @staticmethod
+    def _row(metadata: Dict) -> Dict:
+        def number(key):
+            try:
+                return float(metadata.get(key) or 0)
+            except (TypeError, ValueError):
+                return 0.0
+
+        return {
+            "years_exp": int(number("years_exp")),
+            "gpa": number("gpa"),
+            "project_score": number("project_score"),
+            "created_at": parse_created_at(metadata.get("created_at")),
+            **{name: str(metadata.get(name) or "").strip().lower() for name in CATEGORICAL_COLUMNS}
+        }
+
+    def _code(self, column: str, value: str) -> int:
+        index = self._vocab_index[column]
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(self._vocab[column])
+            self._vocab[column].append(value)
+        return code
+
+    def _apply_add(self, candidate_id: str, row: Dict):
+        slot = self._slots.get(candidate_id)
+        if slot is None:
+            self._ensure_capacity(self._size + 1)
+            slot = self._slots[candidate_id] = self._size
+            self._ids.append(candidate_id)
+            self._size += 1
+        self._alive[slot] = True
+        for name in NUMERIC_COLUMNS:
+            self._numeric[name][slot] = row[name]
+        for name in CATEGORICAL_COLUMNS:
+            self._codes[name][slot] = self._code(name, row[name])
+
+    def _apply_remove(self, candidate_id: str):
+        slot = self._slots.pop(candidate_id)
+        self._alive[slot] = False
+
+    def _ensure_capacity(self, needed: int):
+        capacity = len(self._alive)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+
+        def grow(array: np.ndarray) -> np.ndarray:
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            return grown
+
+        self._alive = grow(self._alive)
+        self._numeric = {name: grow(array) for name, array in self._numeric.items()}
+        self._codes = {name: grow(array) for name, array in self._codes.items()}
+
+    def _compact(self):
+        # Bỏ slot đã xóa (gọi khi ghi snapshot), slot của ID còn lại đổi theo
+        keep = np.nonzero(self._alive[:self._size])[0]
+        if len(keep) == self._size:
+            return
+        self._ids = [self._ids[i] for i in keep]
+        self._slots = {cid: slot for slot, cid in enumerate(self._ids)}
+        self._alive = np.ones(len(keep), dtype=bool)
+        self._numeric = {name: array[keep] for name, array in self._numeric.items()}
+        self._codes = {name: array[keep] for name, array in self._codes.items()}
+        self._size = len(keep)
+
+    # ------------------------------------------------------------
+    # Truy vấn
+    # ------------------------------------------------------------
+    def _mask(self, filters: Optional[Dict]) -> np.ndarray:
+        mask = self._alive[:self._size].copy()
+        for column, condition in (filters or {}).items():
+            if condition is None:
+                continue
+            if column in NUMERIC_COLUMNS:
+                low, high = condition
+                values = self._numeric[column][:self._size]
+                if low is not None:
+                    mask &= values >= low
+                if high is not None:
+                    mask &= values <= high
+            elif column in CATEGORICAL_COLUMNS:
+                wanted = [self._vocab_index[column].get(str(v).strip().lower()) for v in condition]
+                codes = np.array([c for c in wanted if c is not None], dtype=np.int32)
+                mask &= np.isin(self._codes[column][:self._size], codes)
+            else:
+                raise ValueError(f"Không hỗ trợ lọc theo cột: {column}")
+        return mask
+
+    def query(
+        self,
+        filters: Optional[Dict] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = True,
+        offset: int = 0,
+        limit: int = 100
+    ) -> Tuple[List[str], int]:
+        """
+        ID ứng viên khớp bộ lọc, đã sắp xếp và cắt trang
+
+        Returns:
+            (ids của trang, tổng số ứng viên khớp)
+        """
+        if sort_by is not None and sort_by not in NUMERIC_COLUMNS:
+            raise ValueError(f"Không hỗ trợ sắp xếp theo cột: {sort_by}")
+
+        with self._lock:
+            slots = np.nonzero(self._mask(filters))[0]
+            if sort_by is not None:
+                values = self._numeric[sort_by][slots]
+                # lexsort: khóa cuối là khóa chính; slot giữ thứ tự ổn định giữa các trang
+                order = np.lexsort((slots, -values if descending else values))
+                slots = slots[order]
+            page = slots[offset:offset + limit]
+            return [self._ids[s] for s in page], len(slots)
+
+    def count(self, filters: Optional[Dict] = None, group_by: Optional[str] = None) -> Dict:
+        """
+        Đếm ứng viên khớp bộ lọc, gom nhóm theo một cột nếu cần
+
+        Returns:
+            Dict: {"total": n, "population": số ứng viên trong cache}
+                (+ "groups": {giá trị: số lượng} khi gom nhóm)
+        """
+        if group_by is not None and group_by not in GROUP_COLUMNS:
+            raise ValueError(f"Không hỗ trợ gom nhóm theo cột: {group_by}")
+
+        with self._lock:
+            mask = self._mask(filters)
+            result = {"total": int(mask.sum()), "population": len(self._slots)}
+            if group_by in CATEGORICAL_COLUMNS:
+                counts = np.bincount(self._codes[group_by][:self._size][mask], minlength=len(self._vocab[group_by]))
+                vocab = self._vocab[group_by]
+                result["groups"] = {
+                    (vocab[code] or "n/a"): int(counts[code])
+                    for code in np.argsort(-counts, kind="stable") if counts[code]
+                }
+            elif group_by is not None:
+                values, counts = np.unique(self._numeric[group_by][:self._size][mask], return_counts=True)
+                result["groups"] = {str(v): int(c) for v, c in zip(values, counts)}
+            return result
+
+    def keep(self, candidate_ids: List[str], filters: Optional[Dict]) -> List[bool]:
+        """
+        ID nào trong danh sách (kết quả tìm kiếm) đạt bộ lọc; ID không có
+        trong cache coi như không đạt
+        """
+        with self._lock:
+            mask = self._mask(filters)
+            return [
+                slot is not None and bool(mask[slot])
+                for slot in (self._slots.get(cid) for cid in candidate_ids)
+            ]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "candidates": len(self._slots),
+                "slots": self._size,
+                "columns": list(NUMERIC_COLUMNS) + list(CATEGORICAL_COLUMNS),
+                "categories": {name: len(vocab) for name, vocab in self._vocab.items()},
+                "bytes": int(
+                    self._alive.nbytes
+                    + sum(a.nbytes for a in self._numeric.values())
+                    + sum(a.nbytes for a in self._codes.values())
+                ),
+                "healthy": self.healthy
+            }
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+    def _append_journal(self, entry: Dict):
+        try:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._journal_ops += 1
+
+            if self._journal_ops >= self.snapshot_every:
+                self._snapshot()
+        except Exception as e:
+            print(f"⚠️ Lỗi khi ghi journal metadata cache: {e}")
+
+    def _snapshot(self):
+        self._compact()
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                ids=np.array(self._ids, dtype=str),
+                **{f"num_{name}": array[:self._size] for name, array in self._numeric.items()},
+                **{f"code_{name}": array[:self._size] for name, array in self._codes.items()},
+                **{f"vocab_{name}": np.array(vocab, dtype=str) for name, vocab in self._vocab.items()}
+            )
+        os.replace(tmp, self.snapshot_path)
+
+        open(self.journal_path, "w").close()
+        self._journal_ops = 0
+
+    def _load(self):
+        try:
+            if os.path.exists(self.snapshot_path):
+                with np.load(self.snapshot_path) as data:
+                    self._ids = [str(cid) for cid in data["ids"]]
+                    self._size = len(self._ids)
+                    self._slots = {cid: slot for slot, cid in enumerate(self._ids)}
+                    self._alive = np.ones(self._size, dtype=bool)
+                    for name, dtype in NUMERIC_COLUMNS.items():
+                        self._numeric[name] = data[f"num_{name}"].astype(dtype)
+                    for name in CATEGORICAL_COLUMNS:
+                        self._codes[name] = data[f"code_{name}"].astype(np.int32)
+                        self._vocab[name] = [str(v) for v in data[f"vocab_{name}"]]
+                        self._vocab_index[name] = {v: i for i, v in enumerate(self._vocab[name])}
+
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        entry = json.loads(line)
+                        if entry["op"] == "add":
+                            self._apply_add(entry["id"], entry["row"])
+                        elif entry["id"] in self._slots:
+                            self._apply_remove(entry["id"])
+                        self._journal_ops += 1
+        except Exception as e:
+            print(f"⚠️ Metadata cache bị lỗi, cần dựng lại: {e}")
+            self._reset()
+            self.healthy = False
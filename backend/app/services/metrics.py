@@ -0,0 +1,219 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from prometheus_client import Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+
+from app.services.profiling import record_step
+
+# Bucket (giây) trải từ thao tác index vài ms tới LLM cục bộ vài phút
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Bucket (token) cho độ dài phản hồi LLM
+TOKEN_BUCKETS = (64, 128, 256, 512, 768, 1024, 1536, 2048, 3072, 4096, 6000, 8192)
+
+# ====================================================================
+# PIPELINE METRICS
+# ====================================================================
+
+PIPELINE_SECONDS = Histogram(
+    "airecruiter_pipeline_step_seconds",
+    "Thời gian từng bước xử lý (pdf_parse, llm_extract, embedding, vector_add, vector_query, profile_io, ...)",
+    ["step"],
+    buckets=LATENCY_BUCKETS
+)
+PIPELINE_ERRORS = Counter(
+    "airecruiter_pipeline_step_errors_total",
+    "Số lần một bước xử lý raise exception",
+    ["step"]
+)
+
+LLM_SECONDS = Histogram(
+    "airecruiter_llm_seconds",
+    "Thời gian gọi LLM trích xuất CV theo provider / model",
+    ["provider", "model"],
+    buckets=LATENCY_BUCKETS
+)
+LLM_REQUESTS = Counter(
+    "airecruiter_llm_requests_total",
+    "Số lần gọi LLM theo provider / model / kết quả (ok, error)",
+    ["provider", "model", "outcome"]
+)
+LLM_JSON_FAILURES = Counter(
+    "airecruiter_llm_json_parse_failures_total",
+    "Số phản hồi LLM không parse được JSON",
+    ["provider", "model"]
+)
+LLM_FALLBACKS = Counter(
+    "airecruiter_llm_fallback_total",
+    "Số lần phải dùng _simple_extraction (regex) thay cho LLM"
+)
+LLM_TOKENS = Counter(
+    "airecruiter_llm_tokens_total",
+    "Số token LLM theo provider / model / loại (input, output); ước lượng khi provider không trả usage",
+    ["provider", "model", "kind"]
+)
+LLM_OUTPUT_TOKENS = Histogram(
+    "airecruiter_llm_output_tokens",
+    "Độ dài phản hồi LLM (token) theo provider / model",
+    ["provider", "model"],
+    buckets=TOKEN_BUCKETS
+)
+LLM_TRUNCATED = Counter(
+    "airecruiter_llm_truncated_total",
+    "Số phản hồi LLM bị cắt vì chạm max_tokens",
+    ["provider", "model"]
+)
+
+PRESCREEN_RESULTS = Counter(
+    "airecruiter_prescreen_total",
+    "Kết quả lọc nhanh trước LLM theo verdict (accept, review, reject)",
+    ["verdict"]
+)
+PRESCREEN_REJECTIONS = Counter(
+    "airecruiter_prescreen_rejections_total",
+    "Số file bị từ chối trước LLM theo lý do (short_text, low_density, no_sections, non_cv_keywords, not_similar, low_confidence)",
+    ["reason"]
+)
+PRESCREEN_CONFIDENCE = Histogram(
+    "airecruiter_prescreen_confidence",
+    "Độ tin cậy file là CV theo bộ lọc nhanh",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+)
+
+WATCHLIST_MATCHES = Counter(
+    "airecruiter_watchlist_matches_total",
+    "Số lần ứng viên mới khớp một JD đã lưu (được thêm vào feed)"
+)
+
+REQUESTS_CANCELLED = Counter(
+    "airecruiter_requests_cancelled_total",
+    "Số request bị hủy giữa chừng theo lý do (disconnected, deadline)",
+    ["reason"]
+)
+
+EXECUTOR_SECONDS = Histogram(
+    "airecruiter_executor_seconds",
+    "Thời gian một việc ở trong stage executor (chờ + chạy)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+EXECUTOR_REJECTED = Counter(
+    "airecruiter_executor_rejected_total",
+    "Số việc bị từ chối vì stage executor đã đầy",
+    ["stage"]
+)
+EXECUTOR_DROPPED = Counter(
+    "airecruiter_executor_dropped_total",
+    "Số việc bị bỏ (đang chờ hoặc bị bỏ dở) vì request đã bị hủy",
+    ["stage"]
+)
+
+
+@contextmanager
+def timed(step: str):
+    """
+    Đo thời gian một bước pipeline, đếm lỗi nếu bước đó raise
+
+    Request đang được profile còn nhận thời gian bước này trong Server-Timing
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        PIPELINE_ERRORS.labels(step).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        PIPELINE_SECONDS.labels(step).observe(elapsed)
+        record_step(step, elapsed)
+
+
+# ====================================================================
+# SCRAPE-TIME GAUGES
+# ====================================================================
+
+class RuntimeCollector:
+    """
+    Đọc độ sâu hàng đợi, cache, kích thước kho ứng viên tại thời điểm scrape
+    (không tốn chi phí trên đường xử lý request)
+    """
+
+    def __init__(self):
+        self.sources: Dict[str, object] = {}
+
+    def collect(self):
+        stages = self.sources.get("stages")
+        if stages is not None:
+            inflight = GaugeMetricFamily(
+                "airecruiter_executor_inflight", "Số việc đang chạy + chờ trong stage", labels=["stage"]
+            )
+            capacity = GaugeMetricFamily(
+                "airecruiter_executor_capacity", "Số việc tối đa (workers + queue) của stage", labels=["stage"]
+            )
+            for name, stats in stages.stats().items():
+                inflight.add_metric([name], stats["inflight"])
+                capacity.add_metric([name], stats["capacity"])
+            yield inflight
+            yield capacity
+
+        cache = self.sources.get("search_cache")
+        if cache is not None:
+            stats = cache.stats()
+            hits = CounterMetricFamily("airecruiter_search_cache_hits", "Số lần cache tìm kiếm trúng")
+            hits.add_metric([], stats["hits"])
+            misses = CounterMetricFamily("airecruiter_search_cache_misses", "Số lần cache tìm kiếm trượt")
+            misses.add_metric([], stats["misses"])
+            yield hits
+            yield misses
+            yield GaugeMetricFamily(
+                "airecruiter_search_cache_hit_ratio", "Tỷ lệ trúng cache tìm kiếm",
+                value=stats["hit_ratio"] or 0.0
+            )
+            yield GaugeMetricFamily(
+                "airecruiter_search_cache_entries", "Số entry trong cache tìm kiếm", value=stats["entries"]
+            )
+            yield GaugeMetricFamily(
+                "airecruiter_search_cache_bytes", "Bộ nhớ ước lượng của cache tìm kiếm", value=stats["bytes"]
+            )
+
+        token_budget = self.sources.get("token_budget")
+        if token_budget is not None:
+            budget = GaugeMetricFamily(
+                "airecruiter_llm_max_tokens", "max_tokens hiện tại (thích ứng) theo provider / model",
+                labels=["provider", "model"]
+            )
+            for key, value in token_budget.budgets().items():
+                budget.add_metric(key.split(":", 1), value)
+            yield budget
+
+        vector_store = self.sources.get("vector_store")
+        if vector_store is not None:
+            yield GaugeMetricFamily(
+                "airecruiter_candidates", "Số ứng viên trong kho (theo thống kê tổng hợp)",
+                value=vector_store.count()
+            )
+
+
+_collector = RuntimeCollector()
+REGISTRY.register(_collector)
+
+
+def bind(**sources):
+    """
+    Gắn các service cần đọc khi scrape (stages, search_cache, vector_store, token_budget)
+    """
+    _collector.sources.update({k: v for k, v in sources.items() if v is not None})
+
+
+def render(registry=REGISTRY):
+    """
+    Returns:
+        (body, content_type) cho endpoint /metrics
+    """
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def model_label(model: Optional[str]) -> str:
+    return model or "default"
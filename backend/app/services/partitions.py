@@ -0,0 +1,430 @@
+import os
+import re
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any
+
+PARTITION_SEPARATOR = "__"
+
+
+class PartitionedCollection:
+    """
+    Chia ứng viên thành nhiều collection theo một khóa (role bucket hoặc tháng upload)
+
+    Lớp này hỗ trợ cùng API với chromadb.Collection (add, upsert, get, query,
+    delete, count) nên VectorStore dùng được như một collection thường:
+        - add/upsert: định tuyến từng bản ghi về partition tương ứng
+        - query: fan-out song song tới các partition đang hoạt động rồi gộp top-k
+        - get/delete theo id: tìm trên mọi partition (kể cả đã lưu trữ)
+
+    Partition cũ có thể được lưu trữ (archive): dữ liệu chuyển sang backend
+    archive riêng và bị loại khỏi fan-out, các partition đang hoạt động không bị ảnh hưởng.
+    """
+
+    def __init__(
+        self,
+        client,
+        base_name: str,
+        config: Dict,
+        metadata: Optional[Dict] = None,
+        archive_client=None,
+        manifest_path: str = "./data/partitions.json",
+        read_only: bool = False
+    ):
+        self.client = client
+        self.archive_client = archive_client
+        self.name = base_name
+        self.metadata = metadata or {}
+        self.key = config.get("key", "role")
+        self.role_buckets: Dict[str, List[str]] = config.get("role_buckets") or {}
+        self.default_bucket = config.get("default_bucket", "other")
+        self.manifest_path = manifest_path
+
+        self._lock = threading.RLock()
+        self._collections: Dict[str, Any] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.get("fanout_workers", 4),
+            thread_name_prefix="partition-fanout"
+        )
+
+        self._manifest = {"key": self.key, "partitions": {}}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                self._manifest = json.load(f)
+
+        if self._manifest.get("key") != self.key and self._manifest["partitions"]:
+            print(
+                f"⚠️ Khóa partition đã đổi từ {self._manifest.get('key')} sang {self.key}; "
+                f"partition cũ vẫn được giữ nguyên cho đến khi re-index."
+            )
+        self._manifest["key"] = self.key
+
+        for partition, info in self._manifest["partitions"].items():
+            if info.get("state") == "hot":
+                self._open(partition)
+
+        # read_only: tiến trình phụ (export CLI) không chuyển dữ liệu / ghi manifest
+        if not read_only:
+            self._migrate_legacy()
+            self._save_manifest()
+
+    # ------------------------------------------------------------
+    # Partition routing
+    # ------------------------------------------------------------
+    def partition_for(self, metadata: Dict) -> str:
+        """
+        Xác định partition của một ứng viên từ metadata
+        """
+        if self.key == "month":
+            created_at = str(metadata.get("created_at") or "")
+            return _slug(created_at[:7]) or self.default_bucket
+
+        if self.key == "role":
+            role = str(metadata.get("role") or "").lower()
+            for bucket, keywords in self.role_buckets.items():
+                if any(k.lower() in role for k in keywords):
+                    return _slug(bucket)
+            return self.default_bucket
+
+        return _slug(str(metadata.get(self.key) or "")) or self.default_bucket
+
+    def collection_name(self, partition: str) -> str:
+        return f"{self.name}{PARTITION_SEPARATOR}{partition}"
+
+    def _open(self, partition: str):
+        with self._lock:
+            if partition not in self._collections:
+                self._collections[partition] = self.client.get_or_create_collection(
+                    name=self.collection_name(partition),
+                    metadata=self.metadata
+                )
+                info = self._manifest["partitions"].setdefault(partition, {})
+                info["state"] = "hot"
+            return self._collections[partition]
+
+    def hot_partitions(self) -> List[str]:
+        return sorted(self._collections.keys())
+
+    def archived_partitions(self) -> List[str]:
+        return sorted(
+            p for p, info in self._manifest["partitions"].items()
+            if info.get("state") == "archived"
+        )
+
+    def archived_collection(self, partition: str):
+        """
+        Collection của partition trong backend archive (tạo nếu chưa có)
+        """
+        if self.archive_client is None:
+            raise RuntimeError("Chưa cấu hình backend archive")
+        return self.archive_client.get_or_create_collection(
+            name=self.collection_name(partition), metadata=self.metadata
+        )
+
+    def mark_archived(self, partition: str):
+        """
+        Ghi partition vào manifest ở trạng thái đã lưu trữ, theo dữ liệu đang
+        có trong backend archive (re-index chép partition đã lưu trữ sang
+        collection mới mà không đưa lại vào fan-out)
+        """
+        with self._lock:
+            if partition in self._collections:
+                raise ValueError(f"Partition {partition} đang hoạt động")
+            count = self.archived_collection(partition).count()
+            self._manifest["partitions"][partition] = {"state": "archived", "count": count}
+            self._save_manifest()
+
+    def _archived_collections(self) -> List[Any]:
+        if self.archive_client is None:
+            return []
+        return [self.archived_collection(p) for p in self.archived_partitions()]
+
+    def iter_archived(self, include: List[str], page_size: int = 500):
+        """
+        Duyệt các partition đã lưu trữ theo từng trang (get/query thường bỏ qua chúng)
+        """
+        for collection in self._archived_collections():
+            offset = 0
+            while True:
+                page = collection.get(limit=page_size, offset=offset, include=include)
+                if not page["ids"]:
+                    break
+                yield page
+                offset += len(page["ids"])
+
+    def _save_manifest(self):
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    # ------------------------------------------------------------
+    # Chroma-compatible API
+    # ------------------------------------------------------------
+    def count(self) -> int:
+        hot = sum(c.count() for c in self._collections.values())
+        archived = sum(
+            info.get("count", 0)
+            for info in self._manifest["partitions"].values()
+            if info.get("state") == "archived"
+        )
+        return hot + archived
+
+    def hot_count(self) -> int:
+        """
+        Số ứng viên trong các partition đang hoạt động (không tính partition đã lưu trữ)
+        """
+        return sum(c.count() for c in self._collections.values())
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        # Ứng viên có thể đổi partition (ví dụ đổi role) -> xóa bản cũ trước
+        self.delete(ids=list(ids))
+        self.add(ids, embeddings, metadatas, documents)
+
+    def add(self, ids, embeddings, metadatas=None, documents=None):
+        groups: Dict[str, List[int]] = {}
+        for i in range(len(ids)):
+            metadata = metadatas[i] if metadatas else {}
+            groups.setdefault(self.partition_for(metadata), []).append(i)
+
+        created = False
+        for partition, indexes in groups.items():
+            created = created or partition not in self._collections
+            collection = self._open(partition)
+            collection.add(
+                ids=[ids[i] for i in indexes],
+                embeddings=[embeddings[i] for i in indexes],
+                metadatas=[{**metadatas[i], "partition": partition} for i in indexes] if metadatas else None,
+                documents=[documents[i] for i in indexes] if documents else None
+            )
+
+        if created:
+            with self._lock:
+                self._save_manifest()
+
+    def query(
+        self,
+        query_embeddings,
+        n_results: int = 10,
+        where: Optional[Dict] = None,
+        include: Optional[List[str]] = None,
+        partitions: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Fan-out query song song tới các partition rồi gộp top-k theo distance
+
+        Args:
+            partitions: Chỉ tìm trong các partition này (mặc định: mọi partition đang hoạt động)
+        """
+        include = include if include is not None else ["metadatas", "documents", "distances"]
+        if "distances" not in include:
+            include = list(include) + ["distances"]
+
+        targets = [p for p in (partitions or self.hot_partitions()) if p in self._collections]
+        n_queries = len(query_embeddings)
+        keys = ["ids"] + [k for k in ("distances", "metadatas", "documents", "embeddings") if k in include]
+
+        def run(partition):
+            collection = self._collections[partition]
+            size = collection.count()
+            if size == 0:
+                return None
+            return collection.query(
+                query_embeddings=query_embeddings,
+                n_results=min(n_results, size),
+                where=where,
+                include=include
+            )
+
+        partials = [r for r in self._executor.map(run, targets) if r is not None]
+
+        merged = {k: [] for k in keys}
+        for q in range(n_queries):
+            rows = []
+            for res in partials:
+                for i in range(len(res["ids"][q])):
+                    rows.append({k: res[k][q][i] for k in keys})
+            rows.sort(key=lambda r: r["distances"])
+            rows = rows[:n_results]
+            for k in keys:
+                merged[k].append([r[k] for r in rows])
+
+        return merged
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        include = include if include is not None else ["metadatas", "documents"]
+        keys = ["ids"] + [k for k in ("metadatas", "documents", "embeddings") if k in include]
+        merged = {k: [] for k in keys}
+
+        if ids is not None:
+            collections = list(self._collections.values()) + self._archived_collections()
+            for collection in collections:
+                res = collection.get(ids=ids, where=where, include=include)
+                for k in keys:
+                    merged[k].extend(res[k])
+            return merged
+
+        # Phân trang tuần tự qua các partition đang hoạt động
+        skip = offset or 0
+        remaining = limit
+        for partition in self.hot_partitions():
+            if remaining is not None and remaining <= 0:
+                break
+            collection = self._collections[partition]
+
+            size = collection.count() if where is None else len(
+                collection.get(where=where, include=[])["ids"]
+            )
+            if skip >= size:
+                skip -= size
+                continue
+
+            res = collection.get(where=where, limit=remaining, offset=skip, include=include)
+            skip = 0
+            for k in keys:
+                merged[k].extend(res[k])
+            if remaining is not None:
+                remaining -= len(res["ids"])
+
+        return merged
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        archived = {
+            p: self.archive_client.get_or_create_collection(name=self.collection_name(p), metadata=self.metadata)
+            for p, info in self._manifest["partitions"].items()
+            if info.get("state") == "archived" and self.archive_client is not None
+        }
+
+        changed = False
+        for partition, collection in list(self._collections.items()) + list(archived.items()):
+            # Chỉ xóa ở partition thực sự chứa id để tránh cảnh báo của backend
+            present = collection.get(ids=ids, where=where, include=[])["ids"] if ids is not None else None
+            if present is not None and not present:
+                continue
+            collection.delete(ids=present, where=where)
+
+            if partition in archived:
+                self._manifest["partitions"][partition]["count"] = collection.count()
+                changed = True
+
+        if changed:
+            with self._lock:
+                self._save_manifest()
+
+    # ------------------------------------------------------------
+    # Archive / restore
+    # ------------------------------------------------------------
+    def list_partitions(self) -> List[Dict]:
+        partitions = []
+        for partition, info in sorted(self._manifest["partitions"].items()):
+            state = info.get("state", "hot")
+            count = self._collections[partition].count() if state == "hot" else info.get("count", 0)
+            partitions.append({
+                "name": partition,
+                "collection": self.collection_name(partition),
+                "state": state,
+                "count": count
+            })
+        return partitions
+
+    def archive_partition(self, partition: str, page_size: int = 500) -> Dict:
+        """
+        Chuyển một partition sang backend archive và gỡ khỏi fan-out
+        """
+        if self.archive_client is None:
+            raise RuntimeError("Chưa cấu hình backend archive")
+
+        with self._lock:
+            if partition not in self._collections:
+                raise KeyError(partition)
+
+            source = self._collections[partition]
+            target = self.archive_client.get_or_create_collection(
+                name=self.collection_name(partition), metadata=self.metadata
+            )
+            moved = _copy_collection(source, target, page_size)
+
+            del self._collections[partition]
+            self.client.delete_collection(self.collection_name(partition))
+            self._manifest["partitions"][partition] = {"state": "archived", "count": moved}
+            self._save_manifest()
+
+        print(f"📦 Đã lưu trữ partition {partition} ({moved} ứng viên)")
+        return {"name": partition, "state": "archived", "count": moved}
+
+    def restore_partition(self, partition: str, page_size: int = 500) -> Dict:
+        """
+        Đưa partition đã lưu trữ trở lại fan-out
+        """
+        with self._lock:
+            info = self._manifest["partitions"].get(partition)
+            if not info or info.get("state") != "archived":
+                raise KeyError(partition)
+
+            source = self.archive_client.get_collection(self.collection_name(partition))
+            target = self._open(partition)
+            moved = _copy_collection(source, target, page_size)
+
+            self.archive_client.delete_collection(self.collection_name(partition))
+            self._manifest["partitions"][partition] = {"state": "hot"}
+            self._save_manifest()
+
+        print(f"♻️ Đã khôi phục partition {partition} ({moved} ứng viên)")
+        return {"name": partition, "state": "hot", "count": moved}
+
+    def _migrate_legacy(self, page_size: int = 500):
+        """
+        Chuyển dữ liệu từ collection không chia partition (nếu có) vào các partition
+        """
+        if self.name not in self.client.list_collections():
+            return
+
+        legacy = self.client.get_collection(self.name)
+        total = legacy.count()
+        if total == 0:
+            return
+
+        print(f"🔀 Đang chia {total} ứng viên từ collection {self.name} vào partition...")
+        while True:
+            page = legacy.get(limit=page_size, include=["embeddings", "metadatas", "documents"])
+            if not page["ids"]:
+                break
+            self.add(
+                ids=page["ids"],
+                embeddings=page["embeddings"],
+                metadatas=page["metadatas"],
+                documents=page["documents"]
+            )
+            legacy.delete(ids=page["ids"])
+
+        print(f"✅ Đã chia partition: {', '.join(self.hot_partitions())}")
+
+
+def _copy_collection(source, target, page_size: int) -> int:
+    moved = 0
+    offset = 0
+    while True:
+        page = source.get(limit=page_size, offset=offset, include=["embeddings", "metadatas", "documents"])
+        if not page["ids"]:
+            break
+        target.upsert(
+            ids=page["ids"],
+            embeddings=page["embeddings"],
+            metadatas=page["metadatas"],
+            documents=page["documents"]
+        )
+        moved += len(page["ids"])
+        offset += len(page["ids"])
+    return moved
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^a-z0-9-]+", "-", value.lower()).strip("-")
@@ -13,9 +13,21 @@ async def parse_pdf(file: UploadFile) -> str:
     Returns:
         str: Văn bản đã được làm sạch
     """
-    try:
-        content = await file.read()
+    content = await file.read()
+    return extract_text_from_pdf(content)
+
+
+def extract_text_from_pdf(content: bytes) -> str:
+    """
+    Trích xuất văn bản từ nội dung PDF (đồng bộ, chạy được trong process pool)
+    
+    Args:
+        content: Nội dung file PDF
         
+    Returns:
+        str: Văn bản đã được làm sạch
+    """
+    try:
         text_content = []
         with pdfplumber.open(io.BytesIO(content)) as pdf:
             for page in pdf.pages:
@@ -0,0 +1,223 @@
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.services.metrics import PRESCREEN_RESULTS, PRESCREEN_REJECTIONS, PRESCREEN_CONFIDENCE
+
+VERDICTS = ("accept", "review", "reject")
+
+EMAIL_RE = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+PHONE_RE = re.compile(r"(?:\+?\d[\d .-]{7,}\d)")
+
+# Nhóm từ khóa section thường có trong CV (Anh + Việt), mỗi nhóm tính một lần
+SECTION_KEYWORDS = {
+    "experience": ["experience", "work history", "employment", "kinh nghiệm", "quá trình làm việc"],
+    "education": ["education", "university", "bachelor", "degree", "gpa", "học vấn", "đại học", "cử nhân"],
+    "skills": ["skills", "technologies", "tech stack", "kỹ năng", "công nghệ"],
+    "projects": ["project", "dự án"],
+    "summary": ["summary", "objective", "profile", "about me", "mục tiêu", "giới thiệu"],
+}
+
+# Dấu hiệu của loại tài liệu hay bị upload nhầm
+NEGATIVE_KEYWORDS = {
+    "invoice": ["invoice", "subtotal", "amount due", "vat", "tax id", "hóa đơn", "tổng cộng", "thành tiền", "mã số thuế"],
+    "letter": ["dear hiring", "dear sir", "sincerely", "yours faithfully", "kính gửi", "trân trọng"],
+    "contract": ["hereby agree", "terms and conditions", "hợp đồng", "điều khoản", "bên a", "bên b"],
+}
+
+# \b đầu từ: section chấp nhận số nhiều (projects), từ khóa âm phải khớp cả từ
+SECTION_PATTERNS = {
+    group: re.compile(r"\b(?:" + "|".join(map(re.escape, words)) + ")")
+    for group, words in SECTION_KEYWORDS.items()
+}
+NEGATIVE_PATTERNS = {
+    group: re.compile(r"\b(?:" + "|".join(map(re.escape, words)) + r")\b")
+    for group, words in NEGATIVE_KEYWORDS.items()
+}
+
+# Lý do từ chối (nhãn metric) -> thông báo trả về cho người dùng
+REASON_MESSAGES = {
+    "short_text": "nội dung quá ít chữ",
+    "low_density": "chủ yếu là số / ký tự đặc biệt",
+    "no_sections": "không thấy các mục của CV (kinh nghiệm, học vấn, kỹ năng, ...)",
+    "non_cv_keywords": "giống hóa đơn / thư / hợp đồng",
+    "not_similar": "nội dung không giống CV",
+    "low_confidence": "độ tin cậy thấp",
+}
+
+# Văn bản mẫu để so embedding: gần CV hơn tài liệu khác -> điểm similarity cao
+CV_PROTOTYPES = [
+    "Software engineer with 4 years of experience. Skills: Python, Java, SQL, Docker. "
+    "Education: Bachelor of Computer Science, GPA 3.5. Projects: e-commerce platform, data pipeline.",
+    "Curriculum vitae. Work experience: backend developer at a technology company. "
+    "Education: university degree. Technical skills and personal projects. Contact email and phone.",
+    "Resume of a data analyst: summary, professional experience, education, certifications, skills in SQL and Excel.",
+    "Hồ sơ ứng viên. Kinh nghiệm làm việc: lập trình viên 3 năm. Học vấn: Đại học Bách Khoa. Kỹ năng: Java, React. Dự án cá nhân.",
+]
+NON_CV_PROTOTYPES = [
+    "Invoice number 2024-001. Bill to customer. Item description, quantity, unit price, subtotal, VAT, total amount due.",
+    "Dear Hiring Manager, I am writing to express my interest in the position. I believe I would be a great fit. Sincerely.",
+    "This agreement is made between party A and party B. The parties hereby agree to the following terms and conditions.",
+    "Quarterly report: revenue grew 12 percent, operating costs decreased, the board approved the new budget.",
+    "Hóa đơn giá trị gia tăng. Tên hàng hóa, số lượng, đơn giá, thành tiền, thuế suất, tổng cộng tiền thanh toán.",
+]
+
+
+class ResumePrescreen:
+    """
+    Bộ lọc nhanh chạy ngay sau khi đọc PDF, trước khi tốn token LLM
+
+    confidence = trung bình có trọng số của 3 tín hiệu trong [0, 1]:
+        - density: đủ số từ, tỷ lệ chữ cái / chữ số giống văn bản (không
+          phải bảng số, file scan chỉ còn vài ký tự)
+        - keywords: số nhóm section CV xuất hiện (kinh nghiệm, học vấn, kỹ
+          năng, ...) và email / số điện thoại, trừ điểm khi gặp dấu hiệu
+          hóa đơn / thư / hợp đồng
+        - similarity: embedding gần các CV mẫu hơn các tài liệu mẫu khác
+
+    confidence < reject_below -> reject (400, không gọi LLM);
+    < review_below -> review (vẫn trích xuất, đánh dấu trong response).
+    """
+
+    SIGNALS = ("density", "keywords", "similarity")
+
+    DEFAULT_WEIGHTS = {
+        "density": 0.2,
+        "keywords": 0.4,
+        "similarity": 0.4,
+    }
+
+    def __init__(self, config: Optional[Dict] = None, embed: Optional[Callable[[List[str]], List[List[float]]]] = None):
+        """
+        Args:
+            config: Block `prescreen` trong config.yaml
+            embed: Hàm encode danh sách text (None = bỏ tín hiệu similarity)
+        """
+        config = config or {}
+
+        self.enabled = config.get("enabled", True)
+        self.reject_below = float(config.get("reject_below", 0.35))
+        self.review_below = float(config.get("review_below", 0.55))
+        self.min_words = max(1, int(config.get("min_words", 60)))
+        self.min_alpha_ratio = float(config.get("min_alpha_ratio", 0.55))
+        self.max_digit_ratio = float(config.get("max_digit_ratio", 0.3))
+        self.target_sections = max(1, int(config.get("target_sections", 3)))
+        self.max_embed_chars = int(config.get("max_embed_chars", 1500))
+        self.embed = embed if config.get("use_embeddings", True) else None
+
+        weights = {**self.DEFAULT_WEIGHTS, **(config.get("weights") or {})}
+        self.weights = {s: float(weights.get(s, 0.0)) for s in self.SIGNALS}
+        if sum(self.weights.values()) <= 0:
+            raise ValueError("Tổng trọng số prescreen phải > 0")
+
+        self._prototypes: Optional[tuple] = None
+        self._prototypes_lock = threading.Lock()
+
+    # ------------------------------------------------------------
+    # Signals
+    # ------------------------------------------------------------
+    def _density(self, text: str, words: List[str]) -> tuple:
+        chars = [c for c in text if not c.isspace()]
+        if not chars:
+            return 0.0, ["short_text"]
+
+        alpha_ratio = sum(c.isalpha() for c in chars) / len(chars)
+        digit_ratio = sum(c.isdigit() for c in chars) / len(chars)
+
+        score = min(len(words) / self.min_words, 1.0)
+        reasons = ["short_text"] if len(words) < self.min_words / 2 else []
+        if alpha_ratio < self.min_alpha_ratio or digit_ratio > self.max_digit_ratio:
+            score *= 0.5
+            reasons.append("low_density")
+        return score, reasons
+
+    def _keywords(self, lowered: str, text: str) -> tuple:
+        hits = [group for group, pattern in SECTION_PATTERNS.items() if pattern.search(lowered)]
+        contact = bool(EMAIL_RE.search(text) or PHONE_RE.search(text))
+        negatives = [group for group, pattern in NEGATIVE_PATTERNS.items() if pattern.search(lowered)]
+
+        score = min((len(hits) + 0.5 * contact) / self.target_sections, 1.0) - 0.25 * len(negatives)
+        reasons = []
+        if len(hits) < 2:
+            reasons.append("no_sections")
+        if negatives:
+            reasons.append("non_cv_keywords")
+        return min(max(score, 0.0), 1.0), reasons, negatives
+
+    def _prototype_matrices(self) -> tuple:
+        # Embed văn bản mẫu một lần, dùng lại cho mọi request
+        with self._prototypes_lock:
+            if self._prototypes is None:
+                vectors = _normalize(np.asarray(self.embed(CV_PROTOTYPES + NON_CV_PROTOTYPES), dtype=np.float32))
+                self._prototypes = (vectors[:len(CV_PROTOTYPES)], vectors[len(CV_PROTOTYPES):])
+            return self._prototypes
+
+    def _similarity(self, text: str) -> tuple:
+        cv_protos, other_protos = self._prototype_matrices()
+        query = _normalize(np.asarray(self.embed([text[:self.max_embed_chars]]), dtype=np.float32))[0]
+
+        margin = float((cv_protos @ query).max() - (other_protos @ query).max())
+        score = min(max(0.5 + 2.5 * margin, 0.0), 1.0)
+        return score, (["not_similar"] if margin < 0 else [])
+
+    # ------------------------------------------------------------
+    # Evaluate
+    # ------------------------------------------------------------
+    def evaluate(self, text: str) -> Dict:
+        """
+        Chấm điểm văn bản đọc từ PDF có phải CV hay không
+
+        Returns:
+            Dict: {"verdict", "confidence", "signals", "reasons", "document_type"}
+        """
+        text = re.sub(r"\s+", " ", text or "").strip()
+        lowered = text.lower()
+        words = text.split()
+
+        signals, reasons = {}, []
+        signals["density"], density_reasons = self._density(text, words)
+        signals["keywords"], keyword_reasons, negatives = self._keywords(lowered, text)
+        reasons += density_reasons + keyword_reasons
+
+        if self.embed is not None and self.weights["similarity"] > 0 and words:
+            signals["similarity"], similarity_reasons = self._similarity(text)
+            reasons += similarity_reasons
+
+        total_weight = sum(self.weights[s] for s in signals)
+        confidence = sum(self.weights[s] * signals[s] for s in signals) / total_weight if total_weight else 0.0
+
+        if confidence < self.reject_below:
+            verdict = "reject"
+        elif confidence < self.review_below:
+            verdict = "review"
+        else:
+            verdict = "accept"
+
+        PRESCREEN_RESULTS.labels(verdict).inc()
+        PRESCREEN_CONFIDENCE.observe(confidence)
+        if verdict == "reject":
+            for reason in reasons or ["low_confidence"]:
+                PRESCREEN_REJECTIONS.labels(reason).inc()
+
+        return {
+            "verdict": verdict,
+            "confidence": round(confidence, 4),
+            "signals": {s: round(v, 4) for s, v in signals.items()},
+            "reasons": reasons,
+            "document_type": negatives[0] if negatives else None
+        }
+
+
+def describe_reasons(reasons: List[str]) -> str:
+    """
+    Thông báo tiếng Việt cho danh sách lý do của evaluate()
+    """
+    return "; ".join(REASON_MESSAGES.get(r, r) for r in reasons) or REASON_MESSAGES["low_confidence"]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
@@ -0,0 +1,278 @@
+import os
+import re
+import sys
+import hmac
+import time
+import uuid
+import threading
+import contextvars
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+
+# Phiên profile của request hiện tại (None = request bình thường, không tốn gì thêm)
+_current: contextvars.ContextVar = contextvars.ContextVar("profile_session", default=None)
+
+
+def current_session() -> Optional["ProfileSession"]:
+    return _current.get()
+
+
+def record_step(step: str, seconds: float):
+    """
+    Ghi thời gian một bước vào phiên profile hiện tại (nếu có)
+    """
+    session = _current.get()
+    if session is not None:
+        session.add_timing(step, seconds)
+
+
+class ProfileSession:
+    """
+    Profile một request bằng cách lấy mẫu stack định kỳ
+
+    Chỉ lấy mẫu các thread đang làm việc cho request này: thread event loop
+    khi nó đang chạy coroutine của request (stack chứa frame đăng ký qua
+    `enter_task`; loop xen kẽ nhiều request nên không đăng ký cả thread) và
+    các thread của stage executor trong lúc chạy việc của request
+    (Stage.run đăng ký qua `track`). Process pool (parse PDF) không lấy mẫu
+    được, chỉ có thời gian tổng trong Server-Timing.
+    """
+
+    def __init__(self, label: str, interval: float = 0.005, max_depth: int = 128):
+        self.id = uuid.uuid4().hex[:8]
+        self.label = label
+        self.interval = interval
+        self.max_depth = max_depth
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_") or "request"
+        self.dump_name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_{slug}_{self.id}.folded"
+
+        self.started = time.perf_counter()
+        self.elapsed: Optional[float] = None
+        self.samples: Counter = Counter()
+        self.timings: Dict[str, List[float]] = {}
+
+        self._lock = threading.Lock()
+        self._threads: Dict[int, int] = {}
+        self._tasks: Dict[int, Any] = {}
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name=f"profiler-{self.id}", daemon=True)
+
+    # ------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self.started
+            self._stop.set()
+            self._sampler.join()
+
+    # ------------------------------------------------------------
+    # Thread tracking
+    # ------------------------------------------------------------
+    def enter_thread(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def exit_thread(self):
+        ident = threading.get_ident()
+        with self._lock:
+            remaining = self._threads.get(ident, 0) - 1
+            if remaining > 0:
+                self._threads[ident] = remaining
+            else:
+                self._threads.pop(ident, None)
+
+    def enter_task(self):
+        """
+        Lấy mẫu thread event loop khi stack của nó đi qua frame của hàm gọi
+        (coroutine của request); thời gian loop chạy request khác không tính
+        """
+        anchor = sys._getframe(1)
+        with self._lock:
+            self._tasks[threading.get_ident()] = anchor
+
+    def exit_task(self):
+        with self._lock:
+            self._tasks.pop(threading.get_ident(), None)
+
+    def track(self, fn: Callable) -> Callable:
+        """
+        Bọc fn để thread executor chạy nó được lấy mẫu trong lúc chạy
+        """
+        def tracked(*args, **kwargs):
+            self.enter_thread()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.exit_thread()
+        return tracked
+
+    # ------------------------------------------------------------
+    # Sampling
+    # ------------------------------------------------------------
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                idents = list(self._threads)
+                tasks = dict(self._tasks)
+            if not idents and not tasks:
+                continue
+
+            frames = sys._current_frames()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, anchor in tasks.items():
+                frame = frames.get(ident)
+                if ident not in idents and frame is not None and _on_stack(frame, anchor):
+                    idents.append(ident)
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.samples[self._fold(names.get(ident, str(ident)), frame)] += 1
+
+    def _fold(self, thread_name: str, frame) -> str:
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.append(thread_name)
+        # Dấu ";" là ký tự phân cách trong định dạng collapsed
+        return ";".join(part.replace(";", ":") for part in reversed(stack))
+
+    # ------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------
+    def add_timing(self, step: str, seconds: float):
+        with self._lock:
+            self.timings.setdefault(step, []).append(seconds)
+
+    def server_timing(self) -> str:
+        """
+        Header Server-Timing: tổng thời gian mỗi bước (ms), desc = số lần gọi
+        """
+        with self._lock:
+            timings = dict(self.timings)
+
+        parts = []
+        for step, values in timings.items():
+            part = f"{step};dur={sum(values) * 1000:.1f}"
+            if len(values) > 1:
+                part += f';desc="x{len(values)}"'
+            parts.append(part)
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+    def dump(self, path: str):
+        """
+        Ghi stack dạng collapsed ("frame;frame;frame count"), dùng được với
+        flamegraph.pl, speedscope hoặc inferno
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _on_stack(frame, anchor) -> bool:
+    while frame is not None:
+        if frame is anchor:
+            return True
+        frame = frame.f_back
+    return False
+
+
+class RequestProfiler:
+    """
+    Bật profile cho từng request khi có header `X-Profile` (hoặc query
+    `?profile=`) khớp admin token; tắt hẳn nếu không cấu hình token
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        config = config or {}
+
+        token_env = config.get("admin_token_env", "PROFILE_ADMIN_TOKEN")
+        self.admin_token = os.getenv(token_env) or config.get("admin_token")
+        self.enabled = bool(config.get("enabled", False)) and bool(self.admin_token)
+        self.output_dir = config.get("output_dir", "./data/profiles")
+        self.interval = float(config.get("interval_ms", 5)) / 1000
+        self.max_depth = int(config.get("max_depth", 128))
+        self._slots = threading.BoundedSemaphore(max(1, int(config.get("max_concurrent", 1))))
+
+        if self.enabled:
+            os.makedirs(self.output_dir, exist_ok=True)
+            print(f"🔬 Profiling theo request đã bật, dump tại {self.output_dir}")
+        elif config.get("enabled"):
+            print(f"⚠️ profiling.enabled nhưng chưa đặt {token_env}, bỏ qua")
+
+    def requested(self, scope) -> bool:
+        token = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-profile":
+                token = value.decode("latin-1")
+                break
+        if token is None and scope.get("query_string"):
+            token = (parse_qs(scope["query_string"].decode("latin-1")).get("profile") or [None])[0]
+
+        return token is not None and hmac.compare_digest(token.encode(), self.admin_token.encode())
+
+    def begin(self, label: str) -> Optional[ProfileSession]:
+        # Giới hạn số request profile đồng thời; hết chỗ thì chạy bình thường
+        if not self._slots.acquire(blocking=False):
+            return None
+        session = ProfileSession(label, interval=self.interval, max_depth=self.max_depth)
+        session.start()
+        return session
+
+    def finish(self, session: ProfileSession) -> str:
+        try:
+            session.stop()
+            path = os.path.join(self.output_dir, session.dump_name)
+            session.dump(path)
+            print(f"🔬 Đã ghi profile {path} ({sum(session.samples.values())} mẫu, {session.elapsed:.3f}s)")
+            return path
+        finally:
+            self._slots.release()
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware: request không yêu cầu profile đi thẳng xuống app
+
+    `get_profiler` trả về RequestProfiler (hoặc None trước khi startup xong /
+    khi tắt), để middleware có thể đăng ký ở module level.
+    """
+
+    def __init__(self, app, get_profiler: Callable[[], Optional[RequestProfiler]]):
+        self.app = app
+        self.get_profiler = get_profiler
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.get_profiler() if scope["type"] == "http" else None
+        if profiler is None or not profiler.enabled or not profiler.requested(scope):
+            return await self.app(scope, receive, send)
+
+        session = profiler.begin(f"{scope['method']} {scope['path']}")
+        if session is None:
+            return await self.app(scope, receive, send)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", session.server_timing().encode("latin-1")))
+                headers.append((b"x-profile-dump", session.dump_name.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current.set(session)
+        session.enter_task()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            session.exit_task()
+            profiler.finish(session)
@@ -0,0 +1,516 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.services.vector_store import collection_name_for_model
+from app.services.partitions import PartitionedCollection
+
+
+class ReindexJob:
+    """
+    Re-embed toàn bộ ứng viên khi đổi `embedding.model_name` (blue/green)
+
+    Quy trình:
+        1. Tạo collection shadow gắn tên model mới (candidates_<model>)
+        2. Duyệt collection đang phục vụ theo trang, dựng lại create_semantic_text
+           từ full profile, embed theo batch lớn rồi ghi vào shadow (có throttle)
+        3. Đối soát ID giữa hai collection (ứng viên thêm/xóa trong lúc chạy)
+        4. Embed lại các partition đã lưu trữ vào backend archive của shadow
+           (vẫn ở trạng thái lưu trữ sau khi chuyển)
+        5. Giữ write_lock, xử lý các ID vừa thay đổi rồi chuyển con trỏ
+           collection đang hoạt động một cách nguyên tử
+
+    Tiến độ được ghi vào file trạng thái sau mỗi batch; chạy lại cùng model
+    sẽ bỏ qua các ID đã có trong shadow nên job có thể tiếp tục sau khi dừng.
+    """
+
+    def __init__(self, vector_store, ai_engine, config: Optional[Dict] = None, state_path: Optional[str] = None):
+        config = config or {}
+
+        self.vector_store = vector_store
+        self.ai_engine = ai_engine
+        self.batch_size = int(config.get("batch_size", 256))
+        self.embed_batch_size = int(config.get("embed_batch_size", 64))
+        self.pause_seconds = float(config.get("pause_seconds", 0.2))
+        self.max_docs_per_second = float(config.get("max_docs_per_second", 0))
+        self.keep_previous = bool(config.get("keep_previous", True))
+        self.state_path = state_path or os.path.join(vector_store.data_dir, "reindex.json")
+
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._cancel = threading.Event()
+
+        # Đồng bộ section index (chạy độc lập với re-index collection)
+        self._sections_lock = threading.Lock()
+        self.sections_state: Dict = {"status": "idle"}
+
+        self.state = {"status": "idle"}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+            # Tiến trình trước bị dừng giữa chừng (restart) -> có thể tiếp tục
+            if self.state.get("status") in ("running", "switching"):
+                self.state["status"] = "interrupted"
+                self._save_state()
+
+    # ------------------------------------------------------------
+    # Control
+    # ------------------------------------------------------------
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                **self.state,
+                "active_collection": self.vector_store.collection.name,
+                "active_embedding_model": self.vector_store.embedding_model
+            }
+
+    def start(self, embedding_model: Optional[str] = None, keep_previous: Optional[bool] = None) -> Dict:
+        """
+        Chạy re-index trong background thread
+
+        Raises:
+            RuntimeError: Đang có job chạy
+            ValueError: Collection đang phục vụ đã dùng model này
+        """
+        with self._lock:
+            if self.is_running():
+                raise RuntimeError("Re-index đang chạy")
+
+            target_model = embedding_model or self.ai_engine.embedding_model_name
+            self._prepare(target_model, keep_previous)
+
+            self._cancel.clear()
+            self._thread = threading.Thread(
+                target=self._run_safely,
+                name="reindex",
+                daemon=True
+            )
+            self._thread.start()
+
+        return self.status()
+
+    def run(self, embedding_model: Optional[str] = None, keep_previous: Optional[bool] = None) -> Dict:
+        """
+        Chạy re-index đồng bộ (blocking)
+        """
+        with self._lock:
+            if self.is_running():
+                raise RuntimeError("Re-index đang chạy")
+            self._prepare(embedding_model or self.ai_engine.embedding_model_name, keep_previous)
+            self._cancel.clear()
+
+        self._run_safely()
+        return self.status()
+
+    def cancel(self) -> bool:
+        if not self.is_running():
+            return False
+        self._cancel.set()
+        return True
+
+    def _prepare(self, target_model: str, keep_previous: Optional[bool]):
+        target_collection = collection_name_for_model(target_model)
+        if target_collection == self.vector_store.collection.name:
+            raise ValueError(f"Collection đang phục vụ đã dùng model {target_model}")
+
+        resume = (
+            self.state.get("target_model") == target_model
+            and self.state.get("status") in ("interrupted", "cancelled", "failed")
+        )
+        now = _now()
+        self.state = {
+            "status": "running",
+            "target_model": target_model,
+            "target_collection": target_collection,
+            "source_collection": self.vector_store.collection.name,
+            "source_model": self.vector_store.embedding_model,
+            "keep_previous": self.keep_previous if keep_previous is None else keep_previous,
+            "resumed": resume,
+            "total": self.vector_store.collection.count(),
+            "processed": self.state.get("processed", 0) if resume else 0,
+            "embedded": self.state.get("embedded", 0) if resume else 0,
+            "skipped": 0,
+            "docs_per_second": None,
+            "eta_seconds": None,
+            "started_at": self.state.get("started_at", now) if resume else now,
+            "updated_at": now,
+            "finished_at": None,
+            "error": None
+        }
+        self._save_state()
+
+    # ------------------------------------------------------------
+    # Job
+    # ------------------------------------------------------------
+    def _run_safely(self):
+        try:
+            self._run()
+        except Exception as e:
+            print(f"❌ Re-index thất bại: {e}")
+            self._update(status="failed", error=str(e), finished_at=_now())
+        finally:
+            self.vector_store.track_changes(False)
+
+    def _run(self):
+        target_model = self.state["target_model"]
+        source = self.vector_store.collection
+        shadow = self.vector_store.open_collection(self.state["target_collection"], target_model)
+
+        print(f"🔁 Bắt đầu re-index {source.name} -> {shadow.name} ({target_model})")
+
+        # Ghi nhận save/delete trong lúc chạy để xử lý lại trước khi chuyển
+        self.vector_store.track_changes(True)
+
+        # 1. Pass chính: embed theo batch, bỏ qua ID đã có trong shadow (resume)
+        processed = 0
+        started = time.perf_counter()
+        offset = 0
+        while True:
+            if self._cancel.is_set():
+                self._update(status="cancelled", finished_at=_now())
+                print("⏹️ Re-index đã dừng, có thể chạy lại để tiếp tục")
+                return
+
+            batch_started = time.perf_counter()
+            page = source.get(limit=self.batch_size, offset=offset, include=["metadatas", "documents"])
+            if not page["ids"]:
+                break
+            offset += len(page["ids"])
+
+            existing = set(shadow.get(ids=page["ids"], include=[])["ids"])
+            rows = [
+                (cid, meta, doc)
+                for cid, meta, doc in zip(page["ids"], page["metadatas"], page["documents"])
+                if cid not in existing
+            ]
+            self._copy(rows, shadow, target_model)
+
+            processed += len(page["ids"])
+            elapsed = time.perf_counter() - started
+            rate = processed / elapsed if elapsed > 0 else None
+            total = max(source.count(), offset)
+            self._update(
+                processed=offset,
+                embedded=self.state["embedded"] + len(rows),
+                skipped=self.state["skipped"] + len(existing),
+                total=total,
+                docs_per_second=round(rate, 2) if rate else None,
+                eta_seconds=round((total - offset) / rate, 1) if rate else None
+            )
+
+            self._throttle(len(page["ids"]), time.perf_counter() - batch_started)
+
+        # 2. Đối soát: ứng viên thêm/xóa mà pass chính không thấy (kể cả trước khi restart)
+        source_ids = self._all_ids(source)
+        shadow_ids = self._all_ids(shadow)
+        self._sync_ids(source, shadow, target_model, source_ids - shadow_ids, shadow_ids - source_ids)
+
+        # 3. Partition đã lưu trữ: embed lại vào backend archive của collection mới
+        archived = self._copy_archived(source, shadow, target_model, offset)
+        if archived is None:
+            self._update(status="cancelled", finished_at=_now())
+            print("⏹️ Re-index đã dừng, có thể chạy lại để tiếp tục")
+            return
+
+        # 4. Chuyển collection: chặn ghi trong lúc xử lý các ID vừa thay đổi
+        self._update(status="switching")
+        with self.vector_store.write_lock:
+            if isinstance(source, PartitionedCollection) and source.archived_partitions() != archived:
+                raise RuntimeError("Partition được lưu trữ / khôi phục trong lúc re-index, hãy chạy lại")
+            changed = self.vector_store.track_changes(False)
+            if changed:
+                present = set(source.get(ids=list(changed), include=[])["ids"])
+                self._sync_ids(source, shadow, target_model, present, changed - present, overwrite=True)
+
+            self.vector_store.switch_collection(
+                shadow,
+                target_model,
+                keep_previous=self.state["keep_previous"]
+            )
+
+        self._update(
+            status="completed",
+            processed=shadow.count(),
+            total=shadow.count(),
+            eta_seconds=0,
+            finished_at=_now()
+        )
+        print(f"✅ Re-index hoàn tất: {shadow.count()} ứng viên trong {shadow.name}")
+
+        # Section index / watchlist vẫn mang vector của model cũ -> embed lại bằng model mới
+        self.sync_sections()
+        self.sync_watchlists()
+
+    def _copy_archived(self, source, shadow, target_model: str, processed: int) -> Optional[List[str]]:
+        """
+        Embed lại các partition đã lưu trữ của source vào backend archive của
+        shadow (không đưa vào fan-out), rồi ghi chúng vào manifest của shadow
+
+        Returns:
+            Optional[List[str]]: Các partition đã chép, None nếu bị hủy giữa chừng
+        """
+        if not isinstance(source, PartitionedCollection):
+            return []
+
+        partitions = source.archived_partitions()
+        for partition in partitions:
+            archive, target = source.archived_collection(partition), shadow.archived_collection(partition)
+            offset = 0
+            while True:
+                if self._cancel.is_set():
+                    return None
+
+                batch_started = time.perf_counter()
+                page = archive.get(limit=self.batch_size, offset=offset, include=["metadatas", "documents"])
+                if not page["ids"]:
+                    break
+                offset += len(page["ids"])
+
+                existing = set(target.get(ids=page["ids"], include=[])["ids"])
+                rows = [
+                    (cid, meta, doc)
+                    for cid, meta, doc in zip(page["ids"], page["metadatas"], page["documents"])
+                    if cid not in existing
+                ]
+                self._copy(rows, target, target_model)
+
+                processed += len(page["ids"])
+                self._update(
+                    processed=processed,
+                    embedded=self.state["embedded"] + len(rows),
+                    skipped=self.state["skipped"] + len(existing)
+                )
+                self._throttle(len(page["ids"]), time.perf_counter() - batch_started)
+
+            shadow.mark_archived(partition)
+            print(f"📦 Re-index đã chép partition lưu trữ {partition} ({offset} ứng viên)")
+        return partitions
+
+    def _copy(self, rows: List, shadow, target_model: str):
+        """
+        Embed lại (id, metadata, document) bằng model mới và ghi vào shadow
+        (hoặc collection archive của shadow)
+        """
+        if not rows:
+            return
+        texts = [self._semantic_text(cid, meta) for cid, meta, _ in rows]
+        embeddings = self.ai_engine.create_embeddings(
+            texts,
+            batch_size=self.embed_batch_size,
+            embedding_model=target_model
+        )
+        shadow.upsert(
+            ids=[cid for cid, _, _ in rows],
+            embeddings=embeddings,
+            metadatas=[meta for _, meta, _ in rows],
+            documents=[doc for _, _, doc in rows]
+        )
+
+    def _sync_ids(self, source, shadow, target_model: str, upsert_ids, delete_ids, overwrite: bool = False):
+        if delete_ids:
+            shadow.delete(ids=list(delete_ids))
+
+        upsert_ids = list(upsert_ids)
+        for i in range(0, len(upsert_ids), self.batch_size):
+            page = source.get(ids=upsert_ids[i:i + self.batch_size], include=["metadatas", "documents"])
+            self._copy(list(zip(page["ids"], page["metadatas"], page["documents"])), shadow, target_model)
+
+        if upsert_ids or delete_ids:
+            label = "thay đổi trong lúc chuyển" if overwrite else "lệch sau pass chính"
+            print(f"🔁 Re-index đồng bộ {len(upsert_ids)} thêm / {len(delete_ids)} xóa ({label})")
+
+    def _semantic_text(self, candidate_id: str, metadata: Dict) -> str:
+        """
+        Dựng lại semantic text như lúc ingest, ưu tiên full profile
+        """
+        return self.ai_engine.create_semantic_text(self._profile(candidate_id, metadata))
+
+    def _profile(self, candidate_id: str, metadata: Dict) -> Dict:
+        """
+        Full profile đã lưu lúc ingest, thiếu thì dựng tạm từ metadata
+        """
+        profile_path = f"./data/full_profiles/{candidate_id}.json"
+        if os.path.exists(profile_path):
+            with open(profile_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        return {
+            "role": metadata.get("role", "N/A"),
+            "skills": [s.strip() for s in str(metadata.get("skills_list") or "").split(",") if s.strip()],
+            "years_exp": metadata.get("years_exp", 0),
+            "education": ""
+        }
+
+    # ------------------------------------------------------------
+    # Section index
+    # ------------------------------------------------------------
+    def sync_sections(self) -> Dict:
+        """
+        Đồng bộ section index với collection đang phục vụ: embed section cho
+        ứng viên còn thiếu và bỏ ứng viên đã xóa; dựng lại toàn bộ khi index
+        hỏng hoặc được tạo bằng model khác (sau re-index)
+
+        Returns:
+            Dict: Trạng thái lần đồng bộ (added, removed, rebuilt)
+        """
+        sections = self.vector_store.sections
+        if sections is None:
+            return {"status": "disabled"}
+
+        with self._sections_lock:
+            model = self.vector_store.embedding_model
+            rebuild = not sections.healthy or bool(
+                sections.embedding_model and sections.embedding_model != model
+            )
+            if not rebuild and len(sections) == self.vector_store._searchable_count():
+                return self.sections_state
+
+            self.sections_state = {"status": "running", "rebuild": rebuild, "started_at": _now()}
+            print(f"🧩 Đang {'dựng lại' if rebuild else 'đồng bộ'} section index ({model})...")
+            try:
+                added, removed = 0, 0
+                if rebuild:
+                    entries = []
+                    for rows in self._pages_missing(set()):
+                        entries.extend(self._embed_sections(rows, model))
+                    sections.rebuild(entries, model)
+                    added = len(entries)
+
+                # Ứng viên thêm / xóa trong lúc dựng lại (hoặc khi index còn tắt)
+                collection_ids = set()
+                for rows in self._pages_missing(sections.ids(), collection_ids):
+                    for candidate_id, kinds, embeddings in self._embed_sections(rows, model):
+                        sections.add(candidate_id, kinds, embeddings, embedding_model=model)
+                        added += 1
+                for candidate_id in sections.ids() - collection_ids:
+                    sections.remove(candidate_id)
+                    removed += 1
+
+                self.vector_store.bump_generation()
+                self.sections_state = {
+                    "status": "completed",
+                    "rebuild": rebuild,
+                    "added": added,
+                    "removed": removed,
+                    "finished_at": _now()
+                }
+                print(f"✅ Section index: {len(sections)} ứng viên (+{added} / -{removed})")
+            except Exception as e:
+                print(f"❌ Đồng bộ section index thất bại: {e}")
+                self.sections_state = {"status": "failed", "rebuild": rebuild, "error": str(e), "finished_at": _now()}
+            return self.sections_state
+
+    def sync_watchlists(self) -> int:
+        """
+        Embed lại JD của các watchlist tạo bằng model khác collection đang phục vụ
+
+        Returns:
+            int: Số watchlist đã cập nhật
+        """
+        stale = self.vector_store.stale_watchlists()
+        if not stale:
+            return 0
+
+        model = self.vector_store.embedding_model
+        try:
+            embeddings = self.ai_engine.create_embeddings(
+                [item["jd_text"] for item in stale],
+                batch_size=self.embed_batch_size,
+                embedding_model=model
+            )
+            for item, embedding in zip(stale, embeddings):
+                self.vector_store.set_watchlist_embedding(item["id"], embedding, model)
+            print(f"✅ Đã embed lại {len(stale)} watchlist bằng {model}")
+        except Exception as e:
+            print(f"❌ Embed lại watchlist thất bại: {e}")
+            return 0
+        return len(stale)
+
+    def _pages_missing(self, existing: set, seen: Optional[set] = None):
+        """
+        Duyệt collection theo trang, trả về (id, metadata) chưa có trong `existing`
+        """
+        source = self.vector_store.collection
+        offset = 0
+        while True:
+            page = source.get(limit=self.batch_size, offset=offset, include=["metadatas"])
+            if not page["ids"]:
+                return
+            offset += len(page["ids"])
+            if seen is not None:
+                seen.update(page["ids"])
+
+            rows = [(cid, meta) for cid, meta in zip(page["ids"], page["metadatas"]) if cid not in existing]
+            if rows:
+                yield rows
+                self._throttle(len(rows), 0.0)
+
+    def _embed_sections(self, rows: List, embedding_model: str) -> List:
+        """
+        Embed section của nhiều ứng viên trong một lần gọi embedder
+
+        Returns:
+            List: (candidate_id, kinds, embeddings) cho từng ứng viên có section
+        """
+        per_candidate = [
+            (cid, self.ai_engine.create_section_texts(self._profile(cid, meta)))
+            for cid, meta in rows
+        ]
+        texts = [text for _, sections in per_candidate for _, text in sections]
+        embeddings = self.ai_engine.create_embeddings(
+            texts,
+            batch_size=self.embed_batch_size,
+            embedding_model=embedding_model
+        )
+
+        out, pos = [], 0
+        for cid, sections in per_candidate:
+            if sections:
+                out.append((cid, [kind for kind, _ in sections], embeddings[pos:pos + len(sections)]))
+            pos += len(sections)
+        return out
+
+    def _all_ids(self, collection) -> set:
+        ids = set()
+        offset = 0
+        while True:
+            page = collection.get(limit=self.batch_size * 4, offset=offset, include=[])
+            if not page["ids"]:
+                return ids
+            ids.update(page["ids"])
+            offset += len(page["ids"])
+
+    def _throttle(self, docs: int, elapsed: float):
+        """
+        Nghỉ giữa các batch để không tranh CPU với request đang phục vụ
+        """
+        wait = self.pause_seconds
+        if self.max_docs_per_second > 0:
+            wait = max(wait, docs / self.max_docs_per_second - elapsed)
+        if wait > 0:
+            self._cancel.wait(wait)
+
+    # ------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------
+    def _update(self, **changes):
+        with self._lock:
+            self.state.update(changes)
+            self.state["updated_at"] = _now()
+            self._save_state()
+
+    def _save_state(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.state_path)
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,105 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class Reranker:
+    """
+    Xếp hạng lại kết quả vector search bằng nhiều tín hiệu có cấu trúc
+
+    score = sum(weight_i * signal_i), với mỗi signal chuẩn hóa về [0, 1]:
+        - similarity: 1 - distance (hoặc score đã trộn của hybrid/lexical)
+        - gpa: GPA trung bình (thang 4 hoặc thang 10)
+        - project_score: điểm dự án trung bình (0-10)
+        - years_exp: số năm kinh nghiệm, bão hòa tại years_exp_cap
+
+    Trọng số được chuẩn hóa để tổng bằng 1 nên score cuối vẫn nằm trong [0, 1].
+    """
+
+    SIGNALS = ("similarity", "gpa", "project_score", "years_exp")
+
+    DEFAULT_WEIGHTS = {
+        "similarity": 0.7,
+        "gpa": 0.1,
+        "project_score": 0.1,
+        "years_exp": 0.1,
+    }
+
+    def __init__(self, config: Optional[Dict] = None):
+        config = config or {}
+
+        self.enabled = config.get("enabled", False)
+        self.overfetch = max(1, int(config.get("overfetch", 4)))
+        self.gpa_max = float(config.get("gpa_max", 4.0))
+        self.gpa_alt_max = float(config.get("gpa_alt_max", 10.0))
+        self.project_score_max = float(config.get("project_score_max", 10.0))
+        self.years_exp_cap = float(config.get("years_exp_cap", 10.0))
+
+        weights = {**self.DEFAULT_WEIGHTS, **(config.get("weights") or {})}
+        w = np.array([float(weights.get(s, 0.0)) for s in self.SIGNALS])
+        if w.sum() <= 0:
+            raise ValueError("Tổng trọng số rerank phải > 0")
+        self.weights = w / w.sum()
+
+    def fetch_size(self, top_k: int) -> int:
+        """
+        Số kết quả cần lấy từ vector store trước khi rerank
+        """
+        return top_k * self.overfetch
+
+    def rerank(self, results: Dict, top_k: int) -> Dict:
+        """
+        Rerank kết quả một query (format Chroma) trong một lượt NumPy
+
+        Args:
+            results: Kết quả search_candidates / hybrid_search / lexical_search
+            top_k: Số lượng kết quả giữ lại
+
+        Returns:
+            Dict: Cùng format, sắp xếp lại, kèm `scores` và `score_breakdown`
+        """
+        if not results.get("ids") or not results["ids"][0]:
+            return {**results, "scores": [[]], "score_breakdown": [[]]}
+
+        metadatas = results["metadatas"][0]
+
+        if results.get("scores"):
+            similarity = np.asarray(results["scores"][0], dtype=np.float64)
+        else:
+            similarity = 1.0 - np.asarray(results["distances"][0], dtype=np.float64)
+
+        gpa = np.array([_to_float(m.get("gpa")) for m in metadatas])
+        project_score = np.array([_to_float(m.get("project_score")) for m in metadatas])
+        years_exp = np.array([_to_float(m.get("years_exp")) for m in metadatas])
+
+        features = np.column_stack([
+            similarity,
+            np.where(gpa <= self.gpa_max, gpa / self.gpa_max, gpa / self.gpa_alt_max),
+            project_score / self.project_score_max,
+            years_exp / self.years_exp_cap,
+        ])
+        np.clip(features, 0.0, 1.0, out=features)
+
+        contributions = features * self.weights
+        total = contributions.sum(axis=1)
+
+        order = np.argsort(-total, kind="stable")[:top_k]
+
+        reranked = {
+            key: [[results[key][0][i] for i in order]]
+            for key in ("ids", "metadatas", "documents", "distances", "matched_sections")
+            if results.get(key)
+        }
+        reranked["scores"] = [total[order].tolist()]
+        reranked["score_breakdown"] = [[
+            {signal: round(float(value), 4) for signal, value in zip(self.SIGNALS, contributions[i])}
+            for i in order
+        ]]
+        return reranked
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,108 @@
+import re
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+
+def normalize_text(text: str) -> str:
+    """
+    Gộp khoảng trắng để các JD chỉ khác định dạng dùng chung một khóa cache
+    """
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def normalize_list(values: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """
+    Danh sách không phân biệt thứ tự / hoa thường (skills, partitions)
+    """
+    return tuple(sorted({v.strip().lower() for v in values or [] if v and v.strip()}))
+
+
+class SearchCache:
+    """
+    Cache LRU có giới hạn cho kết quả /api/search
+
+    Mỗi entry ghi lại `generation` của VectorStore lúc tính; save/delete làm
+    tăng generation nên entry cũ tự bị bỏ khi tra cứu, không bao giờ trả
+    kết quả đã lỗi thời.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[int, Any, int]]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, generation: int) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if entry[0] != generation:
+                self._drop(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, generation: int, value: Any):
+        size = _approx_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (generation, value, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, key: Hashable):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+def _approx_size(value: Any) -> int:
+    """
+    Ước lượng bộ nhớ của một kết quả qua kích thước JSON (đủ để giới hạn cache)
+    """
+    if hasattr(value, "json"):
+        return len(value.json())
+    return len(json.dumps(value, ensure_ascii=False, default=str))
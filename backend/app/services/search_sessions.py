@@ -0,0 +1,245 @@
+import json
+import time
+import base64
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class InvalidCursor(ValueError):
+    """
+    Cursor không giải mã được (bị sửa / không phải do server cấp)
+    """
+
+
+class SearchSessionExpired(KeyError):
+    """
+    Session của cursor đã hết hạn hoặc bị bỏ (LRU / khởi động lại)
+    """
+
+
+class SearchSession:
+    """
+    Kết quả xếp hạng sẵn của một lần tìm kiếm, phục vụ các trang tiếp theo
+
+    Chỉ chứa dữ liệu (JSON được) để lưu được trong storage process: `spec`
+    là tham số truy vấn (kèm embedding JD) để lấy sâu hơn mà không embed lại
+    JD; `ranking` là các CandidateMatch dạng dict.
+    """
+
+    __slots__ = ("id", "query_info", "spec", "ranking", "fetched", "exhausted", "generation", "expires_at")
+
+    def __init__(self, session_id: str, query_info: Dict, spec: Dict, ranking: List[Dict], fetched: int,
+                 exhausted: bool, generation: int, expires_at: float):
+        self.id = session_id
+        self.query_info = query_info
+        self.spec = spec
+        self.ranking = ranking
+        self.fetched = fetched
+        # Vector store đã trả hết ứng viên (tính trước các bộ lọc sau như skills,
+        # metadata): lấy sâu hơn cũng không có thêm kết quả
+        self.exhausted = exhausted
+        self.generation = generation
+        self.expires_at = expires_at
+
+    def extend(self, ranking: List[Dict], fetched: int, exhausted: bool):
+        """
+        Nối kết quả của lần lấy sâu hơn, giữ nguyên thứ tự các trang đã trả
+        (ANN có thể xếp khác đôi chút khi n lớn hơn)
+        """
+        seen = {match["id"] for match in self.ranking}
+        self.ranking.extend(match for match in ranking if match["id"] not in seen)
+        self.exhausted = exhausted
+        self.fetched = fetched
+
+
+class SearchSessions:
+    """
+    Session tìm kiếm có TTL cho phân trang sâu bằng cursor
+
+    Trang đầu lấy dư `initial_depth` kết quả và lưu lại; các trang sau cắt từ
+    danh sách đã xếp hạng, không embed JD hay query ANN lại. Đọc quá phần đã
+    có thì `read` trả yêu cầu lấy sâu gấp đôi (tới `max_depth`); API worker
+    chạy truy vấn theo `spec` đã lưu rồi gửi lại bằng `extend` (xem read_page).
+
+    Kết quả là ảnh chụp lúc tạo session: ứng viên thêm / xóa sau đó không
+    làm xê dịch các trang. Với storage.mode: remote, session nằm trong
+    storage process (RemoteSearchSessions) nên mọi API worker đọc được cùng
+    một cursor.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        """
+        Args:
+            config: Block `search_sessions` trong config.yaml
+        """
+        config = config or {}
+
+        self.enabled = config.get("enabled", True)
+        self.ttl_seconds = float(config.get("ttl_seconds", 600))
+        self.max_sessions = max(1, int(config.get("max_sessions", 256)))
+        self.max_page_size = max(1, int(config.get("max_page_size", 50)))
+        self.max_depth = max(self.max_page_size, int(config.get("max_depth", 1000)))
+        self.initial_depth = min(max(self.max_page_size, int(config.get("initial_depth", 200))), self.max_depth)
+
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, SearchSession]" = OrderedDict()
+
+        self.created = 0
+        self.pages = 0
+        self.extends = 0
+        self.expired = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------
+    # Cursor
+    # ------------------------------------------------------------
+    @staticmethod
+    def encode_cursor(session_id: str, offset: int) -> str:
+        raw = json.dumps([session_id, offset], separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[str, int]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            session_id, offset = json.loads(raw)
+            if not isinstance(session_id, str) or not isinstance(offset, int) or offset < 0:
+                raise ValueError(cursor)
+            return session_id, offset
+        except Exception:
+            raise InvalidCursor(cursor)
+
+    # ------------------------------------------------------------
+    # Sessions
+    # ------------------------------------------------------------
+    def create(self, query_info: Dict, spec: Dict, ranking: List[Dict], fetched: int,
+               exhausted: bool, generation: int) -> str:
+        """
+        Returns:
+            str: cursor của trang đầu (offset 0)
+        """
+        session = SearchSession(
+            secrets.token_urlsafe(12), query_info, spec, list(ranking), fetched, exhausted, generation,
+            time.monotonic() + self.ttl_seconds
+        )
+        with self._lock:
+            self._purge()
+            self._sessions[session.id] = session
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        return self.encode_cursor(session.id, 0)
+
+    def _resolve(self, session_id: str) -> SearchSession:
+        # Gọi khi đang giữ lock; mỗi lần đọc gia hạn TTL
+        now = time.monotonic()
+        session = self._sessions.get(session_id)
+        if session is None or session.expires_at <= now:
+            if session is not None:
+                del self._sessions[session_id]
+                self.expired += 1
+            raise SearchSessionExpired(session_id)
+        session.expires_at = now + self.ttl_seconds
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def read(self, cursor: str, limit: Optional[int] = None) -> Dict:
+        """
+        Đọc một trang từ cursor (limit mặc định = top_k lúc tạo session)
+
+        Returns:
+            Dict: {"matches", "next_cursor", "offset", "query_info", "generation"},
+                hoặc {"extend": {"session_id", "spec", "depth"}} khi cần lấy
+                sâu hơn trước (gọi `extend` rồi `read` lại)
+
+        Raises:
+            InvalidCursor, SearchSessionExpired
+        """
+        session_id, offset = self.decode_cursor(cursor)
+
+        with self._lock:
+            session = self._resolve(session_id)
+            limit = min(max(1, limit or session.query_info.get("top_k", 10)), self.max_page_size)
+            end = offset + limit
+            if end > len(session.ranking) and not session.exhausted and session.fetched < self.max_depth:
+                depth = min(max(session.fetched * 2, end), self.max_depth)
+                return {"extend": {"session_id": session.id, "spec": session.spec, "depth": depth}}
+
+            self.pages += 1
+            matches = session.ranking[offset:end]
+            has_more = end < len(session.ranking) or (not session.exhausted and session.fetched < self.max_depth)
+            return {
+                "matches": matches,
+                "next_cursor": self.encode_cursor(session.id, end) if has_more and matches else None,
+                "offset": offset,
+                "query_info": session.query_info,
+                "generation": session.generation
+            }
+
+    def extend(self, session_id: str, ranking: List[Dict], fetched: int, exhausted: bool):
+        """
+        Nối kết quả lấy sâu hơn (`depth` của yêu cầu extend) vào session
+        """
+        with self._lock:
+            session = self._resolve(session_id)
+            if fetched > session.fetched:
+                session.extend(ranking, fetched, exhausted)
+                self.extends += 1
+
+    def _purge(self):
+        now = time.monotonic()
+        for session_id in [sid for sid, s in self._sessions.items() if s.expires_at <= now]:
+            del self._sessions[session_id]
+            self.expired += 1
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._purge()
+            return {
+                "enabled": self.enabled,
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "initial_depth": self.initial_depth,
+                "max_depth": self.max_depth,
+                "created": self.created,
+                "pages": self.pages,
+                "extends": self.extends,
+                "expired": self.expired,
+                "evictions": self.evictions
+            }
+
+
+async def read_page(
+    run: Callable[..., Awaitable[Any]],
+    sessions: SearchSessions,
+    cursor: str,
+    limit: Optional[int],
+    fetch: Callable[[Dict, int], Awaitable[Tuple[List[Dict], bool]]]
+) -> Dict:
+    """
+    Đọc một trang, lấy sâu hơn bằng `fetch(spec, depth)` khi session yêu cầu
+
+    Args:
+        run: Chạy hàm blocking (StagePool.run của stage search): với
+            RemoteSearchSessions mỗi lần đọc là một lượt gọi storage server
+        fetch: Truy vấn lại theo spec đã lưu -> (ranking dạng dict, exhausted)
+
+    Returns:
+        Dict: Kết quả `SearchSessions.read` (không còn yêu cầu extend)
+    """
+    page = await run(sessions.read, cursor, limit)
+    # Mỗi vòng fetched tăng gấp đôi tới max_depth: số vòng có giới hạn
+    while "extend" in page:
+        request = page["extend"]
+        ranking, exhausted = await fetch(request["spec"], request["depth"])
+        await run(sessions.extend, request["session_id"], ranking, request["depth"], exhausted)
+        page = await run(sessions.read, cursor, limit)
+    return page
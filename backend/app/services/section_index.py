@@ -0,0 +1,363 @@
+import os
+import json
+import base64
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Thứ tự cố định: các dòng của một ứng viên luôn được sắp theo loại section
+SECTION_KINDS = ("summary", "skills", "project", "education")
+SCORING_MODES = ("max", "weighted")
+
+
+class SectionIndexUnavailable(RuntimeError):
+    """
+    Section index chưa bật hoặc chưa đồng bộ với collection đang phục vụ
+    """
+
+
+def _encode_vectors(vectors: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(vectors, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _decode_vectors(data: str, dim: int) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32).reshape(-1, dim)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class SectionIndex:
+    """
+    Index vector theo từng section của CV (summary, skills, từng project,
+    từng education), mỗi dòng gắn với ID ứng viên
+
+    Các dòng của một ứng viên nằm liền nhau và sắp theo SECTION_KINDS nên
+    tìm kiếm gom điểm theo ứng viên bằng một lần nhân ma trận + reduceat,
+    không lặp Python theo ứng viên:
+        - max: điểm = cosine lớn nhất trong mọi section
+        - weighted: max theo từng loại section, rồi trung bình có trọng số
+          trên các loại ứng viên có
+
+    Lưu trữ: snapshot .npz + journal (JSON lines, vector base64), gộp sau
+    `snapshot_every` thao tác. Index gắn với model embedding đã tạo vector.
+    """
+
+    def __init__(self, state_dir: str = "./data/section_index", snapshot_every: int = 200):
+        self.state_dir = state_dir
+        self.snapshot_path = os.path.join(state_dir, "snapshot.npz")
+        self.journal_path = os.path.join(state_dir, "journal.log")
+        self.snapshot_every = snapshot_every
+
+        self._lock = threading.Lock()
+        self._reset()
+
+        # False khi snapshot / journal hỏng: cần sync lại từ full profile
+        self.healthy = True
+        os.makedirs(state_dir, exist_ok=True)
+        self._load()
+
+    def _reset(self, embedding_model: Optional[str] = None):
+        self.embedding_model = embedding_model
+        self.dim: Optional[int] = None
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._owner = np.zeros(0, dtype=np.int32)     # slot ứng viên, -1 = dòng đã xóa
+        self._kind = np.zeros(0, dtype=np.int8)
+        self._size = 0
+        self._dead = 0
+        self._candidates: List[str] = []              # slot -> ID ứng viên
+        self._rows: Dict[str, Tuple[int, int]] = {}   # ID -> (dòng đầu, dòng cuối + 1)
+        self._journal_ops = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, candidate_id: str) -> bool:
+        return candidate_id in self._rows
+
+    def ids(self) -> set:
+        with self._lock:
+            return set(self._rows)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            kinds = self._kind[:self._size][self._owner[:self._size] >= 0]
+            return {
+                "candidates": len(self._rows),
+                "sections": int(self._size - self._dead),
+                "per_kind": {
+                    kind: int(np.count_nonzero(kinds == i)) for i, kind in enumerate(SECTION_KINDS)
+                },
+                "embedding_model": self.embedding_model,
+                "healthy": self.healthy
+            }
+
+    # ------------------------------------------------------------
+    # Write
+    # ------------------------------------------------------------
+    def add(self, candidate_id: str, kinds: List[str], embeddings, embedding_model: Optional[str] = None):
+        """
+        Ghi (hoặc thay) các section của một ứng viên
+
+        Args:
+            candidate_id: ID ứng viên
+            kinds: Loại của từng section (phần tử của SECTION_KINDS)
+            embeddings: Vector tương ứng (cùng thứ tự với kinds)
+            embedding_model: Model đã tạo vector; khác model của index thì bỏ qua
+                (index sẽ được dựng lại sau re-index)
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if not len(kinds) or vectors.ndim != 2 or len(vectors) != len(kinds):
+            return
+
+        with self._lock:
+            if embedding_model and self.embedding_model and embedding_model != self.embedding_model:
+                return
+            if self.dim is not None and vectors.shape[1] != self.dim:
+                return
+            self._apply_add(candidate_id, kinds, vectors, embedding_model)
+            self._append_journal({
+                "op": "add",
+                "id": candidate_id,
+                "kinds": list(kinds),
+                "model": embedding_model,
+                "dim": int(vectors.shape[1]),
+                "vectors": _encode_vectors(vectors)
+            })
+
+    def remove(self, candidate_id: str):
+        with self._lock:
+            if candidate_id not in self._rows:
+                return
+            self._apply_remove(candidate_id)
+            self._append_journal({"op": "remove", "id": candidate_id})
+
+    def rebuild(self, entries: Iterable[Tuple[str, List[str], List]], embedding_model: Optional[str]):
+        """
+        Dựng lại toàn bộ index từ (candidate_id, kinds, embeddings)
+        """
+        with self._lock:
+            self._reset(embedding_model)
+            for candidate_id, kinds, embeddings in entries:
+                vectors = np.asarray(embeddings, dtype=np.float32)
+                if len(kinds) and vectors.ndim == 2:
+                    self._apply_add(candidate_id, kinds, vectors, embedding_model)
+            self._snapshot()
+            self.healthy = True
+
+    def _apply_add(self, candidate_id: str, kinds: List[str], vectors: np.ndarray, embedding_model: Optional[str]):
+        if candidate_id in self._rows:
+            self._apply_remove(candidate_id)
+
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        if self.embedding_model is None:
+            self.embedding_model = embedding_model
+
+        kind_ids = np.array([SECTION_KINDS.index(k) for k in kinds], dtype=np.int8)
+        order = np.argsort(kind_ids, kind="stable")
+
+        slot = len(self._candidates)
+        self._candidates.append(candidate_id)
+
+        start, count = self._size, len(kinds)
+        self._ensure_capacity(start + count)
+        self._vectors[start:start + count] = _normalize(vectors[order])
+        self._kind[start:start + count] = kind_ids[order]
+        self._owner[start:start + count] = slot
+        self._size += count
+        self._rows[candidate_id] = (start, start + count)
+
+    def _apply_remove(self, candidate_id: str):
+        start, end = self._rows.pop(candidate_id)
+        # Chỉ đánh dấu xóa: mảng có thể đang được một search đọc song song
+        self._owner[start:end] = -1
+        self._dead += end - start
+
+    def _ensure_capacity(self, needed: int):
+        capacity = len(self._owner)
+        if needed <= capacity and self._vectors.shape[1] == self.dim:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        owner = np.full(capacity, -1, dtype=np.int32)
+        kind = np.zeros(capacity, dtype=np.int8)
+        if self._size:
+            vectors[:self._size] = self._vectors[:self._size]
+            owner[:self._size] = self._owner[:self._size]
+            kind[:self._size] = self._kind[:self._size]
+        self._vectors, self._owner, self._kind = vectors, owner, kind
+
+    def _compact(self):
+        """
+        Bỏ các dòng đã xóa và slot ứng viên không còn dùng (tạo mảng mới)
+        """
+        live = self._owner[:self._size] >= 0
+        old_owner = self._owner[:self._size][live]
+        vectors = self._vectors[:self._size][live]
+        kind = self._kind[:self._size][live]
+
+        slots, owner = np.unique(old_owner, return_inverse=True)
+        self._candidates = [self._candidates[s] for s in slots]
+        self._vectors = vectors.copy() if self.dim else np.zeros((0, 0), dtype=np.float32)
+        self._owner = owner.astype(np.int32)
+        self._kind = kind.copy()
+        self._size = len(self._owner)
+        self._dead = 0
+
+        self._rows = {}
+        if self._size:
+            starts = np.flatnonzero(np.r_[True, self._owner[1:] != self._owner[:-1]])
+            ends = np.r_[starts[1:], self._size]
+            for s, e in zip(starts, ends):
+                self._rows[self._candidates[self._owner[s]]] = (int(s), int(e))
+
+    # ------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------
+    def search(
+        self,
+        query_embedding: List[float],
+        n_results: int = 10,
+        scoring: str = "max",
+        weights: Optional[Dict[str, float]] = None
+    ) -> List[Tuple[str, float, str]]:
+        """
+        Tìm ứng viên theo section gần nhất với query
+
+        Args:
+            query_embedding: Vector của JD
+            n_results: Số ứng viên trả về
+            scoring: max | weighted
+            weights: Trọng số theo loại section (scoring = weighted)
+
+        Returns:
+            List[Tuple[str, float, str]]: (ID, điểm cosine, loại section khớp nhất)
+        """
+        if scoring not in SCORING_MODES:
+            raise ValueError(f"scoring không hợp lệ: {scoring}")
+
+        with self._lock:
+            size = self._size
+            vectors, owner, kind, candidates = self._vectors, self._owner, self._kind, self._candidates
+        if not size or self.dim is None:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.shape != (self.dim,):
+            raise ValueError(f"Query có {query.shape[-1]} chiều, section index dùng {self.dim} chiều")
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        owner = owner[:size].copy()
+        live = owner >= 0
+        if not live.any():
+            return []
+        sims = (vectors[:size] @ query)[live]
+        owner, kind = owner[live], kind[:size][live]
+
+        # Dòng liền nhau cùng (ứng viên, loại) -> max theo từng loại section
+        key = owner.astype(np.int64) * len(SECTION_KINDS) + kind
+        key_starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+        kind_best = np.maximum.reduceat(sims, key_starts)
+        kind_owner = owner[key_starts]
+        kind_ids = kind[key_starts]
+
+        cand_starts = np.flatnonzero(np.r_[True, kind_owner[1:] != kind_owner[:-1]])
+        cand_slots = kind_owner[cand_starts]
+        cand_best = np.maximum.reduceat(kind_best, cand_starts)
+
+        if scoring == "max":
+            scores = cand_best
+        else:
+            weights = weights or {}
+            kind_weights = np.array([float(weights.get(k, 1.0)) for k in SECTION_KINDS], dtype=np.float32)
+            w = kind_weights[kind_ids]
+            total_w = np.add.reduceat(w, cand_starts)
+            scores = np.add.reduceat(w * kind_best, cand_starts) / np.where(total_w > 0, total_w, 1.0)
+
+        # Loại section có cosine cao nhất của mỗi ứng viên (để giải thích kết quả)
+        lengths = np.diff(np.r_[cand_starts, len(kind_best)])
+        positions = np.where(kind_best == np.repeat(cand_best, lengths), np.arange(len(kind_best)), len(kind_best))
+        best_pos = np.minimum.reduceat(positions, cand_starts)
+
+        k = min(n_results, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [
+            (candidates[cand_slots[i]], float(scores[i]), SECTION_KINDS[kind_ids[best_pos[i]]])
+            for i in top
+        ]
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+    def _append_journal(self, entry: Dict):
+        try:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._journal_ops += 1
+
+            if self._journal_ops >= self.snapshot_every:
+                self._snapshot()
+        except Exception as e:
+            print(f"⚠️ Lỗi khi ghi journal section index: {e}")
+
+    def _snapshot(self):
+        self._compact()
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                vectors=self._vectors[:self._size],
+                owner=self._owner[:self._size],
+                kind=self._kind[:self._size],
+                candidates=np.array(self._candidates, dtype=str),
+                embedding_model=np.array(self.embedding_model or ""),
+                dim=np.array(self.dim or 0)
+            )
+        os.replace(tmp, self.snapshot_path)
+
+        open(self.journal_path, "w").close()
+        self._journal_ops = 0
+
+    def _load(self):
+        try:
+            if os.path.exists(self.snapshot_path):
+                with np.load(self.snapshot_path) as data:
+                    self.embedding_model = str(data["embedding_model"]) or None
+                    self.dim = int(data["dim"]) or None
+                    if self.dim:
+                        self._vectors = data["vectors"].astype(np.float32)
+                        self._owner = data["owner"].astype(np.int32)
+                        self._kind = data["kind"].astype(np.int8)
+                        self._candidates = [str(c) for c in data["candidates"]]
+                        self._size = len(self._owner)
+                        self._compact()
+
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        entry = json.loads(line)
+                        if entry["op"] == "add":
+                            vectors = _decode_vectors(entry["vectors"], entry["dim"])
+                            self._apply_add(entry["id"], entry["kinds"], vectors, entry.get("model"))
+                        elif entry["id"] in self._rows:
+                            self._apply_remove(entry["id"])
+                        self._journal_ops += 1
+        except Exception as e:
+            print(f"⚠️ Section index bị lỗi, cần đồng bộ lại: {e}")
+            self._reset()
+            self.healthy = False
@@ -0,0 +1,554 @@
+import os
+import json
+import time
+import queue
+import socket
+import struct
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.vector_store import EmbeddingModelChanged
+from app.services.section_index import SectionIndexUnavailable
+from app.services.watchlists import WatchlistNotFound, WatchlistsUnavailable
+from app.services.search_sessions import SearchSessions, InvalidCursor, SearchSessionExpired
+
+# Frame: 4 byte độ dài (big-endian) + JSON UTF-8
+HEADER = struct.Struct(">I")
+MAX_FRAME = 64 * 1024 * 1024
+
+# Ghi đi qua hàng đợi group commit (một luồng ghi duy nhất)
+WRITE_METHODS = (
+    "save_candidate", "delete_candidate", "archive_partition", "restore_partition",
+    "create_watchlist", "delete_watchlist", "set_watchlist_embedding"
+)
+
+# Đọc chạy song song trên read pool, dùng chung VectorStore của storage process
+READ_METHODS = (
+    "search_candidates", "search_candidates_batch", "lexical_search", "hybrid_search",
+    "check_duplicate", "get_all_candidates", "candidates_page", "get_stats",
+    "list_partitions", "count", "get_file_ref", "section_search", "section_stats",
+    "list_watchlists", "watchlist_feed", "stale_watchlists", "watchlist_stats",
+    "list_candidates", "count_candidates", "filter_ids", "search_allowlist"
+)
+
+# Session phân trang (search_sessions): lưu trong storage process để mọi worker
+# đọc được cùng một cursor; chỉ thao tác bộ nhớ, chạy trực tiếp trên event loop
+SESSION_METHODS = {
+    "session_create": "create",
+    "session_read": "read",
+    "session_extend": "extend",
+    "session_stats": "stats",
+}
+
+# Thuộc tính đọc trực tiếp (không phải method)
+ATTRIBUTES = ("generation", "embedding_model")
+
+# Exception được chuyển nguyên loại về API worker; loại khác thành RuntimeError
+ERROR_TYPES = {
+    "EmbeddingModelChanged": EmbeddingModelChanged,
+    "SectionIndexUnavailable": SectionIndexUnavailable,
+    "WatchlistNotFound": WatchlistNotFound,
+    "WatchlistsUnavailable": WatchlistsUnavailable,
+    "InvalidCursor": InvalidCursor,
+    "SearchSessionExpired": SearchSessionExpired,
+    "ValueError": ValueError,
+    "KeyError": KeyError,
+    "RuntimeError": RuntimeError,
+}
+
+
+class StorageUnavailable(RuntimeError):
+    """
+    Không kết nối / mất kết nối tới storage server
+    """
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    return str(value)
+
+
+def encode_frame(payload: Dict) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8")
+    return HEADER.pack(len(body)) + body
+
+
+def _error_payload(request_id, error: BaseException) -> Dict:
+    message = error.args[0] if isinstance(error, KeyError) and error.args else str(error)
+    return {"id": request_id, "ok": False, "error": message, "type": type(error).__name__}
+
+
+# ====================================================================
+# SERVER (storage process)
+# ====================================================================
+
+class StorageServer:
+    """
+    Một tiến trình sở hữu VectorStore (Chroma + full_profiles + các index),
+    API worker truy cập qua Unix socket
+
+    - Ghi: xếp vào một hàng đợi, luồng ghi duy nhất gom các request đến trong
+      `group_commit_ms` (tối đa `max_batch`) và áp dụng theo đúng thứ tự;
+      các save_candidate liên tiếp được ghi collection trong một lần.
+    - Đọc: chạy song song trên read pool, không chờ hàng đợi ghi.
+    - Session phân trang của /api/search (nếu có `search_sessions`) nằm ở
+      đây để cursor dùng được trên mọi API worker.
+    """
+
+    def __init__(
+        self,
+        vector_store,
+        socket_path: str = "./data/storage.sock",
+        group_commit_ms: float = 5,
+        max_batch: int = 64,
+        read_workers: int = 8,
+        search_sessions: Optional[SearchSessions] = None
+    ):
+        self.vector_store = vector_store
+        self.search_sessions = search_sessions
+        self.socket_path = socket_path
+        self.group_commit = max(0.0, float(group_commit_ms)) / 1000
+        self.max_batch = max(1, int(max_batch))
+
+        self._reader = ThreadPoolExecutor(max_workers=max(1, int(read_workers)), thread_name_prefix="storage-read")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage-write")
+        self._writes: Optional[asyncio.Queue] = None
+        self._server = None
+
+        self.batches = 0
+        self.batched_writes = 0
+
+    async def serve(self):
+        if os.path.exists(self.socket_path):
+            # Socket cũ của tiến trình đã dừng
+            os.remove(self.socket_path)
+
+        self._writes = asyncio.Queue()
+        writer = asyncio.create_task(self._write_loop())
+        self._server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        print(
+            f"🗄️ Storage server lắng nghe tại {self.socket_path} "
+            f"(group commit {self.group_commit * 1000:.0f}ms, tối đa {self.max_batch} ghi/lô)"
+        )
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            writer.cancel()
+            self._reader.shutdown(wait=False)
+            self._writer.shutdown(wait=True)
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    # ------------------------------------------------------------
+    # Connections
+    # ------------------------------------------------------------
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        send_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                (length,) = HEADER.unpack(header)
+                if length > MAX_FRAME:
+                    print(f"⚠️ Storage server: frame quá lớn ({length} byte), đóng kết nối")
+                    break
+                request = json.loads(await reader.readexactly(length))
+
+                task = asyncio.create_task(self._respond(request, writer, send_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def _respond(self, request: Dict, writer: asyncio.StreamWriter, send_lock: asyncio.Lock):
+        request_id = request.get("id")
+        try:
+            result = await self._dispatch(request)
+            payload = {"id": request_id, "ok": True, "result": result}
+        except Exception as e:
+            payload = _error_payload(request_id, e)
+
+        async with send_lock:
+            writer.write(encode_frame(payload))
+            await writer.drain()
+
+    async def _dispatch(self, request: Dict) -> Any:
+        method = request.get("method")
+        args = request.get("args") or []
+        kwargs = request.get("kwargs") or {}
+
+        if method in ATTRIBUTES:
+            return getattr(self.vector_store, method)
+        if method in READ_METHODS:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._reader, lambda: getattr(self.vector_store, method)(*args, **kwargs))
+        if method in WRITE_METHODS:
+            future = asyncio.get_running_loop().create_future()
+            await self._writes.put((method, args, kwargs, future))
+            return await future
+        if method in SESSION_METHODS:
+            if self.search_sessions is None:
+                raise RuntimeError("Storage server không giữ session phân trang")
+            return getattr(self.search_sessions, SESSION_METHODS[method])(*args, **kwargs)
+        if method == "stats":
+            return self.stats()
+        raise ValueError(f"Method không được hỗ trợ: {method}")
+
+    # ------------------------------------------------------------
+    # Group commit
+    # ------------------------------------------------------------
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._writes.get()]
+            deadline = loop.time() + self.group_commit
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    # Hết cửa sổ chờ: vẫn gom các ghi đã có sẵn trong hàng đợi
+                    try:
+                        batch.append(self._writes.get_nowait())
+                        continue
+                    except asyncio.QueueEmpty:
+                        break
+                try:
+                    batch.append(await asyncio.wait_for(self._writes.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                results = await loop.run_in_executor(self._writer, self._apply_batch, batch)
+            except Exception as e:
+                results = [e] * len(batch)
+
+            for (_, _, _, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _apply_batch(self, batch: List[Tuple]) -> List:
+        """
+        Áp dụng một lô ghi theo thứ tự nhận; save_candidate liên tiếp gộp thành
+        một save_candidates
+        """
+        results: List = []
+        i = 0
+        while i < len(batch):
+            method, args, kwargs, _ = batch[i]
+            if method == "save_candidate":
+                j = i
+                items = []
+                while j < len(batch) and batch[j][0] == "save_candidate":
+                    items.append(_save_item(*batch[j][1], **batch[j][2]))
+                    j += 1
+                try:
+                    results.extend(self.vector_store.save_candidates(items))
+                except Exception as e:
+                    results.extend([e] * len(items))
+                i = j
+                continue
+
+            try:
+                results.append(getattr(self.vector_store, method)(*args, **kwargs))
+            except Exception as e:
+                results.append(e)
+            i += 1
+
+        self.batches += 1
+        self.batched_writes += len(batch)
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            "socket_path": self.socket_path,
+            "group_commit_ms": self.group_commit * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "writes": self.batched_writes,
+            "avg_batch": round(self.batched_writes / self.batches, 2) if self.batches else None,
+            "queued_writes": self._writes.qsize() if self._writes is not None else 0
+        }
+
+
+def _save_item(
+    cv_text: str,
+    cv_data: Dict,
+    embedding: List[float],
+    file_name: str = "",
+    duplicate: Optional[Dict] = None,
+    embedding_model: Optional[str] = None,
+    blob: Optional[Dict] = None,
+    sections: Optional[Dict] = None
+) -> Dict:
+    return {
+        "cv_text": cv_text,
+        "cv_data": cv_data,
+        "embedding": embedding,
+        "file_name": file_name,
+        "duplicate": duplicate,
+        "embedding_model": embedding_model,
+        "blob": blob,
+        "sections": sections
+    }
+
+
+# ====================================================================
+# CLIENT (API worker)
+# ====================================================================
+
+class RemoteVectorStore:
+    """
+    VectorStore mỏng trong API worker: mọi thao tác gửi tới storage server
+
+    Giữ một pool kết nối Unix socket dùng chung giữa các thread executor;
+    mỗi kết nối chỉ phục vụ một request tại một thời điểm.
+    """
+
+    def __init__(self, socket_path: str = "./data/storage.sock", pool_size: int = 8, timeout: float = 120):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._pool: "queue.LifoQueue[Optional[socket.socket]]" = queue.LifoQueue()
+        for _ in range(max(1, int(pool_size))):
+            self._pool.put(None)
+        self._ids = 0
+        self._ids_lock = threading.Lock()
+
+        # Chờ storage server sẵn sàng (khởi động cùng lúc với API worker)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.embedding_model = self._call("embedding_model")
+                break
+            except StorageUnavailable:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.5)
+
+        print(f"🗄️ Kết nối storage server tại {socket_path} (model {self.embedding_model})")
+
+    # ------------------------------------------------------------
+    # Transport
+    # ------------------------------------------------------------
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise StorageUnavailable(f"Không kết nối được storage server ({self.socket_path}): {e}")
+        return sock
+
+    def _call(self, method: str, *args, **kwargs) -> Any:
+        with self._ids_lock:
+            self._ids += 1
+            request_id = self._ids
+
+        frame = encode_frame({"id": request_id, "method": method, "args": args, "kwargs": kwargs})
+        sock = self._pool.get()
+        try:
+            if sock is None:
+                sock = self._connect()
+            sock.sendall(frame)
+            (length,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+            response = json.loads(_recv_exact(sock, length))
+        except (OSError, ConnectionError) as e:
+            # Kết nối hỏng (hoặc timeout, có thể còn phản hồi chưa đọc) -> bỏ, lần sau mở mới
+            if sock is not None:
+                sock.close()
+            sock = None
+            raise StorageUnavailable(f"Mất kết nối storage server: {e}")
+        finally:
+            self._pool.put(sock)
+
+        if not response.get("ok"):
+            error_type = ERROR_TYPES.get(response.get("type"), RuntimeError)
+            raise error_type(response.get("error"))
+        return response.get("result")
+
+    # ------------------------------------------------------------
+    # VectorStore API
+    # ------------------------------------------------------------
+    @property
+    def generation(self) -> int:
+        return self._call("generation")
+
+    def save_candidate(self, cv_text: str, cv_data: Dict, embedding: List[float], file_name: str = "",
+                       duplicate: Optional[Dict] = None, embedding_model: Optional[str] = None,
+                       blob: Optional[Dict] = None, sections: Optional[Dict] = None) -> str:
+        try:
+            return self._call(
+                "save_candidate", cv_text, cv_data, list(embedding),
+                file_name=file_name, duplicate=duplicate, embedding_model=embedding_model, blob=blob,
+                sections=sections
+            )
+        except EmbeddingModelChanged:
+            # Cập nhật model để lần thử lại embed bằng model mới
+            self.embedding_model = self._call("embedding_model")
+            raise
+
+    def delete_candidate(self, candidate_id: str) -> bool:
+        return self._call("delete_candidate", candidate_id)
+
+    def archive_partition(self, partition: str) -> Dict:
+        return self._call("archive_partition", partition)
+
+    def restore_partition(self, partition: str) -> Dict:
+        return self._call("restore_partition", partition)
+
+    def search_candidates(self, *args, **kwargs) -> Dict:
+        return self._call("search_candidates", *args, **kwargs)
+
+    def search_candidates_batch(self, queries: List[Dict]) -> List[Dict]:
+        return self._call("search_candidates_batch", queries)
+
+    def lexical_search(self, *args, **kwargs) -> Dict:
+        return self._call("lexical_search", *args, **kwargs)
+
+    def hybrid_search(self, *args, **kwargs) -> Dict:
+        return self._call("hybrid_search", *args, **kwargs)
+
+    def section_search(self, *args, **kwargs) -> Dict:
+        return self._call("section_search", *args, **kwargs)
+
+    def section_stats(self) -> Dict:
+        return self._call("section_stats")
+
+    def create_watchlist(self, name: str, jd_text: str, embedding: List[float], embedding_model: Optional[str] = None,
+                         min_exp: int = 0, required_skills: Optional[List[str]] = None, threshold: float = 0.5) -> Dict:
+        try:
+            return self._call(
+                "create_watchlist", name, jd_text, list(embedding),
+                embedding_model=embedding_model, min_exp=min_exp, required_skills=required_skills, threshold=threshold
+            )
+        except EmbeddingModelChanged:
+            self.embedding_model = self._call("embedding_model")
+            raise
+
+    def list_watchlists(self) -> List[Dict]:
+        return self._call("list_watchlists")
+
+    def watchlist_feed(self, watchlist_id: str, since: int = 0, limit: int = 50) -> Dict:
+        return self._call("watchlist_feed", watchlist_id, since=since, limit=limit)
+
+    def delete_watchlist(self, watchlist_id: str) -> bool:
+        return self._call("delete_watchlist", watchlist_id)
+
+    def stale_watchlists(self) -> List[Dict]:
+        return self._call("stale_watchlists")
+
+    def set_watchlist_embedding(self, watchlist_id: str, embedding: List[float], embedding_model: str):
+        return self._call("set_watchlist_embedding", watchlist_id, list(embedding), embedding_model)
+
+    def watchlist_stats(self) -> Dict:
+        return self._call("watchlist_stats")
+
+    def check_duplicate(self, cv_text: str, cv_data: Dict, embedding: List[float]) -> Optional[Dict]:
+        return self._call("check_duplicate", cv_text, cv_data, list(embedding))
+
+    def get_all_candidates(self, limit=100):
+        return self._call("get_all_candidates", limit)
+
+    def candidates_page(self, offset: int, limit: int, columns: Optional[List[str]] = None) -> List[Dict]:
+        return self._call("candidates_page", offset, limit, columns)
+
+    def iter_candidates(self, columns: Optional[List[str]] = None, page_size: int = 500):
+        offset = 0
+        while True:
+            rows = self.candidates_page(offset, page_size, columns)
+            if not rows:
+                break
+            yield from rows
+            offset += len(rows)
+
+    def list_candidates(self, filters: Optional[Dict] = None, sort_by: Optional[str] = None, descending: bool = True,
+                        offset: int = 0, limit: int = 100, columns: Optional[List[str]] = None) -> Dict:
+        return self._call(
+            "list_candidates", filters, sort_by=sort_by, descending=descending,
+            offset=offset, limit=limit, columns=columns
+        )
+
+    def count_candidates(self, filters: Optional[Dict] = None, group_by: Optional[str] = None) -> Dict:
+        return self._call("count_candidates", filters, group_by=group_by)
+
+    def filter_ids(self, candidate_ids: List[str], filters: Optional[Dict]) -> List[bool]:
+        return self._call("filter_ids", candidate_ids, filters)
+
+    def search_allowlist(self, *args, **kwargs) -> Dict:
+        return self._call("search_allowlist", *args, **kwargs)
+
+    def list_partitions(self) -> List[Dict]:
+        return self._call("list_partitions")
+
+    def get_file_ref(self, candidate_id: str) -> Optional[Dict]:
+        return self._call("get_file_ref", candidate_id)
+
+    def get_stats(self) -> Dict:
+        return self._call("get_stats")
+
+    def count(self) -> int:
+        return self._call("count")
+
+    def server_stats(self) -> Dict:
+        return self._call("stats")
+
+    def close(self):
+        while not self._pool.empty():
+            sock = self._pool.get_nowait()
+            if sock is not None:
+                sock.close()
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("storage server đóng kết nối")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class RemoteSearchSessions(SearchSessions):
+    """
+    Session phân trang lưu trong storage process (storage.mode: remote)
+
+    Cấu hình (max_page_size, initial_depth, ...) đọc từ cùng config.yaml để
+    API worker kiểm tra tham số; session và TTL do storage server quản lý.
+    """
+
+    def __init__(self, store: RemoteVectorStore, config: Optional[Dict] = None):
+        super().__init__(config)
+        self.store = store
+
+    def create(self, query_info: Dict, spec: Dict, ranking: List[Dict], fetched: int,
+               exhausted: bool, generation: int) -> str:
+        return self.store._call("session_create", query_info, spec, ranking, fetched, exhausted, generation)
+
+    def read(self, cursor: str, limit: Optional[int] = None) -> Dict:
+        return self.store._call("session_read", cursor, limit)
+
+    def extend(self, session_id: str, ranking: List[Dict], fetched: int, exhausted: bool):
+        return self.store._call("session_extend", session_id, ranking, fetched, exhausted)
+
+    def stats(self) -> Dict:
+        return {**self.store._call("session_stats"), "location": "storage"}
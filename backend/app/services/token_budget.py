@@ -0,0 +1,169 @@
+import os
+import json
+import math
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+from app.services.metrics import LLM_TOKENS, LLM_OUTPUT_TOKENS, LLM_TRUNCATED, model_label
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    Ước lượng số token khi provider không trả usage (~4 ký tự / token)
+    """
+    return max(1, math.ceil(len(text or "") / 4))
+
+
+class TokenBudget:
+    """
+    Ghi nhận token vào / ra theo provider + model và chọn max_tokens thích
+    ứng cho lần gọi LLM tiếp theo
+
+    max_tokens = percentile độ dài phản hồi trong `window` lần gần nhất
+    * (1 + margin), không thấp hơn min_tokens và không vượt max_tokens cấu
+    hình của model (trần). Chưa đủ min_samples thì dùng trần.
+
+    Phản hồi bị cắt (chạm giới hạn) không được tính vào phân phối (độ dài
+    thật chưa biết); AIEngine gọi lại với trần và lần đó được ghi nhận, nên
+    giới hạn tự nới ra khi CV dài hơn thường lệ.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        """
+        Args:
+            config: Block `runtime.token_budget` trong config.yaml
+        """
+        config = config or {}
+
+        self.enabled = config.get("enabled", True)
+        self.window = max(1, int(config.get("window", 200)))
+        self.min_samples = max(1, int(config.get("min_samples", 20)))
+        self.percentile = min(max(float(config.get("percentile", 99)), 0.0), 100.0)
+        self.margin = max(float(config.get("margin", 0.25)), 0.0)
+        self.min_tokens = max(1, int(config.get("min_tokens", 256)))
+        self.state_path = config.get("state_path")
+        self.save_every = max(1, int(config.get("save_every", 10)))
+
+        self._samples: Dict[str, deque] = {}
+        self._ceilings: Dict[str, int] = {}
+        self._totals: Dict[str, Dict[str, int]] = {}
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+        self._load()
+
+    @staticmethod
+    def _key(provider: str, model: Optional[str]) -> str:
+        return f"{provider}:{model_label(model)}"
+
+    # ------------------------------------------------------------
+    # Budget
+    # ------------------------------------------------------------
+    def _observed(self, samples) -> Optional[int]:
+        if len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, math.ceil(self.percentile / 100 * len(ordered)) - 1)
+        return ordered[max(index, 0)]
+
+    def _cap(self, key: str, ceiling: int) -> int:
+        observed = self._observed(self._samples.get(key, ()))
+        if observed is None:
+            return ceiling
+        cap = max(math.ceil(observed * (1 + self.margin)), self.min_tokens)
+        return min(cap, ceiling)
+
+    def max_tokens(self, provider: str, model: Optional[str], ceiling: int) -> int:
+        """
+        Giới hạn token ra cho lần gọi tới provider / model
+
+        Args:
+            ceiling: max_tokens cấu hình của model (không bao giờ vượt)
+        """
+        if not self.enabled:
+            return ceiling
+        key = self._key(provider, model)
+        with self._lock:
+            self._ceilings[key] = ceiling
+            return self._cap(key, ceiling)
+
+    def record(self, provider: str, model: Optional[str], input_tokens: int, output_tokens: int, truncated: bool = False):
+        """
+        Ghi nhận một lần gọi LLM (metrics + phân phối độ dài phản hồi)
+        """
+        label = model_label(model)
+        LLM_TOKENS.labels(provider, label, "input").inc(input_tokens)
+        LLM_TOKENS.labels(provider, label, "output").inc(output_tokens)
+        LLM_OUTPUT_TOKENS.labels(provider, label).observe(output_tokens)
+        if truncated:
+            LLM_TRUNCATED.labels(provider, label).inc()
+
+        key = self._key(provider, model)
+        with self._lock:
+            totals = self._totals.setdefault(key, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "truncated": 0})
+            totals["calls"] += 1
+            totals["input_tokens"] += input_tokens
+            totals["output_tokens"] += output_tokens
+            totals["truncated"] += int(truncated)
+            if truncated:
+                return
+
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(output_tokens)
+            self._unsaved += 1
+            if self.state_path and self._unsaved >= self.save_every:
+                self._save()
+
+    def stats(self) -> Dict:
+        """
+        Returns:
+            Dict: theo "provider:model" -> token đã dùng, phân phối và max_tokens hiện tại
+        """
+        with self._lock:
+            result = {}
+            for key in sorted(set(self._samples) | set(self._totals)):
+                samples = self._samples.get(key, ())
+                ceiling = self._ceilings.get(key)
+                result[key] = {
+                    **self._totals.get(key, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "truncated": 0}),
+                    "samples": len(samples),
+                    "observed_tokens": self._observed(samples),
+                    "ceiling": ceiling,
+                    "max_tokens": self._cap(key, ceiling) if ceiling and self.enabled else ceiling,
+                }
+            return {"enabled": self.enabled, "models": result}
+
+    def budgets(self) -> Dict[str, int]:
+        """
+        max_tokens hiện tại của các model đã gọi ít nhất một lần (cho /metrics)
+        """
+        with self._lock:
+            return {
+                key: (self._cap(key, ceiling) if self.enabled else ceiling)
+                for key, ceiling in self._ceilings.items()
+            }
+
+    # ------------------------------------------------------------
+    # Persistence (giữ phân phối qua lần khởi động lại)
+    # ------------------------------------------------------------
+    def _save(self):
+        try:
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({key: list(samples) for key, samples in self._samples.items()}, f)
+            os.replace(tmp, self.state_path)
+            self._unsaved = 0
+        except Exception as e:
+            print(f"⚠️ Lỗi khi lưu thống kê token: {e}")
+
+    def _load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            for key, samples in state.items():
+                self._samples[key] = deque((int(s) for s in samples), maxlen=self.window)
+        except Exception as e:
+            print(f"⚠️ Không đọc được thống kê token, bắt đầu lại: {e}")
+            self._samples = {}
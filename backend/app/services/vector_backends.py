@@ -0,0 +1,708 @@
+import os
+import json
+import threading
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+
+
+# ====================================================================
+# BACKEND INTERFACE
+# ====================================================================
+
+class VectorBackend:
+    """
+    Interface chung cho backend lưu vector (giống client của ChromaDB)
+
+    Collection trả về phải hỗ trợ tập con API của chromadb.Collection mà
+    VectorStore sử dụng: name, metadata, count, add, upsert, get, query, delete.
+    """
+
+    name = "base"
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None):
+        raise NotImplementedError
+
+    def get_collection(self, name: str):
+        raise NotImplementedError
+
+    def delete_collection(self, name: str):
+        raise NotImplementedError
+
+    def list_collections(self) -> List[str]:
+        raise NotImplementedError
+
+
+class ChromaBackend(VectorBackend):
+    """
+    Backend mặc định: ChromaDB (HNSW + SQLite metadata)
+    """
+
+    name = "chroma"
+
+    def __init__(self, path: str):
+        import chromadb
+        self.client = chromadb.PersistentClient(path=path)
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None):
+        # chromadb.get_or_create_collection ghi đè metadata của collection đã có
+        # (kể cả hnsw:*), trong khi index trên đĩa vẫn theo tham số lúc tạo
+        try:
+            return self.client.get_collection(name=name)
+        except ValueError:
+            return self.client.get_or_create_collection(name=name, metadata=metadata)
+
+    def get_collection(self, name: str):
+        return self.client.get_collection(name=name)
+
+    def delete_collection(self, name: str):
+        self.client.delete_collection(name=name)
+
+    def list_collections(self) -> List[str]:
+        return [c.name for c in self.client.list_collections()]
+
+
+class NumpyBackend(VectorBackend):
+    """
+    Backend tìm kiếm chính xác (brute-force) bằng NumPy
+
+    Mỗi collection là một thư mục chứa ma trận vector liên tục (memmap)
+    và nhật ký metadata; phù hợp với vài trăm nghìn vector 384 chiều.
+    """
+
+    name = "numpy"
+
+    def __init__(
+        self,
+        path: str,
+        dtype: str = "float32",
+        block_size: int = 65536,
+        rescore: bool = False,
+        rescore_overfetch: int = 4,
+        read_only: bool = False
+    ):
+        self.path = path
+        self.dtype = dtype
+        self.block_size = block_size
+        self.rescore = rescore
+        self.rescore_overfetch = rescore_overfetch
+        # Tiến trình phụ (export CLI) đọc cùng thư mục với server: không ghi gì
+        self.read_only = read_only
+        self._collections: Dict[str, "NumpyCollection"] = {}
+        self._lock = threading.Lock()
+        if not read_only:
+            os.makedirs(path, exist_ok=True)
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = NumpyCollection(
+                    os.path.join(self.path, name),
+                    name=name,
+                    metadata=metadata,
+                    dtype=self.dtype,
+                    block_size=self.block_size,
+                    rescore=self.rescore,
+                    rescore_overfetch=self.rescore_overfetch,
+                    read_only=self.read_only
+                )
+            return self._collections[name]
+
+    def get_collection(self, name: str):
+        if name not in self._collections and not os.path.isdir(os.path.join(self.path, name)):
+            raise ValueError(f"Collection {name} không tồn tại")
+        return self.get_or_create_collection(name)
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            collection = self._collections.pop(name, None)
+            if collection is not None:
+                collection.close()
+            folder = os.path.join(self.path, name)
+            if os.path.isdir(folder):
+                for file in os.listdir(folder):
+                    os.remove(os.path.join(folder, file))
+                os.rmdir(folder)
+
+    def list_collections(self) -> List[str]:
+        return sorted(
+            d for d in os.listdir(self.path)
+            if os.path.isdir(os.path.join(self.path, d))
+        )
+
+
+def create_backend(config: Dict, db_path: str, data_dir: str, suffix: str = "", read_only: bool = False) -> VectorBackend:
+    """
+    Khởi tạo backend theo `vector_store.backend` trong config.yaml
+
+    Args:
+        suffix: Hậu tố thư mục, dùng để tạo backend phụ (ví dụ "_archive")
+        read_only: Chỉ đọc dữ liệu của tiến trình khác (numpy không ghi
+            manifest khi mở; chroma không có chế độ này, caller chỉ gọi hàm đọc)
+    """
+    backend = config.get("backend", "chroma")
+
+    if backend == "chroma":
+        return ChromaBackend(db_path + suffix)
+
+    if backend == "numpy":
+        numpy_cfg = config.get("numpy", {})
+        return NumpyBackend(
+            path=os.path.join(data_dir, numpy_cfg.get("dir", "numpy_store") + suffix),
+            dtype=numpy_cfg.get("dtype", "float32"),
+            block_size=numpy_cfg.get("block_size", 65536),
+            rescore=numpy_cfg.get("rescore", False),
+            rescore_overfetch=numpy_cfg.get("rescore_overfetch", 4),
+            read_only=read_only
+        )
+
+    raise ValueError(f"Backend vector không hỗ trợ: {backend}")
+
+
+# ====================================================================
+# NUMPY COLLECTION
+# ====================================================================
+
+_COMPARATORS = {
+    "$eq": np.equal,
+    "$ne": np.not_equal,
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+
+def quantize_int8(matrix: np.ndarray):
+    """
+    Lượng tử hóa int8 đối xứng theo từng vector: x ≈ q * scale
+
+    Returns:
+        (q, scales): q dạng int8 (n, dim), scales float32 (n,)
+    """
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    q = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return q, scales
+
+
+class NumpyCollection:
+    """
+    Collection lưu trên đĩa gồm:
+        - vectors.bin: ma trận (capacity, dim) memmap, vector đã chuẩn hóa L2
+          dạng float32 / float16 / int8 (chỉ mục chính, được quét mỗi query)
+        - scales.bin: hệ số scale float32 của từng vector (chỉ với int8)
+        - vectors_full.bin: bản float32 để rescore shortlist (khi bật rescore)
+        - records.log: JSON lines put/del (id, slot, metadata, document)
+        - manifest.json: dim, dtype, rescore, capacity, metadata collection
+
+    Metadata số được giữ thành cột NumPy để lọc `where` theo vector hóa.
+    dtype / rescore cố định khi tạo collection (ghi trong manifest).
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        name: str,
+        metadata: Optional[Dict] = None,
+        dtype: str = "float32",
+        block_size: int = 65536,
+        rescore: bool = False,
+        rescore_overfetch: int = 4,
+        read_only: bool = False
+    ):
+        self.folder = folder
+        self.read_only = read_only
+        self.name = name
+        self.block_size = block_size
+        self.rescore_overfetch = max(1, int(rescore_overfetch))
+
+        self._lock = threading.RLock()
+        self._manifest_path = os.path.join(folder, "manifest.json")
+        self._vectors_path = os.path.join(folder, "vectors.bin")
+        self._scales_path = os.path.join(folder, "scales.bin")
+        self._full_path = os.path.join(folder, "vectors_full.bin")
+        self._log_path = os.path.join(folder, "records.log")
+
+        if not read_only:
+            os.makedirs(folder, exist_ok=True)
+
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        else:
+            if dtype not in VECTOR_DTYPES:
+                raise ValueError(f"numpy.dtype không hỗ trợ: {dtype} (chọn {', '.join(VECTOR_DTYPES)})")
+            manifest = {
+                "dim": None, "dtype": dtype, "rescore": bool(rescore),
+                "capacity": 0, "metadata": metadata or {}
+            }
+
+        self.metadata = manifest.get("metadata") or {}
+        self.dim: Optional[int] = manifest.get("dim")
+        self.dtype = np.dtype(manifest.get("dtype", dtype))
+        self.quantized = self.dtype == np.int8
+        # Rescore chỉ có nghĩa khi chỉ mục chính kém chính xác hơn float32
+        self.rescore = bool(manifest.get("rescore", False)) and self.dtype != np.float32
+        self._capacity = manifest.get("capacity", 0)
+        self._vectors: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+        self._full: Optional[np.memmap] = None
+
+        # Bảng slot -> bản ghi
+        self._ids: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict]] = []
+        self._documents: List[Optional[str]] = []
+        self._slot_of: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._alive = np.zeros(self._capacity, dtype=bool)
+        self._numeric: Dict[str, np.ndarray] = {}
+        self._log_entries = 0
+
+        if self.dim:
+            self._open_vectors()
+        self._replay_log()
+        if not read_only:
+            self._write_manifest()
+
+    # ------------------------------------------------------------
+    # Storage helpers
+    # ------------------------------------------------------------
+    def _write_manifest(self):
+        tmp = self._manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "dim": self.dim,
+                "dtype": self.dtype.name,
+                "rescore": self.rescore,
+                "capacity": self._capacity,
+                "metadata": self.metadata
+            }, f)
+        os.replace(tmp, self._manifest_path)
+
+    def _vector_files(self) -> List:
+        """
+        (đường dẫn, dtype, số cột) của các file memmap đang dùng
+        """
+        files = [(self._vectors_path, self.dtype, self.dim)]
+        if self.quantized:
+            files.append((self._scales_path, np.dtype(np.float32), 1))
+        if self.rescore:
+            files.append((self._full_path, np.dtype(np.float32), self.dim))
+        return files
+
+    def _open_vectors(self):
+        if self._capacity == 0:
+            self._vectors = self._scales = self._full = None
+            return
+        mode = "r" if self.read_only else "r+"
+        self._vectors = np.memmap(
+            self._vectors_path,
+            dtype=self.dtype,
+            mode=mode,
+            shape=(self._capacity, self.dim)
+        )
+        if self.quantized:
+            self._scales = np.memmap(self._scales_path, dtype=np.float32, mode=mode, shape=(self._capacity,))
+        if self.rescore:
+            self._full = np.memmap(self._full_path, dtype=np.float32, mode=mode, shape=(self._capacity, self.dim))
+
+    def _flush_vectors(self):
+        for array in (self._vectors, self._scales, self._full):
+            if array is not None:
+                array.flush()
+
+    def _ensure_capacity(self, needed: int):
+        if needed <= self._capacity:
+            return
+
+        new_capacity = max(needed, self._capacity * 2, 1024)
+        if self._vectors is not None:
+            self._flush_vectors()
+            self._vectors = self._scales = self._full = None
+
+        for path, dtype, columns in self._vector_files():
+            with open(path, "ab") as f:
+                f.truncate(new_capacity * columns * dtype.itemsize)
+
+        self._alive = np.concatenate([self._alive, np.zeros(new_capacity - self._capacity, dtype=bool)])
+        for key, column in self._numeric.items():
+            self._numeric[key] = np.concatenate([column, np.full(new_capacity - self._capacity, np.nan)])
+
+        self._capacity = new_capacity
+        self._open_vectors()
+        self._write_manifest()
+
+    def _append_log(self, entries: List[Dict]):
+        with open(self._log_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._log_entries += len(entries)
+
+        # Gộp log khi số bản ghi chết vượt số bản ghi sống
+        if self._log_entries > 2 * max(len(self._slot_of), 512):
+            self._compact_log()
+
+    def _compact_log(self):
+        tmp = self._log_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for cid, slot in self._slot_of.items():
+                f.write(json.dumps({
+                    "op": "put",
+                    "id": cid,
+                    "slot": slot,
+                    "metadata": self._metadatas[slot],
+                    "document": self._documents[slot]
+                }, ensure_ascii=False) + "\n")
+        os.replace(tmp, self._log_path)
+        self._log_entries = len(self._slot_of)
+
+    def _replay_log(self):
+        if not os.path.exists(self._log_path):
+            return
+
+        with open(self._log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if entry["op"] == "put":
+                    self._set_record(entry["slot"], entry["id"], entry.get("metadata"), entry.get("document"))
+                elif entry["op"] == "del":
+                    self._clear_record(entry["id"])
+                self._log_entries += 1
+
+        used = len(self._ids)
+        self._free = [slot for slot in range(used) if self._ids[slot] is None]
+
+    def _set_record(self, slot: int, cid: str, metadata: Optional[Dict], document: Optional[str]):
+        old_slot = self._slot_of.get(cid)
+        if old_slot is not None and old_slot != slot:
+            self._clear_record(cid)
+
+        while len(self._ids) <= slot:
+            self._ids.append(None)
+            self._metadatas.append(None)
+            self._documents.append(None)
+
+        self._ids[slot] = cid
+        self._metadatas[slot] = metadata or {}
+        self._documents[slot] = document
+        self._slot_of[cid] = slot
+        self._alive[slot] = True
+
+        for key, value in (metadata or {}).items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key not in self._numeric:
+                self._numeric[key] = np.full(self._capacity, np.nan)
+            self._numeric[key][slot] = value
+
+    def _clear_record(self, cid: str) -> Optional[int]:
+        slot = self._slot_of.pop(cid, None)
+        if slot is None:
+            return None
+        self._ids[slot] = None
+        self._metadatas[slot] = None
+        self._documents[slot] = None
+        self._alive[slot] = False
+        for column in self._numeric.values():
+            column[slot] = np.nan
+        return slot
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._flush_vectors()
+                self._vectors = self._scales = self._full = None
+
+    def bytes_per_vector(self) -> int:
+        """
+        Số byte lưu trữ mỗi vector (chỉ mục chính + scale + bản rescore)
+        """
+        if not self.dim:
+            return 0
+        return sum(columns * dtype.itemsize for _, dtype, columns in self._vector_files())
+
+    # ------------------------------------------------------------
+    # Chroma-compatible API
+    # ------------------------------------------------------------
+    def count(self) -> int:
+        return len(self._slot_of)
+
+    def add(self, ids: List[str], embeddings, metadatas=None, documents=None):
+        with self._lock:
+            duplicated = [cid for cid in ids if cid in self._slot_of]
+            if duplicated:
+                raise ValueError(f"ID đã tồn tại: {duplicated[:3]}")
+            self._put(ids, embeddings, metadatas, documents)
+
+    def upsert(self, ids: List[str], embeddings, metadatas=None, documents=None):
+        with self._lock:
+            self._put(ids, embeddings, metadatas, documents)
+
+    def _put(self, ids, embeddings, metadatas, documents):
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+
+        if self.dim is None:
+            self.dim = int(matrix.shape[1])
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {matrix.shape[1]} khác collection ({self.dim})")
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.maximum(norms, 1e-12)
+
+        slots = []
+        for cid in ids:
+            if cid in self._slot_of:
+                slots.append(self._slot_of[cid])
+            elif self._free:
+                slots.append(self._free.pop())
+            else:
+                slots.append(len(self._ids) + sum(1 for s in slots if s >= len(self._ids)))
+        self._ensure_capacity(max(slots) + 1)
+
+        if self.quantized:
+            q, scales = quantize_int8(matrix)
+            self._vectors[slots] = q
+            self._scales[slots] = scales
+        else:
+            self._vectors[slots] = matrix.astype(self.dtype)
+        if self.rescore:
+            self._full[slots] = matrix
+        self._flush_vectors()
+
+        entries = []
+        for i, cid in enumerate(ids):
+            metadata = metadatas[i] if metadatas else {}
+            document = documents[i] if documents else None
+            self._set_record(slots[i], cid, metadata, document)
+            entries.append({"op": "put", "id": cid, "slot": slots[i], "metadata": metadata, "document": document})
+        self._append_log(entries)
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        with self._lock:
+            if where is not None:
+                mask = self._where_mask(where)
+                ids = list(ids or []) + [self._ids[s] for s in np.flatnonzero(mask)]
+
+            entries = []
+            for cid in ids or []:
+                slot = self._clear_record(cid)
+                if slot is not None:
+                    self._free.append(slot)
+                    entries.append({"op": "del", "id": cid})
+            if entries:
+                self._append_log(entries)
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        include = include if include is not None else ["metadatas", "documents"]
+
+        with self._lock:
+            if ids is not None:
+                slots = [self._slot_of[cid] for cid in ids if cid in self._slot_of]
+                if where is not None:
+                    mask = self._where_mask(where)
+                    slots = [s for s in slots if mask[s]]
+            else:
+                mask = self._where_mask(where) if where is not None else self._alive
+                slots = np.flatnonzero(mask).tolist()
+
+            start = offset or 0
+            slots = slots[start:start + limit] if limit is not None else slots[start:]
+            return self._rows(slots, include)
+
+    def query(
+        self,
+        query_embeddings,
+        n_results: int = 10,
+        where: Optional[Dict] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        include = include if include is not None else ["metadatas", "documents", "distances"]
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            results = {"ids": [], "distances": []}
+            for key in ("metadatas", "documents", "embeddings"):
+                if key in include:
+                    results[key] = []
+
+            if self._vectors is None or not self._slot_of:
+                for key in results:
+                    results[key] = [[] for _ in range(len(queries))]
+                return results
+
+            mask = self._where_mask(where) if where is not None else self._alive
+            if self.rescore:
+                # Quét chỉ mục lượng tử hóa lấy shortlist, rồi tính lại bằng float32
+                top_slots, _ = self._exact_topk(queries, mask, n_results * self.rescore_overfetch)
+                top_slots, top_sims = self._rescore(queries, top_slots, n_results)
+            else:
+                top_slots, top_sims = self._exact_topk(queries, mask, n_results)
+
+            for q in range(len(queries)):
+                rows = self._rows(top_slots[q], include)
+                results["ids"].append(rows["ids"])
+                results["distances"].append([float(1 - s) for s in top_sims[q]])
+                for key in ("metadatas", "documents", "embeddings"):
+                    if key in results:
+                        results[key].append(rows[key])
+
+            return results
+
+    # ------------------------------------------------------------
+    # Search / filter internals
+    # ------------------------------------------------------------
+    def _exact_topk(self, queries: np.ndarray, mask: np.ndarray, k: int):
+        """
+        Tích ma trận theo từng block, giữ top-k tạm thời cho mỗi query
+        """
+        used = len(self._ids)
+        mask = mask[:used]
+        n_queries = len(queries)
+
+        best_slots = np.empty((n_queries, 0), dtype=np.int64)
+        best_sims = np.empty((n_queries, 0), dtype=np.float32)
+
+        filtered = not mask.all()
+        for start in range(0, used, self.block_size):
+            stop = min(start + self.block_size, used)
+            block_mask = mask[start:stop]
+            if not block_mask.any():
+                continue
+
+            if filtered:
+                block_slots = np.flatnonzero(block_mask) + start
+                block = self._vectors[block_slots]
+            else:
+                block_slots = np.arange(start, stop)
+                block = self._vectors[start:stop]
+
+            sims = queries @ block.astype(np.float32, copy=False).T
+            if self.quantized:
+                sims *= self._scales[block_slots]
+
+            cand_slots = np.concatenate([best_slots, np.broadcast_to(block_slots, sims.shape)], axis=1)
+            cand_sims = np.concatenate([best_sims, sims], axis=1)
+
+            if cand_sims.shape[1] > k:
+                part = np.argpartition(-cand_sims, k - 1, axis=1)[:, :k]
+                cand_slots = np.take_along_axis(cand_slots, part, axis=1)
+                cand_sims = np.take_along_axis(cand_sims, part, axis=1)
+
+            best_slots, best_sims = cand_slots, cand_sims
+
+        order = np.argsort(-best_sims, axis=1)
+        best_slots = np.take_along_axis(best_slots, order, axis=1)
+        best_sims = np.take_along_axis(best_sims, order, axis=1)
+        return best_slots.tolist(), best_sims.tolist()
+
+    def _rescore(self, queries: np.ndarray, shortlists: List[List[int]], k: int):
+        """
+        Tính lại similarity của shortlist bằng vector float32 đầy đủ
+        """
+        out_slots, out_sims = [], []
+        for query, slots in zip(queries, shortlists):
+            if not slots:
+                out_slots.append([])
+                out_sims.append([])
+                continue
+            sims = self._full[slots] @ query
+            order = np.argsort(-sims)[:k]
+            out_slots.append([slots[i] for i in order])
+            out_sims.append(sims[order].tolist())
+        return out_slots, out_sims
+
+    def _where_mask(self, where: Optional[Dict]) -> np.ndarray:
+        if not where:
+            return self._alive.copy()
+
+        mask = self._alive.copy()
+        for key, cond in where.items():
+            if key == "$and":
+                for sub in cond:
+                    mask &= self._where_mask(sub)
+            elif key == "$or":
+                any_mask = np.zeros_like(mask)
+                for sub in cond:
+                    any_mask |= self._where_mask(sub)
+                mask &= any_mask
+            else:
+                if not isinstance(cond, dict):
+                    cond = {"$eq": cond}
+                for op, value in cond.items():
+                    mask &= self._field_mask(key, op, value)
+        return mask
+
+    def _field_mask(self, key: str, op: str, value) -> np.ndarray:
+        numeric = key in self._numeric and (
+            isinstance(value, (int, float)) and not isinstance(value, bool)
+            or op in ("$in", "$nin") and all(isinstance(v, (int, float)) for v in value)
+        )
+
+        if numeric:
+            column = self._numeric[key]
+            with np.errstate(invalid="ignore"):
+                if op in _COMPARATORS:
+                    return _COMPARATORS[op](column, value)
+                if op == "$in":
+                    return np.isin(column, value)
+                if op == "$nin":
+                    return ~np.isin(column, value)
+            raise ValueError(f"Toán tử where không hỗ trợ: {op}")
+
+        # Cột dạng chuỗi/khác: so sánh từng bản ghi
+        values = np.array(
+            [m.get(key) if m is not None else None for m in self._metadatas] +
+            [None] * (self._capacity - len(self._metadatas)),
+            dtype=object
+        )
+        if op == "$eq":
+            return values == value
+        if op == "$ne":
+            return values != value
+        if op == "$in":
+            return np.array([v in value for v in values], dtype=bool)
+        if op == "$nin":
+            return np.array([v not in value for v in values], dtype=bool)
+        if op in _COMPARATORS:
+            return np.array([v is not None and bool(_COMPARATORS[op](v, value)) for v in values], dtype=bool)
+        raise ValueError(f"Toán tử where không hỗ trợ: {op}")
+
+    def _rows(self, slots: List[int], include: List[str]) -> Dict[str, Any]:
+        rows: Dict[str, Any] = {"ids": [self._ids[s] for s in slots]}
+        if "metadatas" in include:
+            rows["metadatas"] = [self._metadatas[s] for s in slots]
+        if "documents" in include:
+            rows["documents"] = [self._documents[s] for s in slots]
+        if "embeddings" in include:
+            rows["embeddings"] = self._dense(slots).tolist() if slots else []
+        return rows
+
+    def _dense(self, slots: List[int]) -> np.ndarray:
+        """
+        Vector float32 của các slot (bản đầy đủ nếu có, ngược lại giải lượng tử)
+        """
+        if self._full is not None:
+            return np.asarray(self._full[slots], dtype=np.float32)
+        vectors = np.asarray(self._vectors[slots], dtype=np.float32)
+        if self.quantized:
+            vectors *= self._scales[slots][:, None]
+        return vectors
@@ -1,10 +1,27 @@
-import chromadb
+import re
 import uuid
 import json
 import os
+import shutil
+import time
+import threading
+import itertools
 from typing import Dict, List, Optional
 from datetime import datetime
 
+import numpy as np
+
+from app.services.lexical_index import LexicalIndex
+from app.services.vector_backends import create_backend
+from app.services.partitions import PartitionedCollection
+from app.services.dedupe import DuplicateDetector
+from app.services.aggregates import CandidateAggregates
+from app.services.blob_store import BlobStore, BlobRefs
+from app.services.section_index import SectionIndex, SectionIndexUnavailable
+from app.services.watchlists import Watchlists, WatchlistsUnavailable
+from app.services.metadata_columns import MetadataColumns
+from app.services.metrics import timed, WATCHLIST_MATCHES
+
 def normalize_metadata(metadata: dict):
     fixed = {}
 
@@ -20,39 +37,389 @@ def normalize_metadata(metadata: dict):
 
     return fixed
 
+HNSW_INT_PARAMS = ("M", "construction_ef", "search_ef", "num_threads", "batch_size", "sync_threshold")
+
+# Giá trị chroma dùng khi collection được tạo không kèm tham số HNSW
+CHROMA_HNSW_DEFAULTS = {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 10}
+
+DEDUPE_ACTIONS = ("merge", "version", "flag")
+
+BASE_COLLECTION = "candidates"
+
+
+class EmbeddingModelChanged(Exception):
+    """
+    Collection đang hoạt động vừa được chuyển sang model embedding khác
+    (re-index), vector truyền vào cần được tạo lại bằng model mới
+    """
+
+
+def collection_name_for_model(embedding_model: str) -> str:
+    """
+    Tên collection gắn với model embedding, ví dụ
+    "all-MiniLM-L6-v2" -> "candidates_all_minilm_l6_v2"
+    """
+    slug = re.sub(r"[^a-z0-9]+", "_", embedding_model.split("/")[-1].lower()).strip("_")
+    return f"{BASE_COLLECTION}_{slug}"[:48].rstrip("_")
+
+
+def create_blob_store(config: Optional[Dict], data_dir: str) -> BlobStore:
+    """
+    BlobStore theo block `vector_store.blobs` trong config.yaml
+    """
+    config = config or {}
+    return BlobStore(
+        root=config.get("root") or os.path.join(data_dir, "blobs"),
+        compression=config.get("compression", "zstd"),
+        level=config.get("level", 3),
+        shard_depth=config.get("shard_depth", 2)
+    )
+
+
 class VectorStore:
     """
-    Quản lý Vector Database (ChromaDB) để lưu trữ và tìm kiếm ứng viên
+    Quản lý Vector Database (ChromaDB hoặc NumPy backend) để lưu trữ và tìm kiếm ứng viên
     """
     
-    def __init__(self, db_path: str = "./data/chroma_db"):
+    def __init__(
+        self,
+        db_path: str = "./data/chroma_db",
+        config: Optional[Dict] = None,
+        embedding_model: Optional[str] = None
+    ):
         """
         Khởi tạo Vector Store
         
         Args:
             db_path: Đường dẫn lưu trữ database
+            config: Block `vector_store` trong config.yaml (optional)
+            embedding_model: Model embedding trong config.yaml (`embedding.model_name`)
         """
         print(f"💾 Đang khởi tạo Vector Database tại: {db_path}")
-        
+
+        self.config = config or {}
+        self.db_path = db_path
+        self.data_dir = os.path.dirname(os.path.normpath(db_path)) or "."
+        self.partitioned = bool(self.config.get("partitioning", {}).get("enabled"))
+
+        # Ghi vào collection đi qua lock này để re-index có thể chuyển collection nguyên tử
+        self.write_lock = threading.RLock()
+        self._dirty_ids: Optional[set] = None
+
+        # Tăng sau mỗi thay đổi dữ liệu, dùng để vô hiệu hóa cache kết quả tìm kiếm
+        self.generation = 0
+
+        # Collection đang phục vụ + model embedding đã tạo ra vector của nó
+        self.active_path = os.path.join(self.data_dir, "active_collection.json")
+        self.active = self._load_active(embedding_model)
+        self.embedding_model: Optional[str] = self.active.get("embedding_model")
+
         try:
-            self.client = chromadb.PersistentClient(path=db_path)
+            # Backend vector: chroma (HNSW, mặc định) hoặc numpy (exact search)
+            self.client = create_backend(self.config, db_path, self.data_dir)
+            self.collection = self.open_collection(self.active["collection"], self.embedding_model)
             
-            self.collection = self.client.get_or_create_collection(
-                name="candidates",
-                metadata={"hnsw:space": "cosine"} 
+            print(
+                f"✅ Vector Database ({self.client.name}) sẵn sàng. "
+                f"Collection: {self.collection.name}, số lượng ứng viên: {self.collection.count()}"
             )
             
-            print(f"✅ Vector Database sẵn sàng. Số lượng ứng viên: {self.collection.count()}")
-            
         except Exception as e:
             raise Exception(f"Không thể khởi tạo Vector Database: {e}")
 
+        if embedding_model and self.embedding_model and embedding_model != self.embedding_model:
+            print(
+                f"⚠️ Collection {self.collection.name} được tạo bằng model {self.embedding_model}, "
+                f"config yêu cầu {embedding_model}. Vẫn dùng {self.embedding_model} cho tìm kiếm "
+                f"cho đến khi chạy re-index (POST /api/reindex)."
+            )
+
+        # Lexical index (BM25) trên cv_text
+        lexical_cfg = self.config.get("lexical", {})
+        self.lexical_index = LexicalIndex(
+            index_dir=os.path.join(self.data_dir, "lexical_index"),
+            k1=lexical_cfg.get("k1", 1.2),
+            b=lexical_cfg.get("b", 0.75),
+            compact_every=lexical_cfg.get("compact_every", 500)
+        )
+        if len(self.lexical_index) != self._searchable_count():
+            self.rebuild_lexical_index()
+
+        # Phát hiện CV trùng lặp khi ingest
+        dedupe_cfg = self.config.get("dedupe", {})
+        self.dedupe: Optional[DuplicateDetector] = None
+        self.dedupe_action = dedupe_cfg.get("action", "flag")
+        if dedupe_cfg.get("enabled", False):
+            if self.dedupe_action not in DEDUPE_ACTIONS:
+                raise ValueError(f"dedupe.action không hợp lệ: {self.dedupe_action}")
+            self.dedupe = DuplicateDetector(
+                index_dir=os.path.join(self.data_dir, "dedupe_index"),
+                config=dedupe_cfg
+            )
+            if len(self.dedupe) != self._searchable_count():
+                self.rebuild_dedupe_index()
+
+        # Thống kê tổng hợp cho /api/stats, cập nhật tăng dần
+        aggregates_cfg = self.config.get("aggregates", {})
+        self.aggregates_cfg = aggregates_cfg
+        self.aggregates = CandidateAggregates(
+            state_dir=os.path.join(self.data_dir, "aggregates"),
+            experience_bins=aggregates_cfg.get("experience_bins"),
+            snapshot_every=aggregates_cfg.get("snapshot_every", 200)
+        )
+        if self.aggregates.total != self._searchable_count():
+            self.rebuild_aggregates()
+
+        # Cache dạng cột của metadata số / phân loại: lọc khoảng, sắp xếp, đếm
+        columns_cfg = self.config.get("columns", {})
+        self.columns_cfg = columns_cfg
+        self.columns = MetadataColumns(
+            state_dir=os.path.join(self.data_dir, "metadata_columns"),
+            snapshot_every=columns_cfg.get("snapshot_every", 500)
+        )
+        if not self.columns.healthy or len(self.columns) != self._searchable_count():
+            self.rebuild_columns()
+
+        # File CV gốc: blob định địa chỉ theo SHA-256 + số tham chiếu theo ứng viên
+        blobs_cfg = self.config.get("blobs", {})
+        self.blobs = create_blob_store(blobs_cfg, self.data_dir)
+        self.blob_refs = BlobRefs(
+            state_dir=os.path.join(self.data_dir, "blob_refs"),
+            snapshot_every=blobs_cfg.get("snapshot_every", 500)
+        )
+        self.blob_release_grace = blobs_cfg.get("release_grace_seconds", 300)
+        # Blob hết tham chiếu nhưng còn trong grace: sha256 -> thời điểm dọn lại
+        self._pending_releases: Dict[str, float] = {}
+        self._releases_lock = threading.Lock()
+        # Đối chiếu với file_sha256 trong collection trước khi dọn: crash giữa
+        # collection.add và blob_refs.add (_finish_save) để lại ứng viên có file
+        # gốc nhưng chưa có tham chiếu, dọn theo journal sẽ xóa mất file đó
+        blob_entries = dict(self._iter_blob_entries())
+        if not self.blob_refs.healthy or not self.blob_refs.matches(blob_entries):
+            self.rebuild_blob_refs(blob_entries)
+        removed = self.blobs.collect_garbage(
+            self.blob_refs.referenced(),
+            grace_seconds=blobs_cfg.get("gc_grace_seconds", 3600)
+        )
+        if removed:
+            print(f"🧹 Đã dọn {removed} blob không còn ứng viên nào dùng")
+
+        # Vector theo từng section của CV (tìm kiếm mode=sections), tùy chọn
+        self.sections_cfg = self.config.get("sections", {})
+        self.sections: Optional[SectionIndex] = None
+        if self.sections_cfg.get("enabled", False):
+            self.sections = SectionIndex(
+                state_dir=os.path.join(self.data_dir, "section_index"),
+                snapshot_every=self.sections_cfg.get("snapshot_every", 200)
+            )
+
+        # JD đã lưu: ứng viên mới được chấm ngược với mọi JD khi lưu
+        watchlists_cfg = self.config.get("watchlists", {})
+        self.watchlists: Optional[Watchlists] = None
+        if watchlists_cfg.get("enabled", True):
+            self.watchlists = Watchlists(
+                state_dir=os.path.join(self.data_dir, "watchlists"),
+                snapshot_every=watchlists_cfg.get("snapshot_every", 200),
+                max_feed=watchlists_cfg.get("max_feed", 500)
+            )
+
+    @classmethod
+    def open_read_only(cls, db_path: str = "./data/chroma_db", config: Optional[Dict] = None) -> "VectorStore":
+        """
+        Mở collection đang phục vụ để đọc từ một tiến trình khác server (export CLI)
+
+        Bỏ qua toàn bộ bước khởi động có ghi: dựng lại lexical / dedupe /
+        thống kê / metadata cache / tham chiếu blob, dọn blob, ghi con trỏ
+        collection. Chỉ dùng các hàm đọc collection (iter_candidates,
+        candidates_page); các index dẫn xuất không được mở.
+
+        Raises:
+            ValueError: Chưa có collection ứng viên
+        """
+        store = cls.__new__(cls)
+        store.config = config or {}
+        store.db_path = db_path
+        store.data_dir = os.path.dirname(os.path.normpath(db_path)) or "."
+        store.partitioned = bool(store.config.get("partitioning", {}).get("enabled"))
+        store.write_lock = threading.RLock()
+        store._dirty_ids = None
+        store.generation = 0
+
+        store.active_path = os.path.join(store.data_dir, "active_collection.json")
+        store.active = {"collection": BASE_COLLECTION, "embedding_model": None}
+        if os.path.exists(store.active_path):
+            with open(store.active_path, "r", encoding="utf-8") as f:
+                store.active = json.load(f)
+        store.embedding_model = store.active.get("embedding_model")
+
+        store.client = create_backend(store.config, db_path, store.data_dir, read_only=True)
+        store.collection = store.open_collection(store.active["collection"], read_only=True)
+        return store
+
+    def _load_active(self, embedding_model: Optional[str]) -> Dict:
+        """
+        Đọc con trỏ collection đang hoạt động; lần đầu chạy thì trỏ tới
+        collection mặc định với model hiện tại trong config
+        """
+        if os.path.exists(self.active_path):
+            with open(self.active_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        active = {"collection": BASE_COLLECTION, "embedding_model": embedding_model}
+        self._save_active(active)
+        return active
+
+    def _save_active(self, active: Dict):
+        os.makedirs(self.data_dir, exist_ok=True)
+        tmp = self.active_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(active, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.active_path)
+
+    def open_collection(self, name: str, embedding_model: Optional[str] = None, read_only: bool = False):
+        """
+        Mở (hoặc tạo) collection ứng viên theo tên, có partition nếu được bật
+
+        Args:
+            name: Tên collection (hoặc tên gốc của các partition)
+            embedding_model: Model embedding, được ghi vào metadata của collection
+            read_only: Chỉ mở collection đã có, không tạo / ghi manifest
+
+        Raises:
+            ValueError: read_only mà collection chưa tồn tại
+        """
+        metadata = self._hnsw_metadata()
+        if embedding_model:
+            metadata["embedding_model"] = embedding_model
+
+        if self.partitioned:
+            # Mỗi partition là một collection riêng, tìm kiếm fan-out song song
+            manifest = "partitions.json" if name == BASE_COLLECTION else f"partitions.{name}.json"
+            return PartitionedCollection(
+                client=self.client,
+                base_name=name,
+                config=self.config.get("partitioning", {}),
+                metadata=metadata,
+                archive_client=create_backend(
+                    self.config, self.db_path, self.data_dir, suffix="_archive", read_only=read_only
+                ),
+                manifest_path=os.path.join(self.data_dir, manifest),
+                read_only=read_only
+            )
+
+        if read_only:
+            return self.client.get_collection(name)
+
+        collection = self.client.get_or_create_collection(name=name, metadata=metadata)
+        self._check_hnsw_params(collection)
+        return collection
+
+    def drop_collection(self, collection):
+        """
+        Xóa hẳn một collection ứng viên (kể cả mọi partition của nó)
+        """
+        if isinstance(collection, PartitionedCollection):
+            for partition in collection.hot_partitions():
+                self.client.delete_collection(collection.collection_name(partition))
+            for partition in collection.archived_partitions():
+                collection.archive_client.delete_collection(collection.collection_name(partition))
+            if os.path.exists(collection.manifest_path):
+                os.remove(collection.manifest_path)
+        else:
+            self.client.delete_collection(collection.name)
+
+    def switch_collection(self, collection, embedding_model: str, keep_previous: bool = True) -> Dict:
+        """
+        Chuyển collection đang phục vụ sang `collection` (blue/green)
+
+        Con trỏ được ghi bằng os.replace nên sau restart luôn trỏ tới đúng
+        một collection; caller giữ write_lock để không có ghi nào bị lỡ.
+        """
+        with self.write_lock:
+            previous = self.collection
+            self.active = {
+                "collection": collection.name,
+                "embedding_model": embedding_model,
+                "previous_collection": previous.name if keep_previous else None,
+                "previous_embedding_model": self.embedding_model,
+                "switched_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+            self._save_active(self.active)
+            self.collection = collection
+            self.embedding_model = embedding_model
+            self.bump_generation()
+
+        if not keep_previous and previous.name != collection.name:
+            try:
+                self.drop_collection(previous)
+            except Exception as e:
+                print(f"⚠️ Lỗi khi xóa collection cũ {previous.name}: {e}")
+
+        print(f"🔁 Đã chuyển sang collection {collection.name} ({embedding_model})")
+        return self.active
+
+    def track_changes(self, enabled: bool) -> set:
+        """
+        Bật/tắt ghi nhận ID thay đổi (save/delete) trong lúc re-index
+
+        Returns:
+            set: Các ID đã thay đổi kể từ lần bật trước
+        """
+        with self.write_lock:
+            changed = self._dirty_ids or set()
+            self._dirty_ids = set() if enabled else None
+            return changed
+
+    def _record_write(self, candidate_id: str):
+        self.bump_generation()
+        if self._dirty_ids is not None:
+            self._dirty_ids.add(candidate_id)
+
+    def bump_generation(self):
+        """
+        Đánh dấu dữ liệu đã thay đổi (kết quả tìm kiếm đã cache không còn hợp lệ)
+        """
+        self.generation += 1
+
+    def _hnsw_metadata(self) -> Dict:
+        """
+        Tham số HNSW cho collection mới, lấy từ `vector_store.hnsw` trong config.yaml
+        """
+        hnsw_cfg = self.config.get("hnsw", {})
+        metadata = {"hnsw:space": hnsw_cfg.get("space", "cosine")}
+
+        for key in HNSW_INT_PARAMS:
+            if hnsw_cfg.get(key) is not None:
+                metadata[f"hnsw:{key}"] = int(hnsw_cfg[key])
+
+        return metadata
+
+    def _check_hnsw_params(self, collection):
+        """
+        Tham số HNSW chỉ áp dụng khi tạo collection; cảnh báo nếu collection
+        hiện có được tạo với tham số khác config (cần re-index để áp dụng).
+        """
+        if self.client.name != "chroma":
+            return
+
+        current = {**CHROMA_HNSW_DEFAULTS, **(collection.metadata or {})}
+        for key, value in self._hnsw_metadata().items():
+            if key in current and current[key] != value:
+                print(
+                    f"⚠️ Collection {collection.name} đang dùng {key}={current[key]}, "
+                    f"config yêu cầu {value}. Cần re-index để áp dụng."
+                )
+
     def save_candidate(
         self, 
         cv_text: str, 
         cv_data: Dict, 
         embedding: List[float],
-        file_name: str = ""
+        file_name: str = "",
+        duplicate: Optional[Dict] = None,
+        embedding_model: Optional[str] = None,
+        blob: Optional[Dict] = None,
+        sections: Optional[Dict] = None
     ) -> str:
         """
         Lưu thông tin ứng viên vào database
@@ -62,39 +429,297 @@ class VectorStore:
             cv_data: Thông tin đã trích xuất (JSON)
             embedding: Vector embedding
             file_name: Tên file CV gốc
+            duplicate: Kết quả check_duplicate (nếu có), quyết định merge/version/flag
+            embedding_model: Model đã tạo `embedding`; khác model của collection
+                đang hoạt động thì raise EmbeddingModelChanged
+            blob: Kết quả BlobStore.put của file gốc (sha256, size)
+            sections: Vector theo section {"kinds": [...], "embeddings": [...]},
+                cùng model với `embedding` (khi bật section index)
             
         Returns:
             str: ID của document đã lưu
         """
-        doc_id = str(uuid.uuid4())
-        metadata = self._prepare_metadata(cv_data, file_name)
+        result = self.save_candidates([{
+            "cv_text": cv_text,
+            "cv_data": cv_data,
+            "embedding": embedding,
+            "file_name": file_name,
+            "duplicate": duplicate,
+            "embedding_model": embedding_model,
+            "blob": blob,
+            "sections": sections
+        }])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def save_candidates(self, items: List[Dict]) -> List:
+        """
+        Lưu nhiều ứng viên với một lần ghi collection (group commit)
+
+        Args:
+            items: Mỗi phần tử là tham số của save_candidate (cv_text, cv_data,
+                embedding, file_name, duplicate, embedding_model, blob, sections)
+
+        Returns:
+            List: ID đã lưu, hoặc EmbeddingModelChanged cho phần tử có vector
+                tạo bằng model cũ (theo đúng thứ tự items)
+        """
+        prepared = [self._prepare_save(item) for item in items]
+        results: List = [None] * len(items)
+        add_failed = set()
 
         # Try to add to collection but don't let telemetry/add errors fail the whole flow
-        add_failed = False
-        try:
-            self.collection.add(
-                ids=[doc_id],
-                embeddings=[embedding],
-                metadatas=[metadata],
-                documents=[cv_text]
-            )
-            print(f"Đã lưu ứng viên: {metadata.get('full_name')} (ID: {doc_id[:8]}...)")
-        except Exception as e:
-            # Some chromadb versions emit telemetry-related exceptions after add;
-            # log and continue so the overall upload doesn't return 500 when DB was already written.
-            print(f"⚠️ Lỗi khi thêm vào collection (không chặn): {e}")
-            add_failed = True
+        with self.write_lock:
+            pending = []
+            for i, item in enumerate(items):
+                embedding_model = item.get("embedding_model")
+                if embedding_model and self.embedding_model and embedding_model != self.embedding_model:
+                    results[i] = EmbeddingModelChanged(self.embedding_model)
+                else:
+                    pending.append(i)
+
+            for batch in self._write_batches(pending, prepared):
+                merge = prepared[batch[0]]["action"] == "merge"
+                write = self.collection.upsert if merge else self.collection.add
+                try:
+                    with timed("vector_add"):
+                        write(
+                            ids=[prepared[i]["doc_id"] for i in batch],
+                            embeddings=[items[i]["embedding"] for i in batch],
+                            metadatas=[prepared[i]["metadata"] for i in batch],
+                            documents=[items[i]["cv_text"] for i in batch]
+                        )
+                    for i in batch:
+                        self._record_write(prepared[i]["doc_id"])
+                        print(f"Đã lưu ứng viên: {prepared[i]['metadata'].get('full_name')} (ID: {prepared[i]['doc_id'][:8]}...)")
+                except Exception as e:
+                    # Some chromadb versions emit telemetry-related exceptions after add;
+                    # log and continue so the overall upload doesn't return 500 when DB was already written.
+                    print(f"⚠️ Lỗi khi thêm vào collection (không chặn): {e}")
+                    add_failed.update(batch)
+
+        for i in pending:
+            self._finish_save(items[i], prepared[i], add_failed=i in add_failed)
+            # If add failed earlier, still return the generated id to avoid upstream 500s.
+            results[i] = prepared[i]["doc_id"]
+
+        # Cả lô ứng viên mới chấm với mọi JD đã lưu trong một lần nhân ma trận
+        self._match_watchlists([
+            (prepared[i]["doc_id"], items[i]["embedding"], prepared[i]["metadata"])
+            for i in pending if i not in add_failed
+        ])
+
+        self.sweep_blob_releases()
+
+        # lexical / dedupe index đã cập nhật xong -> vô hiệu hóa cache lần nữa
+        self.bump_generation()
+        return results
+
+    def _prepare_save(self, item: Dict) -> Dict:
+        """
+        ID, metadata và bản cũ (khi merge) của một ứng viên sắp lưu
+        """
+        duplicate = item.get("duplicate")
+        action = duplicate["action"] if duplicate else None
+
+        # merge: ghi đè lên ứng viên cũ, giữ nguyên ID
+        doc_id = duplicate["matched_id"] if action == "merge" else str(uuid.uuid4())
+        metadata = self._prepare_metadata(item["cv_data"], item.get("file_name", ""))
+
+        if action in ("merge", "version"):
+            metadata["version"] = duplicate.get("version", 1) + 1
+        if action == "version":
+            metadata["previous_id"] = duplicate["matched_id"]
+        if action == "flag":
+            metadata["duplicate_of"] = duplicate["matched_id"]
+        if item.get("blob"):
+            metadata["file_sha256"] = item["blob"]["sha256"]
+            metadata["file_size"] = int(item["blob"].get("size", 0))
+
+        return {
+            "doc_id": doc_id,
+            "action": action,
+            "metadata": metadata,
+            # merge ghi đè bản cũ -> trừ bản cũ khỏi thống kê trước khi cộng bản mới
+            "previous": self._get_metadata(doc_id) if action == "merge" else None
+        }
+
+    @staticmethod
+    def _write_batches(indexes: List[int], prepared: List[Dict]) -> List[List[int]]:
+        """
+        Chia các ứng viên thành lô add / upsert liên tiếp, mỗi lô không trùng ID
+        """
+        batches: List[List[int]] = []
+        seen: set = set()
+        for i in indexes:
+            merge = prepared[i]["action"] == "merge"
+            doc_id = prepared[i]["doc_id"]
+            if (
+                not batches
+                or (prepared[batches[-1][0]]["action"] == "merge") != merge
+                or doc_id in seen
+            ):
+                batches.append([])
+                seen = set()
+            batches[-1].append(i)
+            seen.add(doc_id)
+        return batches
+
+    def _finish_save(self, item: Dict, prepared: Dict, add_failed: bool = False):
+        """
+        Ghi full profile và cập nhật lexical / dedupe / thống kê sau khi ghi collection
+        """
+        doc_id = prepared["doc_id"]
+        cv_text, cv_data = item["cv_text"], item["cv_data"]
 
         # Write full profile to disk (try regardless of add outcome)
         try:
             os.makedirs(os.path.dirname(f"./data/full_profiles/{doc_id}.json"), exist_ok=True)
-            with open(f"./data/full_profiles/{doc_id}.json", "w", encoding="utf-8") as f:
+            with timed("profile_io"), open(f"./data/full_profiles/{doc_id}.json", "w", encoding="utf-8") as f:
                 json.dump(cv_data, f, ensure_ascii=False, indent=2)
         except Exception as e:
             print(f"⚠️ Lỗi khi lưu full profile: {e}")
 
-        # If add failed earlier, still return the generated id to avoid upstream 500s.
-        return doc_id
+        try:
+            self.lexical_index.add_document(doc_id, cv_text)
+        except Exception as e:
+            print(f"⚠️ Lỗi khi cập nhật lexical index: {e}")
+
+        if self.dedupe is not None:
+            try:
+                self.dedupe.add(doc_id, cv_text, cv_data)
+            except Exception as e:
+                print(f"⚠️ Lỗi khi cập nhật dedupe index: {e}")
+
+        if not add_failed:
+            try:
+                if prepared["previous"] is not None:
+                    self.aggregates.remove(prepared["previous"])
+                self.aggregates.add(prepared["metadata"])
+            except Exception as e:
+                print(f"⚠️ Lỗi khi cập nhật thống kê: {e}")
+
+            try:
+                self.columns.add(doc_id, prepared["metadata"])
+            except Exception as e:
+                print(f"⚠️ Lỗi khi cập nhật metadata cache: {e}")
+
+        if item.get("blob") and not add_failed:
+            try:
+                freed = self.blob_refs.add(doc_id, {**item["blob"], "filename": item.get("file_name", "")})
+                if freed:
+                    # merge thay file khác -> blob cũ không còn ai dùng
+                    self._release_blob(freed)
+            except Exception as e:
+                print(f"⚠️ Lỗi khi cập nhật tham chiếu file gốc: {e}")
+
+        if item.get("sections") and self.sections is not None and not add_failed:
+            try:
+                self.sections.add(
+                    doc_id,
+                    item["sections"]["kinds"],
+                    item["sections"]["embeddings"],
+                    embedding_model=item.get("embedding_model") or self.embedding_model
+                )
+            except Exception as e:
+                print(f"⚠️ Lỗi khi cập nhật section index: {e}")
+
+        # version: bản cũ được rút khỏi chỉ mục tìm kiếm, profile chuyển vào lịch sử
+        if prepared["action"] == "version":
+            self._retire_version(item["duplicate"]["matched_id"])
+
+    def _match_watchlists(self, candidates: List):
+        if self.watchlists is None or not candidates or not len(self.watchlists):
+            return
+        try:
+            with timed("watchlist_match"):
+                matched = self.watchlists.match(candidates, self.embedding_model)
+            WATCHLIST_MATCHES.inc(sum(len(ids) for ids in matched.values()))
+        except Exception as e:
+            print(f"⚠️ Lỗi khi đối chiếu watchlist: {e}")
+
+    def check_duplicate(self, cv_text: str, cv_data: Dict, embedding: List[float]) -> Optional[Dict]:
+        """
+        Kiểm tra CV mới có trùng với ứng viên đã lưu hay không
+
+        Args:
+            cv_text: Nội dung CV dạng text (raw)
+            cv_data: Thông tin đã trích xuất (JSON)
+            embedding: Vector embedding của CV mới
+
+        Returns:
+            Optional[Dict]: None nếu không trùng, ngược lại gồm action, matched_id,
+                reasons, jaccard, similarity, version
+        """
+        if self.dedupe is None:
+            return None
+
+        candidates = self.dedupe.find_candidates(cv_text, cv_data)
+        if not candidates:
+            return None
+
+        fetched = self.collection.get(
+            ids=[c["id"] for c in candidates],
+            include=["embeddings", "metadatas"]
+        )
+        if not fetched["ids"]:
+            return None
+
+        query = np.asarray(embedding, dtype=np.float32)
+        matrix = np.asarray(fetched["embeddings"], dtype=np.float32)
+        sims = matrix @ query / np.maximum(
+            np.linalg.norm(matrix, axis=1) * np.linalg.norm(query), 1e-12
+        )
+        similarities = {cid: round(float(sim), 4) for cid, sim in zip(fetched["ids"], sims)}
+        versions = {
+            cid: int(meta.get("version") or 1)
+            for cid, meta in zip(fetched["ids"], fetched["metadatas"])
+        }
+
+        match = self.dedupe.decide(
+            [c for c in candidates if c["id"] in similarities],
+            similarities
+        )
+        if match is None:
+            return None
+
+        print(f"🪞 Phát hiện CV trùng với {match['id'][:8]}... ({', '.join(match['reasons'])})")
+        return {
+            "action": self.dedupe_action,
+            "matched_id": match["id"],
+            "reasons": match["reasons"],
+            "jaccard": match["jaccard"],
+            "similarity": match["similarity"],
+            "version": versions.get(match["id"], 1)
+        }
+
+    def _retire_version(self, candidate_id: str):
+        """
+        Rút phiên bản cũ khỏi collection / lexical / dedupe index, giữ profile trong versions/
+        """
+        try:
+            previous = self._get_metadata(candidate_id)
+            with self.write_lock:
+                self.collection.delete(ids=[candidate_id])
+                self._record_write(candidate_id)
+            self.lexical_index.remove_document(candidate_id)
+            if self.dedupe is not None:
+                self.dedupe.remove(candidate_id)
+            if self.sections is not None:
+                self.sections.remove(candidate_id)
+            if self.watchlists is not None:
+                self.watchlists.remove_candidate(candidate_id)
+            if previous is not None:
+                self.aggregates.remove(previous)
+            self.columns.remove(candidate_id)
+
+            profile_path = f"./data/full_profiles/{candidate_id}.json"
+            if os.path.exists(profile_path):
+                os.makedirs("./data/full_profiles/versions", exist_ok=True)
+                shutil.move(profile_path, f"./data/full_profiles/versions/{candidate_id}.json")
+        except Exception as e:
+            print(f"⚠️ Lỗi khi lưu trữ phiên bản cũ {candidate_id[:8]}...: {e}")
 
     def _prepare_metadata(self, cv_data: Dict, file_name: str = "") -> Dict:
         skills = cv_data.get("skills", [])
@@ -112,6 +737,7 @@ class VectorStore:
             "gpa": float(sum(gpa_values) / len(gpa_values)) if gpa_values else 0.0,
             "project_score": float(sum(project_scores) / len(project_scores)) if project_scores else 0.0,
             "skills_list": ", ".join(skills),
+            "llm_model": cv_data.get("llm_model_used") or "default",
 
             "file_source": file_name,
             "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -124,7 +750,8 @@ class VectorStore:
         query_embedding: List[float], 
         n_results: int = 10,
         min_exp: int = 0,
-        required_skills: Optional[List[str]] = None
+        required_skills: Optional[List[str]] = None,
+        partitions: Optional[List[str]] = None
     ) -> Dict:
         """
         Tìm kiếm ứng viên phù hợp
@@ -134,29 +761,627 @@ class VectorStore:
             n_results: Số lượng kết quả trả về
             min_exp: Số năm kinh nghiệm tối thiểu
             required_skills: Danh sách kỹ năng bắt buộc (optional)
+            partitions: Chỉ tìm trong các partition này (khi bật partitioning)
             
         Returns:
-            Dict: Kết quả tìm kiếm
+            Dict: Kết quả tìm kiếm, kèm `exhausted` (True khi vector store
+                không còn ứng viên nào ngoài số đã trả, trước khi lọc skills)
         """
         try:
             where_clause = {"years_exp": {"$gte": min_exp}}
             
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results,
-                where=where_clause,
-                include=["embeddings", "metadatas", "documents", "distances"]
-            )
+            with timed("vector_query"):
+                results = self.collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=n_results,
+                    where=where_clause,
+                    include=["metadatas", "documents", "distances"],
+                    **self._partition_kwargs(partitions)
+                )
+            exhausted = not results["ids"] or len(results["ids"][0]) < n_results
             
             if required_skills and results['ids']:
                 filtered_results = self._filter_by_skills(results, required_skills)
-                return filtered_results
+                return {**filtered_results, "exhausted": exhausted}
             
-            return results
+            return {**results, "exhausted": exhausted}
             
         except Exception as e:
             raise Exception(f"Lỗi khi tìm kiếm: {e}")
 
+    def _partition_kwargs(self, partitions: Optional[List[str]]) -> Dict:
+        if self.partitioned and partitions:
+            return {"partitions": partitions}
+        return {}
+
+    def search_candidates_batch(self, queries: List[Dict]) -> List[Dict]:
+        """
+        Tìm kiếm nhiều JD cùng lúc bằng một lệnh query nhiều embedding
+
+        Các query có cùng điều kiện lọc (min_exp, partitions) được gom lại thành
+        một lần gọi collection.query; required_skills vẫn lọc hậu kỳ cho từng query.
+
+        Args:
+            queries: Danh sách dict gồm query_embedding, n_results,
+                min_exp, required_skills, partitions
+
+        Returns:
+            List[Dict]: Kết quả cho từng query, cùng format với search_candidates
+        """
+        results: List[Optional[Dict]] = [None] * len(queries)
+
+        groups: Dict[tuple, List[int]] = {}
+        for idx, q in enumerate(queries):
+            key = (int(q.get("min_exp", 0)), tuple(q.get("partitions") or ()))
+            groups.setdefault(key, []).append(idx)
+
+        try:
+            for (min_exp, partitions), indexes in groups.items():
+                n_results = max(int(queries[i].get("n_results", 10)) for i in indexes)
+
+                with timed("vector_query"):
+                    batch = self.collection.query(
+                        query_embeddings=[queries[i]["query_embedding"] for i in indexes],
+                        n_results=n_results,
+                        where={"years_exp": {"$gte": min_exp}},
+                        include=["metadatas", "documents", "distances"],
+                        **self._partition_kwargs(list(partitions))
+                    )
+
+                for pos, idx in enumerate(indexes):
+                    limit = int(queries[idx].get("n_results", 10))
+                    single = {
+                        key: [batch[key][pos][:limit]]
+                        for key in ("ids", "metadatas", "documents", "distances")
+                    }
+
+                    required_skills = queries[idx].get("required_skills")
+                    if required_skills and single["ids"]:
+                        single = self._filter_by_skills(single, required_skills)
+
+                    results[idx] = single
+
+            return results
+
+        except Exception as e:
+            raise Exception(f"Lỗi khi tìm kiếm hàng loạt: {e}")
+
+    def lexical_search(
+        self,
+        query_text: str,
+        n_results: int = 10,
+        min_exp: int = 0,
+        required_skills: Optional[List[str]] = None,
+        partitions: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Tìm kiếm thuần BM25 trên cv_text (không cần embedding)
+
+        Args:
+            query_text: Nội dung JD / từ khóa
+            n_results: Số lượng kết quả trả về
+            min_exp: Số năm kinh nghiệm tối thiểu
+            required_skills: Danh sách kỹ năng bắt buộc (optional)
+            partitions: Chỉ lấy ứng viên thuộc các partition này (khi bật partitioning)
+
+        Returns:
+            Dict: Kết quả cùng format search_candidates, kèm `scores` (0-1)
+        """
+        pool = n_results * self.config.get("hybrid", {}).get("overfetch", 3)
+        with timed("lexical_query"):
+            hits = self.lexical_index.search(query_text, n_results=pool)
+        if not hits:
+            return {"ids": [[]], "metadatas": [[]], "documents": [[]], "scores": [[]], "exhausted": True}
+
+        max_score = hits[0][1] or 1.0
+        lexical_scores = {doc_id: score / max_score for doc_id, score in hits}
+
+        results = self._fetch_ranked(list(lexical_scores.keys()), lexical_scores, min_exp, partitions)
+        if required_skills and results["ids"][0]:
+            results = self._filter_by_skills(results, required_skills)
+
+        return {**{k: [v[0][:n_results]] for k, v in results.items()}, "exhausted": len(hits) < pool}
+
+    def hybrid_search(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        n_results: int = 10,
+        min_exp: int = 0,
+        required_skills: Optional[List[str]] = None,
+        alpha: Optional[float] = None,
+        partitions: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Tìm kiếm kết hợp vector + BM25
+
+        score = alpha * vector_similarity + (1 - alpha) * bm25_normalized
+
+        Args:
+            query_text: Nội dung JD
+            query_embedding: Vector của JD
+            n_results: Số lượng kết quả trả về
+            min_exp: Số năm kinh nghiệm tối thiểu
+            required_skills: Danh sách kỹ năng bắt buộc (optional)
+            alpha: Trọng số vector (mặc định lấy từ config hybrid.alpha)
+            partitions: Chỉ tìm trong các partition này (khi bật partitioning)
+
+        Returns:
+            Dict: Kết quả cùng format search_candidates, kèm `scores` (0-1)
+        """
+        hybrid_cfg = self.config.get("hybrid", {})
+        if alpha is None:
+            alpha = hybrid_cfg.get("alpha", 0.6)
+        pool = n_results * hybrid_cfg.get("overfetch", 3)
+
+        vector_results = self.search_candidates(
+            query_embedding=query_embedding,
+            n_results=pool,
+            min_exp=min_exp,
+            partitions=partitions
+        )
+        vector_scores = {}
+        if vector_results["ids"]:
+            for cid, dist in zip(vector_results["ids"][0], vector_results["distances"][0]):
+                vector_scores[cid] = min(max(1 - dist, 0.0), 1.0)
+
+        lexical_scores = {}
+        with timed("lexical_query"):
+            hits = self.lexical_index.search(query_text, n_results=pool)
+        if hits:
+            max_score = hits[0][1] or 1.0
+            lexical_scores = {doc_id: score / max_score for doc_id, score in hits}
+
+        fused = {
+            cid: alpha * vector_scores.get(cid, 0.0) + (1 - alpha) * lexical_scores.get(cid, 0.0)
+            for cid in set(vector_scores) | set(lexical_scores)
+        }
+        ranked = sorted(fused, key=fused.get, reverse=True)
+
+        results = self._fetch_ranked(ranked, fused, min_exp, partitions)
+        if required_skills and results["ids"][0]:
+            results = self._filter_by_skills(results, required_skills)
+
+        exhausted = vector_results["exhausted"] and len(hits) < pool
+        return {**{k: [v[0][:n_results]] for k, v in results.items()}, "exhausted": exhausted}
+
+    def search_allowlist(
+        self,
+        query_embedding: List[float],
+        filters: Dict,
+        n_results: int = 10,
+        min_exp: int = 0,
+        required_skills: Optional[List[str]] = None,
+        partitions: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Tìm kiếm vector chính xác trên tập ứng viên khớp bộ lọc metadata cache
+
+        Dùng khi bộ lọc chọn lọc (ít ứng viên khớp): đọc embedding của đúng các
+        ứng viên đó và tính cosine, thay vì query ANN rất sâu rồi lọc sau.
+
+        Args:
+            query_embedding: Vector của JD
+            filters: Bộ lọc metadata cache (xem MetadataColumns)
+            n_results: Số lượng kết quả trả về
+            min_exp: Số năm kinh nghiệm tối thiểu
+            required_skills: Danh sách kỹ năng bắt buộc (optional)
+            partitions: Chỉ lấy ứng viên thuộc các partition này (khi bật partitioning)
+
+        Returns:
+            Dict: Kết quả cùng format search_candidates (distance = 1 - cosine)
+        """
+        with timed("metadata_columns"):
+            ids, _ = self.columns.query(filters, limit=self.columns_cfg.get("allowlist_max", 5000))
+        if not ids:
+            return {"ids": [[]], "metadatas": [[]], "documents": [[]], "distances": [[]], "exhausted": True}
+
+        with timed("vector_query"):
+            fetched = self.collection.get(ids=ids, include=["embeddings", "metadatas", "documents"])
+            allowed = self._allowed_partitions(partitions)
+            rows = [
+                i for i, meta in enumerate(fetched["metadatas"])
+                if int(meta.get("years_exp", 0) or 0) >= min_exp
+                and (allowed is None or meta.get("partition") in allowed)
+            ]
+            if not rows:
+                return {"ids": [[]], "metadatas": [[]], "documents": [[]], "distances": [[]], "exhausted": True}
+
+            matrix = np.asarray([fetched["embeddings"][i] for i in rows], dtype=np.float32)
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            query = np.asarray(query_embedding, dtype=np.float32)
+            similarities = matrix @ (query / max(float(np.linalg.norm(query)), 1e-12))
+            # Lọc skills sau đó có thể bỏ bớt: giữ cả danh sách đã xếp hạng
+            order = np.argsort(-similarities, kind="stable")
+
+        results = {
+            "ids": [[fetched["ids"][rows[j]] for j in order]],
+            "metadatas": [[fetched["metadatas"][rows[j]] for j in order]],
+            "documents": [[fetched["documents"][rows[j]] for j in order]],
+            "distances": [[float(1 - similarities[j]) for j in order]]
+        }
+        if required_skills and results["ids"][0]:
+            results = self._filter_by_skills(results, required_skills)
+
+        # Mọi ứng viên khớp bộ lọc đã được chấm: hết khi không còn gì sau n_results
+        return {**{k: [v[0][:n_results]] for k, v in results.items()}, "exhausted": len(rows) <= n_results}
+
+    def section_search(
+        self,
+        query_embedding: List[float],
+        n_results: int = 10,
+        min_exp: int = 0,
+        required_skills: Optional[List[str]] = None,
+        scoring: Optional[str] = None,
+        partitions: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Tìm kiếm trên section index: JD được so với từng section (skills,
+        từng project, từng education, summary) rồi gom điểm theo ứng viên
+
+        Args:
+            query_embedding: Vector của JD (cùng model với collection)
+            n_results: Số lượng kết quả trả về
+            min_exp: Số năm kinh nghiệm tối thiểu
+            required_skills: Danh sách kỹ năng bắt buộc (optional)
+            scoring: max | weighted (mặc định lấy từ config sections.scoring)
+            partitions: Chỉ trả ứng viên thuộc các partition này (như search_candidates)
+
+        Returns:
+            Dict: Kết quả cùng format search_candidates, kèm `scores` (0-1)
+                và `matched_sections` (loại section khớp nhất)
+
+        Raises:
+            SectionIndexUnavailable: Chưa bật hoặc index chưa đồng bộ với collection
+        """
+        if self.sections is None:
+            raise SectionIndexUnavailable("Section index chưa được bật (vector_store.sections.enabled)")
+        if self.sections.embedding_model and self.sections.embedding_model != self.embedding_model:
+            raise SectionIndexUnavailable(
+                f"Section index dùng model {self.sections.embedding_model}, "
+                f"collection dùng {self.embedding_model}; đang chờ đồng bộ lại"
+            )
+
+        pool = n_results * self.sections_cfg.get("overfetch", 3)
+        with timed("section_query"):
+            hits = self.sections.search(
+                query_embedding,
+                n_results=pool,
+                scoring=scoring or self.sections_cfg.get("scoring", "max"),
+                weights=self.sections_cfg.get("weights")
+            )
+
+        scores = {cid: min(max(score, 0.0), 1.0) for cid, score, _ in hits}
+        matched = {cid: kind for cid, _, kind in hits}
+
+        results = self._fetch_ranked([cid for cid, _, _ in hits], scores, min_exp, partitions)
+        results["matched_sections"] = [[matched[cid] for cid in results["ids"][0]]]
+        if required_skills and results["ids"][0]:
+            results = self._filter_by_skills(results, required_skills)
+
+        return {**{k: [v[0][:n_results]] for k, v in results.items()}, "exhausted": len(hits) < pool}
+
+    def section_stats(self) -> Dict:
+        """
+        Trạng thái section index (số ứng viên / section, model, độ lệch với collection)
+        """
+        if self.sections is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "collection_embedding_model": self.embedding_model,
+            "collection_candidates": self._searchable_count(),
+            **self.sections.stats()
+        }
+
+    # ==========================================================
+    # WATCHLISTS (JD đã lưu + feed ứng viên mới)
+    # ==========================================================
+    def _require_watchlists(self) -> Watchlists:
+        if self.watchlists is None:
+            raise WatchlistsUnavailable("Watchlist chưa được bật (vector_store.watchlists.enabled)")
+        return self.watchlists
+
+    def create_watchlist(
+        self,
+        name: str,
+        jd_text: str,
+        embedding: List[float],
+        embedding_model: Optional[str] = None,
+        min_exp: int = 0,
+        required_skills: Optional[List[str]] = None,
+        threshold: float = 0.5
+    ) -> Dict:
+        """
+        Lưu JD để nhận ứng viên mới khớp vào feed
+
+        Args:
+            embedding: Vector của JD, cùng model với collection đang phục vụ
+            embedding_model: Model đã tạo `embedding`; khác model của
+                collection thì raise EmbeddingModelChanged
+            threshold: Cosine tối thiểu để ứng viên vào feed
+
+        Returns:
+            Dict: Thông tin watchlist vừa tạo
+        """
+        watchlists = self._require_watchlists()
+        if embedding_model and self.embedding_model and embedding_model != self.embedding_model:
+            raise EmbeddingModelChanged(self.embedding_model)
+        return watchlists.create(
+            name, jd_text, embedding, embedding_model or self.embedding_model,
+            min_exp=min_exp, required_skills=required_skills, threshold=threshold
+        )
+
+    def list_watchlists(self) -> List[Dict]:
+        return self._require_watchlists().list_all()
+
+    def watchlist_feed(self, watchlist_id: str, since: int = 0, limit: int = 50) -> Dict:
+        """
+        Ứng viên mới khớp watchlist sau seq `since`
+
+        Returns:
+            Dict: {"watchlist", "entries", "next_since", "has_more"}
+        """
+        return self._require_watchlists().feed(watchlist_id, since=since, limit=limit)
+
+    def delete_watchlist(self, watchlist_id: str) -> bool:
+        return self._require_watchlists().delete(watchlist_id)
+
+    def stale_watchlists(self) -> List[Dict]:
+        """
+        Watchlist có embedding khác model của collection (sau re-index)
+        """
+        if self.watchlists is None:
+            return []
+        return self.watchlists.stale(self.embedding_model)
+
+    def set_watchlist_embedding(self, watchlist_id: str, embedding: List[float], embedding_model: str):
+        self._require_watchlists().set_embedding(watchlist_id, embedding, embedding_model)
+
+    def watchlist_stats(self) -> Dict:
+        if self.watchlists is None:
+            return {"enabled": False}
+        return {"enabled": True, "collection_embedding_model": self.embedding_model, **self.watchlists.stats()}
+
+    def _searchable_count(self) -> int:
+        """
+        Số ứng viên tìm kiếm được (partition đã lưu trữ không tính, giống
+        _iter_pages và metadata cache)
+        """
+        if self.partitioned:
+            return self.collection.hot_count()
+        return self.collection.count()
+
+    def _allowed_partitions(self, partitions: Optional[List[str]]) -> Optional[set]:
+        """
+        Partition được phép xuất hiện trong kết quả: các partition yêu cầu (hoặc
+        mọi partition) đang hoạt động; None khi không bật partitioning
+        """
+        if not self.partitioned:
+            return None
+        hot = set(self.collection.hot_partitions())
+        return hot & set(partitions) if partitions else hot
+
+    def _fetch_ranked(
+        self,
+        ranked_ids: List[str],
+        scores: Dict[str, float],
+        min_exp: int = 0,
+        partitions: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Lấy metadata/document cho danh sách id đã xếp hạng, giữ nguyên thứ tự
+        và loại các ứng viên không đạt min_exp.
+
+        Lexical / section index là chỉ mục chung cho mọi partition, còn
+        collection.get(ids=...) đọc cả partition đã lưu trữ: ứng viên ngoài
+        `partitions` hoặc thuộc partition đã lưu trữ bị loại ở đây.
+        """
+        if not ranked_ids:
+            return {"ids": [[]], "metadatas": [[]], "documents": [[]], "scores": [[]]}
+
+        fetched = self.collection.get(ids=ranked_ids, include=["metadatas", "documents"])
+        rows = {
+            cid: (fetched["metadatas"][i], fetched["documents"][i])
+            for i, cid in enumerate(fetched["ids"])
+        }
+
+        allowed = self._allowed_partitions(partitions)
+
+        out = {"ids": [], "metadatas": [], "documents": [], "scores": []}
+        for cid in ranked_ids:
+            if cid not in rows:
+                continue
+            meta, doc = rows[cid]
+            if int(meta.get("years_exp", 0) or 0) < min_exp:
+                continue
+            if allowed is not None and meta.get("partition") not in allowed:
+                continue
+            out["ids"].append(cid)
+            out["metadatas"].append(meta)
+            out["documents"].append(doc)
+            out["scores"].append(scores[cid])
+
+        return {k: [v] for k, v in out.items()}
+
+    def rebuild_lexical_index(self, page_size: int = 500):
+        """
+        Xây lại lexical index từ toàn bộ document trong collection
+        """
+        print("🔤 Đang xây lại lexical index từ collection...")
+
+        self.lexical_index.rebuild(
+            (page["ids"][i], page["documents"][i])
+            for page in self._iter_pages(["documents"], page_size)
+            for i in range(len(page["ids"]))
+        )
+        print(f"✅ Lexical index: {len(self.lexical_index)} document")
+
+    def rebuild_dedupe_index(self, page_size: int = 500):
+        """
+        Xây lại dedupe index từ document + metadata trong collection
+        """
+        print("🪞 Đang xây lại dedupe index từ collection...")
+
+        self.dedupe.rebuild(
+            (page["ids"][i], page["documents"][i], page["metadatas"][i])
+            for page in self._iter_pages(["documents", "metadatas"], page_size)
+            for i in range(len(page["ids"]))
+        )
+        print(f"✅ Dedupe index: {len(self.dedupe)} ứng viên")
+
+    def rebuild_aggregates(self, page_size: int = 500):
+        """
+        Tính lại thống kê tổng hợp từ metadata trong collection
+        """
+        print("📊 Đang tính lại thống kê từ collection...")
+
+        self.aggregates.rebuild(
+            meta
+            for page in self._iter_pages(["metadatas"], page_size)
+            for meta in page["metadatas"]
+        )
+        print(f"✅ Thống kê: {self.aggregates.total} ứng viên")
+
+    def rebuild_columns(self, page_size: int = 500):
+        """
+        Dựng lại metadata cache dạng cột từ metadata trong collection
+        """
+        print("🧮 Đang dựng lại metadata cache từ collection...")
+
+        self.columns.rebuild(
+            (cid, meta)
+            for page in self._iter_pages(["metadatas"], page_size)
+            for cid, meta in zip(page["ids"], page["metadatas"])
+        )
+        print(f"✅ Metadata cache: {len(self.columns)} ứng viên")
+
+    def _iter_blob_entries(self, page_size: int = 500):
+        """
+        (candidate_id, {"sha256", "filename", "size"}) từ metadata collection,
+        kể cả partition đã lưu trữ (file gốc của chúng vẫn phải giữ)
+        """
+        pages = self._iter_pages(["metadatas"], page_size)
+        if self.partitioned:
+            pages = itertools.chain(pages, self.collection.iter_archived(["metadatas"], page_size))
+        for page in pages:
+            for cid, meta in zip(page["ids"], page["metadatas"]):
+                if meta.get("file_sha256"):
+                    yield cid, {
+                        "sha256": meta["file_sha256"],
+                        "filename": meta.get("file_source", ""),
+                        "size": meta.get("file_size", 0)
+                    }
+
+    def rebuild_blob_refs(self, entries: Optional[Dict[str, Dict]] = None, page_size: int = 500):
+        """
+        Dựng lại tham chiếu blob từ metadata (file_sha256) trong collection
+
+        Args:
+            entries: Tham chiếu đã đọc sẵn từ collection (_iter_blob_entries)
+        """
+        print("📎 Đang dựng lại tham chiếu file gốc từ collection...")
+
+        if entries is None:
+            entries = dict(self._iter_blob_entries(page_size))
+        self.blob_refs.rebuild(entries.items())
+        print(f"✅ Tham chiếu file gốc: {self.blob_refs.stats()}")
+
+    def _release_blob(self, digest: str) -> bool:
+        """
+        Xóa blob vừa hết tham chiếu; blob còn trong release_grace_seconds
+        (vừa được put) được hẹn dọn lại ở lần ghi sau (sweep_blob_releases)
+
+        Returns:
+            bool: True nếu đã xóa ngay
+        """
+        if self.blobs.release(digest, self.blob_release_grace):
+            return True
+        if self.blobs.exists(digest):
+            with self._releases_lock:
+                self._pending_releases[digest] = time.time() + self.blob_release_grace
+        return False
+
+    def sweep_blob_releases(self) -> int:
+        """
+        Dọn các blob đã hẹn (hết grace mà vẫn không có tham chiếu); gọi sau
+        mỗi lần save / delete nên không cần đợi GC lúc khởi động
+
+        Returns:
+            int: Số blob đã xóa
+        """
+        now = time.time()
+        with self._releases_lock:
+            due = [digest for digest, at in self._pending_releases.items() if at <= now]
+        if not due:
+            return 0
+
+        removed = 0
+        for digest in due:
+            try:
+                # Được tham chiếu lại (upload cùng nội dung) -> bỏ hẹn
+                if self.blob_refs.count(digest) > 0 or not self.blobs.exists(digest):
+                    retry = None
+                elif self.blobs.release(digest, self.blob_release_grace):
+                    removed += 1
+                    retry = None
+                else:
+                    # put lại trong lúc chờ (mtime mới) -> hẹn thêm một grace
+                    retry = now + self.blob_release_grace
+            except Exception as e:
+                print(f"⚠️ Lỗi khi dọn blob {digest[:12]}...: {e}")
+                retry = now + self.blob_release_grace
+
+            with self._releases_lock:
+                if retry is None:
+                    self._pending_releases.pop(digest, None)
+                else:
+                    self._pending_releases[digest] = retry
+        if removed:
+            print(f"🧹 Đã dọn {removed} blob hết thời gian chờ")
+        return removed
+
+    def get_file_ref(self, candidate_id: str) -> Optional[Dict]:
+        """
+        Vị trí file CV gốc của ứng viên
+
+        Returns:
+            Optional[Dict]: {"sha256", "filename", "size"} (blob store) hoặc
+                {"path", "filename"} (file upload kiểu cũ), None nếu không có
+        """
+        ref = self.blob_refs.get(candidate_id)
+        if ref is not None:
+            return ref
+
+        folder = "./data/uploaded_cvs"
+        prefix = f"{candidate_id}_"
+        if os.path.isdir(folder):
+            for name in os.listdir(folder):
+                if name.startswith(prefix):
+                    return {"path": os.path.join(folder, name), "filename": name[len(prefix):]}
+        return None
+
+    def _get_metadata(self, candidate_id: str) -> Optional[Dict]:
+        """
+        Metadata hiện tại của một ứng viên (None nếu không tồn tại)
+        """
+        fetched = self.collection.get(ids=[candidate_id], include=["metadatas"])
+        if not fetched["ids"]:
+            return None
+        return fetched["metadatas"][0]
+
+    def _iter_pages(self, include: List[str], page_size: int = 500):
+        """
+        Duyệt toàn bộ collection theo từng trang
+        """
+        offset = 0
+        while True:
+            page = self.collection.get(limit=page_size, offset=offset, include=include)
+            if not page["ids"]:
+                break
+            yield page
+            offset += len(page["ids"])
+
     def _filter_by_skills(self, results: Dict, required_skills: List[str]) -> Dict:
         """
         Lọc kết quả theo skills bắt buộc (post-processing)
@@ -168,10 +1393,8 @@ class VectorStore:
         Returns:
             Dict: Kết quả đã lọc
         """
-        filtered_ids = []
-        filtered_metadatas = []
-        filtered_documents = []
-        filtered_distances = []
+        keys = [k for k in ("ids", "metadatas", "documents", "distances", "scores", "matched_sections") if results.get(k)]
+        filtered = {k: [] for k in keys}
         
         for i in range(len(results['ids'][0])):
             candidate_skills = results['metadatas'][0][i].get('skills_list', '').lower()
@@ -182,17 +1405,10 @@ class VectorStore:
             )
             
             if has_required:
-                filtered_ids.append(results['ids'][0][i])
-                filtered_metadatas.append(results['metadatas'][0][i])
-                filtered_documents.append(results['documents'][0][i])
-                filtered_distances.append(results['distances'][0][i])
+                for k in keys:
+                    filtered[k].append(results[k][0][i])
         
-        return {
-            'ids': [filtered_ids],
-            'metadatas': [filtered_metadatas],
-            'documents': [filtered_documents],
-            'distances': [filtered_distances]
-        }
+        return {k: [v] for k, v in filtered.items()}
 
     def get_all_candidates(self, limit=100):
         results = self.collection.get(limit=limit, include=["metadatas"])
@@ -206,7 +1422,7 @@ class VectorStore:
             file_path = f"./data/full_profiles/{cid}.json"
 
             if os.path.exists(file_path):
-                with open(file_path, "r", encoding="utf-8") as f:
+                with timed("profile_io"), open(file_path, "r", encoding="utf-8") as f:
                     profile = json.load(f)
 
             full_results.append({
@@ -217,6 +1433,112 @@ class VectorStore:
 
         return full_results
 
+    def iter_candidates(self, columns: Optional[List[str]] = None, page_size: int = 500):
+        """
+        Duyệt toàn bộ ứng viên (metadata + full profile) theo từng trang,
+        bộ nhớ không phụ thuộc số lượng ứng viên
+
+        Args:
+            columns: Các cột cần lấy; profile JSON chỉ được đọc khi có cột
+                không nằm trong metadata (None = lấy tất cả)
+            page_size: Số ứng viên mỗi lần đọc collection
+
+        Yields:
+            Dict: {"id": ..., **metadata, **profile}
+        """
+        offset = 0
+        while True:
+            rows = self.candidates_page(offset, page_size, columns)
+            if not rows:
+                break
+            yield from rows
+            offset += len(rows)
+
+    def candidates_page(self, offset: int, limit: int, columns: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Một trang của iter_candidates
+        """
+        page = self.collection.get(limit=limit, offset=offset, include=["metadatas"])
+        rows = []
+        for cid, meta in zip(page["ids"], page["metadatas"]):
+            row = {"id": cid, **meta}
+
+            if columns is None or any(c not in row for c in columns):
+                file_path = f"./data/full_profiles/{cid}.json"
+                if os.path.exists(file_path):
+                    with open(file_path, "r", encoding="utf-8") as f:
+                        row.update(json.load(f))
+
+            rows.append(row)
+        return rows
+
+    def list_candidates(
+        self,
+        filters: Optional[Dict] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = True,
+        offset: int = 0,
+        limit: int = 100,
+        columns: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Danh sách ứng viên lọc / sắp xếp theo metadata cache, chỉ đọc
+        collection + profile cho các ứng viên của trang
+
+        Args:
+            filters: {"gpa": [min, max], "created_at": [epoch, epoch], "role": [...]}
+                (None ở một đầu = không giới hạn)
+            sort_by: years_exp | gpa | project_score | created_at (None = thứ tự lưu)
+            columns: Như candidates_page (None = kèm full profile)
+
+        Returns:
+            Dict: {"total": số ứng viên khớp bộ lọc, "candidates": [...]}
+
+        Raises:
+            ValueError: Cột lọc / sắp xếp không hỗ trợ
+        """
+        with timed("metadata_columns"):
+            ids, total = self.columns.query(filters, sort_by, descending, offset, limit)
+        if not ids:
+            return {"total": total, "candidates": []}
+
+        fetched = self.collection.get(ids=ids, include=["metadatas"])
+        metadatas = dict(zip(fetched["ids"], fetched["metadatas"]))
+
+        rows = []
+        for cid in ids:
+            if cid not in metadatas:
+                continue
+            row = {"id": cid, **metadatas[cid]}
+
+            if columns is None or any(c not in row for c in columns):
+                file_path = f"./data/full_profiles/{cid}.json"
+                if os.path.exists(file_path):
+                    with timed("profile_io"), open(file_path, "r", encoding="utf-8") as f:
+                        row.update(json.load(f))
+
+            rows.append(row)
+        return {"total": total, "candidates": rows}
+
+    def count_candidates(self, filters: Optional[Dict] = None, group_by: Optional[str] = None) -> Dict:
+        """
+        Đếm ứng viên khớp bộ lọc (gom nhóm theo role / llm_model / years_exp)
+        """
+        with timed("metadata_columns"):
+            return self.columns.count(filters, group_by)
+
+    def filter_ids(self, candidate_ids: List[str], filters: Optional[Dict]) -> List[bool]:
+        """
+        Lọc kết quả tìm kiếm theo metadata cache (True = giữ), cùng thứ tự
+        """
+        with timed("metadata_columns"):
+            return self.columns.keep(candidate_ids, filters)
+
+    def count(self) -> int:
+        """
+        Số ứng viên theo thống kê tổng hợp (không query collection)
+        """
+        return self.aggregates.total
 
     def delete_candidate(self, candidate_id: str) -> bool:
         """
@@ -229,14 +1551,37 @@ class VectorStore:
             bool: True nếu mọi thứ đều xóa ok
         """
         success = True  
+        previous = None
         
         try:
-            self.collection.delete(ids=[candidate_id])
+            previous = self._get_metadata(candidate_id)
+            with self.write_lock:
+                self.collection.delete(ids=[candidate_id])
+                self._record_write(candidate_id)
             print(f"Đã xóa ứng viên khỏi DB: {candidate_id[:8]}...")
         except Exception as e:
             print(f"⚠️ Lỗi khi xóa trong DB: {e}")
             success = False
 
+        try:
+            if success and previous is not None:
+                self.aggregates.remove(previous)
+            if success:
+                self.columns.remove(candidate_id)
+        except Exception as e:
+            print(f"⚠️ Lỗi khi cập nhật thống kê / metadata cache: {e}")
+
+        try:
+            self.lexical_index.remove_document(candidate_id)
+            if self.dedupe is not None:
+                self.dedupe.remove(candidate_id)
+            if self.sections is not None:
+                self.sections.remove(candidate_id)
+            if self.watchlists is not None:
+                self.watchlists.remove_candidate(candidate_id)
+        except Exception as e:
+            print(f"⚠️ Lỗi khi cập nhật lexical / dedupe / section index / watchlist: {e}")
+
         try:
             json_path = f"./data/full_profiles/{candidate_id}.json"
             if os.path.exists(json_path):
@@ -248,7 +1593,19 @@ class VectorStore:
             print(f"Lỗi khi xóa JSON: {e}")
             success = False
 
+        has_blob = False
         try:
+            has_blob = self.blob_refs.get(candidate_id) is not None
+            freed = self.blob_refs.remove(candidate_id)
+            if freed and self._release_blob(freed):
+                print(f"Đã xóa file gốc (blob {freed[:12]}...)")
+            self.sweep_blob_releases()
+        except Exception as e:
+            print(f"⚠️ Lỗi khi xóa file gốc: {e}")
+            success = False
+
+        try:
+            # CV upload trước khi có blob store: ./data/uploaded_cvs/{id}_{tên file}
             folder = "./data/uploaded_cvs"
             deleted_pdf = False
 
@@ -258,14 +1615,93 @@ class VectorStore:
                     print(f"Đã xóa PDF: {file}")
                     deleted_pdf = True
 
-            if not deleted_pdf:
+            if not deleted_pdf and not has_blob:
                 print(f"Không tìm thấy PDF của ứng viên trong {folder}")
         except Exception as e:
             print(f"⚠️ Lỗi khi xóa PDF: {e}")
             success = False
 
+        self.bump_generation()
         return success
 
+    def list_partitions(self) -> List[Dict]:
+        """
+        Danh sách partition (tên, trạng thái hot/archived, số ứng viên)
+        """
+        if not self.partitioned:
+            return [{
+                "name": self.collection.name,
+                "collection": self.collection.name,
+                "state": "hot",
+                "count": self.collection.count()
+            }]
+        return self.collection.list_partitions()
+
+    def archive_partition(self, partition: str) -> Dict:
+        if not self.partitioned:
+            raise RuntimeError("Partitioning chưa được bật")
+        if self._dirty_ids is not None:
+            # Re-index chép partition đã lưu trữ theo danh sách lúc bắt đầu
+            raise RuntimeError("Đang re-index, không thể lưu trữ partition")
+        archived = [
+            (cid, meta)
+            for page in self._iter_partition(partition, ["metadatas"])
+            for cid, meta in zip(page["ids"], page["metadatas"])
+        ]
+        result = self.collection.archive_partition(partition)
+
+        # Ứng viên của partition rời collection đang tìm kiếm: các index dẫn xuất
+        # chỉ phủ partition đang hoạt động (khớp _searchable_count khi khởi động)
+        self.rebuild_columns()
+        try:
+            for candidate_id, meta in archived:
+                self.lexical_index.remove_document(candidate_id)
+                if self.dedupe is not None:
+                    self.dedupe.remove(candidate_id)
+                self.aggregates.remove(meta)
+                if self.sections is not None:
+                    # sync_sections embed lại khi khôi phục partition
+                    self.sections.remove(candidate_id)
+        except Exception as e:
+            print(f"⚠️ Lỗi khi cập nhật lexical / dedupe / thống kê / section index: {e}")
+        self.bump_generation()
+        return result
+
+    def restore_partition(self, partition: str) -> Dict:
+        if not self.partitioned:
+            raise RuntimeError("Partitioning chưa được bật")
+        if self._dirty_ids is not None:
+            # Re-index chép partition đã lưu trữ theo danh sách lúc bắt đầu
+            raise RuntimeError("Đang re-index, không thể khôi phục partition")
+        result = self.collection.restore_partition(partition)
+
+        self.rebuild_columns()
+        try:
+            for page in self._iter_partition(partition, ["documents", "metadatas"]):
+                for candidate_id, document, meta in zip(page["ids"], page["documents"], page["metadatas"]):
+                    self.lexical_index.add_document(candidate_id, document or "")
+                    if self.dedupe is not None:
+                        self.dedupe.add(candidate_id, document or "", meta)
+                    self.aggregates.add(meta)
+        except Exception as e:
+            print(f"⚠️ Lỗi khi cập nhật lexical / dedupe / thống kê: {e}")
+        self.bump_generation()
+        return result
+
+    def _iter_partition(self, partition: str, include: List[str], page_size: int = 500):
+        """
+        Duyệt các ứng viên của một partition đang hoạt động theo từng trang
+        """
+        offset = 0
+        while True:
+            page = self.collection.get(
+                where={"partition": partition}, limit=page_size, offset=offset, include=include
+            )
+            if not page["ids"]:
+                break
+            yield page
+            offset += len(page["ids"])
+
     def get_stats(self) -> Dict:
         """
         Lấy thống kê database
@@ -274,10 +1710,16 @@ class VectorStore:
             Dict: Thông tin thống kê
         """
         try:
-            total = self.collection.count()
+            # Cùng phạm vi với thống kê tổng hợp: partition đã lưu trữ tính riêng
+            total = self._searchable_count()
             return {
                 "total_candidates": total,
-                "collection_name": self.collection.name
+                "archived_candidates": self.collection.count() - total,
+                "collection_name": self.collection.name,
+                **self.aggregates.summary(
+                    top_skills=self.aggregates_cfg.get("top_skills", 20),
+                    days=self.aggregates_cfg.get("days", 30)
+                )
             }
         except Exception as e:
             return {"error": str(e)}
\ No newline at end of file
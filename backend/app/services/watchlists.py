@@ -0,0 +1,403 @@
+import os
+import json
+import uuid
+import base64
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class WatchlistNotFound(KeyError):
+    """
+    Không có watchlist với ID này
+    """
+
+
+class WatchlistsUnavailable(RuntimeError):
+    """
+    Watchlist chưa được bật (vector_store.watchlists.enabled) hoặc dữ liệu
+    trên đĩa bị lỗi, đang chờ khôi phục thủ công
+    """
+
+
+def _encode_vector(vector: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _decode_vector(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32).copy()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class Watchlists:
+    """
+    JD đã lưu (watchlist) và feed ứng viên mới khớp với từng JD
+
+    Mỗi watchlist giữ embedding của JD, bộ lọc (min_exp, required_skills) và
+    ngưỡng điểm. Khi lưu ứng viên mới, `match` chấm cả lô ứng viên với mọi JD
+    bằng một phép nhân ma trận (tìm kiếm ngược) và nối ứng viên đạt ngưỡng vào
+    feed của JD; "có gì mới cho vị trí này" chỉ còn là đọc feed từ `seq` cuối
+    đã xem.
+
+    Lưu trữ: snapshot JSON + journal (JSON lines), gộp sau `snapshot_every`
+    thao tác. Feed mỗi JD giữ tối đa `max_feed` mục gần nhất.
+
+    Watchlist không dựng lại được từ collection: dòng cuối journal ghi dở
+    (crash giữa chừng) được bỏ qua, lỗi khác đưa về chế độ chỉ đọc
+    (`healthy` = False) và snapshot / journal trên đĩa được giữ nguyên.
+    """
+
+    def __init__(self, state_dir: str = "./data/watchlists", snapshot_every: int = 200, max_feed: int = 500):
+        self.state_dir = state_dir
+        self.snapshot_path = os.path.join(state_dir, "snapshot.json")
+        self.journal_path = os.path.join(state_dir, "journal.log")
+        self.snapshot_every = snapshot_every
+        self.max_feed = max(1, int(max_feed))
+
+        self._lock = threading.Lock()
+        self._reset()
+
+        # False khi snapshot / journal hỏng: chỉ đọc, không ghi đè dữ liệu trên đĩa
+        self.healthy = True
+        os.makedirs(state_dir, exist_ok=True)
+        self._load()
+
+    def _reset(self):
+        self._items: Dict[str, Dict] = {}
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._feeds: Dict[str, deque] = {}
+        # embedding_model -> (ID watchlist, ma trận JD đã chuẩn hóa), dựng lại khi thay đổi
+        self._matrices: Optional[Dict[str, Tuple[List[str], np.ndarray]]] = None
+        self._journal_ops = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    # ------------------------------------------------------------
+    # Watchlists
+    # ------------------------------------------------------------
+    def create(
+        self,
+        name: str,
+        jd_text: str,
+        embedding,
+        embedding_model: Optional[str],
+        min_exp: int = 0,
+        required_skills: Optional[List[str]] = None,
+        threshold: float = 0.5
+    ) -> Dict:
+        """
+        Lưu một JD để theo dõi ứng viên mới
+
+        Returns:
+            Dict: Thông tin watchlist (không kèm embedding)
+        """
+        item = {
+            "id": str(uuid.uuid4()),
+            "name": name,
+            "jd_text": jd_text,
+            "min_exp": int(min_exp or 0),
+            "required_skills": sorted({s.strip().lower() for s in required_skills or [] if s and s.strip()}),
+            "threshold": float(threshold),
+            "embedding_model": embedding_model,
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "last_seq": 0,
+            "total_matches": 0
+        }
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._require_healthy()
+            self._apply_create(item, vector)
+            self._append_journal({"op": "create", "item": item, "vector": _encode_vector(vector)})
+            return self._public(item)
+
+    def delete(self, watchlist_id: str) -> bool:
+        with self._lock:
+            self._require_healthy()
+            if watchlist_id not in self._items:
+                return False
+            self._apply_delete(watchlist_id)
+            self._append_journal({"op": "delete", "id": watchlist_id})
+            return True
+
+    def set_embedding(self, watchlist_id: str, embedding, embedding_model: str):
+        """
+        Thay embedding của JD (sau re-index sang model khác)
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._require_healthy()
+            if watchlist_id not in self._items:
+                raise WatchlistNotFound(watchlist_id)
+            self._apply_embedding(watchlist_id, vector, embedding_model)
+            self._append_journal({"op": "embed", "id": watchlist_id, "vector": _encode_vector(vector), "model": embedding_model})
+
+    def get(self, watchlist_id: str) -> Dict:
+        with self._lock:
+            item = self._items.get(watchlist_id)
+            if item is None:
+                raise WatchlistNotFound(watchlist_id)
+            return self._public(item)
+
+    def list_all(self) -> List[Dict]:
+        with self._lock:
+            return [self._public(item) for item in self._items.values()]
+
+    def stale(self, embedding_model: Optional[str]) -> List[Dict]:
+        """
+        Watchlist có embedding tạo bằng model khác `embedding_model` (cần embed lại)
+        """
+        with self._lock:
+            return [dict(item) for item in self._items.values() if item["embedding_model"] != embedding_model]
+
+    def _require_healthy(self):
+        if not self.healthy:
+            raise WatchlistsUnavailable(
+                f"Dữ liệu watchlist bị lỗi ({self.state_dir}), chỉ đọc cho tới khi khôi phục thủ công"
+            )
+
+    def _public(self, item: Dict) -> Dict:
+        return {**item, "feed_size": len(self._feeds.get(item["id"], ()))}
+
+    # ------------------------------------------------------------
+    # Reverse search
+    # ------------------------------------------------------------
+    def _matrix_for(self, embedding_model: Optional[str]) -> Tuple[List[str], Optional[np.ndarray]]:
+        if self._matrices is None:
+            groups: Dict[Optional[str], List[str]] = {}
+            for watchlist_id, item in self._items.items():
+                groups.setdefault(item["embedding_model"], []).append(watchlist_id)
+            self._matrices = {
+                model: (ids, _normalize(np.stack([self._vectors[i] for i in ids])))
+                for model, ids in groups.items()
+            }
+        return self._matrices.get(embedding_model, ([], None))
+
+    def match(self, candidates: List[Tuple[str, List[float], Dict]], embedding_model: Optional[str]) -> Dict[str, List[str]]:
+        """
+        Chấm một lô ứng viên vừa lưu với mọi watchlist cùng model embedding
+
+        Args:
+            candidates: (candidate_id, embedding, metadata) của từng ứng viên
+            embedding_model: Model đã tạo các embedding
+
+        Returns:
+            Dict: candidate_id -> danh sách ID watchlist đã khớp
+        """
+        if not candidates or not self.healthy:
+            return {}
+
+        with self._lock:
+            ids, matrix = self._matrix_for(embedding_model)
+            if matrix is None:
+                return {}
+
+            vectors = np.asarray([c[1] for c in candidates], dtype=np.float32)
+            if vectors.shape[1] != matrix.shape[1]:
+                return {}
+            # (số watchlist x số ứng viên) cosine trong một lần nhân ma trận
+            scores = matrix @ _normalize(vectors).T
+            thresholds = np.array([self._items[i]["threshold"] for i in ids], dtype=np.float32)
+            min_exp = np.array([self._items[i]["min_exp"] for i in ids])
+            years = np.array([int(c[2].get("years_exp") or 0) for c in candidates])
+            passed = (scores >= thresholds[:, None]) & (years[None, :] >= min_exp[:, None])
+
+            matched: Dict[str, List[str]] = {}
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            for row, col in zip(*np.nonzero(passed)):
+                item = self._items[ids[row]]
+                candidate_id, _, metadata = candidates[col]
+                skills = {s.strip().lower() for s in str(metadata.get("skills_list") or "").split(",") if s.strip()}
+                if not set(item["required_skills"]) <= skills:
+                    continue
+
+                entry = {
+                    "seq": item["last_seq"] + 1,
+                    "candidate_id": candidate_id,
+                    "score": round(float(scores[row, col]), 4),
+                    "full_name": metadata.get("full_name"),
+                    "role": metadata.get("role"),
+                    "years_exp": metadata.get("years_exp"),
+                    "skills": sorted(skills),
+                    "matched_at": now
+                }
+                self._apply_match(item["id"], entry)
+                self._append_journal({"op": "match", "id": item["id"], "entry": entry})
+                matched.setdefault(candidate_id, []).append(item["id"])
+            return matched
+
+    def remove_candidate(self, candidate_id: str) -> int:
+        """
+        Bỏ ứng viên (đã xóa / đã thay bằng phiên bản mới) khỏi mọi feed
+
+        Returns:
+            int: Số mục feed đã bỏ
+        """
+        if not self.healthy:
+            return 0
+        with self._lock:
+            removed = self._apply_drop(candidate_id)
+            if removed:
+                self._append_journal({"op": "drop", "candidate_id": candidate_id})
+            return removed
+
+    def feed(self, watchlist_id: str, since: int = 0, limit: int = 50) -> Dict:
+        """
+        Ứng viên mới khớp JD kể từ `since` (seq cuối client đã xem), cũ trước
+
+        Returns:
+            Dict: {"watchlist", "entries", "next_since", "has_more"}
+        """
+        with self._lock:
+            item = self._items.get(watchlist_id)
+            if item is None:
+                raise WatchlistNotFound(watchlist_id)
+            newer = [e for e in self._feeds[watchlist_id] if e["seq"] > since]
+            entries = newer[:max(1, limit)]
+            return {
+                "watchlist": self._public(item),
+                "entries": entries,
+                "next_since": entries[-1]["seq"] if entries else since,
+                "has_more": len(newer) > len(entries)
+            }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "watchlists": len(self._items),
+                "feed_entries": sum(len(f) for f in self._feeds.values()),
+                "models": sorted({str(i["embedding_model"]) for i in self._items.values()}),
+                "healthy": self.healthy
+            }
+
+    # ------------------------------------------------------------
+    # Apply (dùng chung cho thao tác mới và replay journal)
+    # ------------------------------------------------------------
+    def _apply_create(self, item: Dict, vector: np.ndarray):
+        self._items[item["id"]] = item
+        self._vectors[item["id"]] = vector
+        self._feeds[item["id"]] = deque(maxlen=self.max_feed)
+        self._matrices = None
+
+    def _apply_delete(self, watchlist_id: str):
+        self._items.pop(watchlist_id, None)
+        self._vectors.pop(watchlist_id, None)
+        self._feeds.pop(watchlist_id, None)
+        self._matrices = None
+
+    def _apply_embedding(self, watchlist_id: str, vector: np.ndarray, embedding_model: str):
+        self._vectors[watchlist_id] = vector
+        self._items[watchlist_id]["embedding_model"] = embedding_model
+        self._matrices = None
+
+    def _apply_match(self, watchlist_id: str, entry: Dict):
+        feed = self._feeds[watchlist_id]
+        # Ứng viên được merge (cùng ID) khớp lại -> chỉ giữ mục mới nhất
+        if any(e["candidate_id"] == entry["candidate_id"] for e in feed):
+            self._feeds[watchlist_id] = feed = deque(
+                (e for e in feed if e["candidate_id"] != entry["candidate_id"]), maxlen=self.max_feed
+            )
+        feed.append(entry)
+        item = self._items[watchlist_id]
+        item["last_seq"] = entry["seq"]
+        item["total_matches"] += 1
+
+    def _apply_drop(self, candidate_id: str) -> int:
+        removed = 0
+        for watchlist_id, feed in self._feeds.items():
+            kept = [e for e in feed if e["candidate_id"] != candidate_id]
+            if len(kept) != len(feed):
+                removed += len(feed) - len(kept)
+                self._feeds[watchlist_id] = deque(kept, maxlen=self.max_feed)
+        return removed
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+    def _append_journal(self, entry: Dict):
+        try:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._journal_ops += 1
+
+            if self._journal_ops >= self.snapshot_every:
+                self._snapshot()
+        except Exception as e:
+            print(f"⚠️ Lỗi khi ghi journal watchlist: {e}")
+
+    def _snapshot(self):
+        if not self.healthy:
+            # Trạng thái trong bộ nhớ chỉ là phần đọc được: không ghi đè bản trên đĩa
+            return
+        state = {
+            "watchlists": [
+                {"item": item, "vector": _encode_vector(self._vectors[watchlist_id]), "feed": list(self._feeds[watchlist_id])}
+                for watchlist_id, item in self._items.items()
+            ]
+        }
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, self.snapshot_path)
+
+        open(self.journal_path, "w").close()
+        self._journal_ops = 0
+
+    def _load(self):
+        try:
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                for saved in state["watchlists"]:
+                    self._apply_create(saved["item"], _decode_vector(saved["vector"]))
+                    self._feeds[saved["item"]["id"]].extend(saved["feed"])
+
+            if os.path.exists(self.journal_path):
+                self._replay_journal()
+        except Exception as e:
+            # Giữ phần đã đọc được; snapshot / journal không bị ghi đè (xem _snapshot)
+            print(f"⚠️ Watchlist bị lỗi, chỉ đọc cho tới khi khôi phục thủ công: {e}")
+            self._matrices = None
+            self.healthy = False
+
+    def _replay_journal(self):
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            lines = [line for line in f.read().split("\n") if line.strip()]
+
+        for i, line in enumerate(lines):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                if i != len(lines) - 1:
+                    raise
+                # Dòng cuối ghi dở (crash khi đang ghi journal): bỏ và cắt khỏi file,
+                # nếu không dòng ghi tiếp theo sẽ bị nối vào sau nó
+                print("⚠️ Bỏ dòng cuối ghi dở của journal watchlist")
+                tmp = self.journal_path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.writelines(kept + "\n" for kept in lines[:i])
+                os.replace(tmp, self.journal_path)
+                break
+            self._replay(entry)
+            self._journal_ops += 1
+
+    def _replay(self, entry: Dict):
+        op = entry["op"]
+        if op == "create":
+            self._apply_create(entry["item"], _decode_vector(entry["vector"]))
+        elif op == "delete":
+            self._apply_delete(entry["id"])
+        elif op == "embed" and entry["id"] in self._items:
+            self._apply_embedding(entry["id"], _decode_vector(entry["vector"]), entry["model"])
+        elif op == "match" and entry["id"] in self._items:
+            self._apply_match(entry["id"], entry["entry"])
+        elif op == "drop":
+            self._apply_drop(entry["candidate_id"])
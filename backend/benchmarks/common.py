@@ -0,0 +1,87 @@
+"""
+Tiện ích dùng chung cho các benchmark vector search.
+
+Chạy từ thư mục backend, ví dụ:
+    python -m benchmarks.vector_backends --n 100000
+"""
+import time
+from typing import List, Tuple, Optional
+
+import numpy as np
+
+
+def synthetic_embeddings(n: int, dim: int = 384, n_clusters: int = 64, seed: int = 0) -> np.ndarray:
+    """
+    Sinh embedding giả lập dạng cụm (giống phân bố CV theo nhóm vai trò), đã chuẩn hóa L2
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, size=n)
+    vectors = centers[labels] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def load_embeddings(path: str) -> np.ndarray:
+    """
+    Đọc embedding đã export (.npy), chuẩn hóa L2
+    """
+    vectors = np.load(path).astype(np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def split_queries(vectors: np.ndarray, n_queries: int, seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tạo query bằng cách làm nhiễu một số vector trong tập (giống JD gần CV)
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=n_queries, replace=False)
+    queries = vectors[picks] + 0.3 * rng.normal(size=(n_queries, vectors.shape[1])).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True), picks
+
+
+def exact_topk(vectors: np.ndarray, queries: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Ground truth top-k theo cosine (trả về chỉ số hàng)
+    """
+    sims = queries @ vectors.T
+    if mask is not None:
+        sims[:, ~mask] = -np.inf
+    part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(sims, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def recall_at_k(found: List[List[int]], truth: np.ndarray) -> float:
+    hits = 0
+    for got, expected in zip(found, truth):
+        hits += len(set(got) & set(expected.tolist()))
+    return hits / truth.size
+
+
+def percentile_ms(latencies: List[float], q: float) -> float:
+    return float(np.percentile(np.asarray(latencies) * 1000, q))
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def print_table(rows: List[dict]):
+    if not rows:
+        return
+    headers = list(rows[0].keys())
+    widths = [max(len(h), *(len(_fmt(r[h])) for r in rows)) for h in headers]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    for r in rows:
+        print("  ".join(_fmt(r[h]).ljust(w) for h, w in zip(headers, widths)))
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.4f}" if value < 10 else f"{value:.1f}"
+    return str(value)
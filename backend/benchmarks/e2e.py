@@ -0,0 +1,256 @@
+"""
+Benchmark end-to-end /api/candidates và /api/search với CV giả lập và LLM
+giả lập (benchmarks.fake_provider), chạy app trong cùng tiến trình qua
+httpx ASGITransport trên một thư mục dữ liệu tạm.
+
+Báo cáo throughput, latency p50/p95/p99 và RSS (của cả tiến trình benchmark,
+gồm app + client) sau mỗi pha. Lưu baseline rồi so sánh ở lần chạy sau để
+phát hiện regression (exit code 1).
+
+Ví dụ:
+    python -m benchmarks.e2e --cvs 200 --searches 500 --concurrency 4
+    python -m benchmarks.e2e --llm-latency-ms 800 --save-baseline benchmarks/e2e_baseline.json
+    python -m benchmarks.e2e --baseline benchmarks/e2e_baseline.json --tolerance 0.15
+
+Lưu ý: các stage executor có giới hạn hàng đợi (block `concurrency` trong
+config.yaml); concurrency vượt quá sẽ nhận 503 và được tính vào cột rejected.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import resource
+import shutil
+import tempfile
+from collections import Counter
+
+import yaml
+
+from benchmarks.common import percentile_ms, print_table
+from benchmarks.synthetic import synthetic_cv, synthetic_jd, make_pdf
+from benchmarks import fake_provider
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(BACKEND_DIR, "app", "services", "config.yaml")
+
+
+def rss_mb() -> dict:
+    """
+    RSS hiện tại và đỉnh (MB) của tiến trình benchmark
+    """
+    current = peak = None
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) / 1024
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if peak is None:
+        # ru_maxrss: KB trên Linux, byte trên macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return {"rss_mb": current if current is not None else peak, "peak_rss_mb": peak}
+
+
+def prepare_workdir(workdir: str, args) -> None:
+    """
+    Thư mục chạy tạm: config.yaml chỉ bật fake provider, dữ liệu ghi vào ./data
+    """
+    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+
+    config["providers"] = {
+        fake_provider.PROVIDER_NAME: fake_provider.provider_config(
+            latency_ms=args.llm_latency_ms,
+            jitter_ms=args.llm_jitter_ms,
+            failure_rate=args.llm_failure_rate,
+            seed=args.seed
+        )
+    }
+    config.setdefault("search_cache", {})["enabled"] = not args.no_search_cache
+    if args.mode == "sections":
+        config.setdefault("vector_store", {}).setdefault("sections", {})["enabled"] = True
+
+    os.makedirs(os.path.join(workdir, "app", "services"), exist_ok=True)
+    with open(os.path.join(workdir, "app", "services", "config.yaml"), "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f, allow_unicode=True, sort_keys=False)
+
+
+async def drive(name: str, requests, concurrency: int, send) -> dict:
+    """
+    Chạy `send(payload)` cho mọi payload với tối đa `concurrency` request đồng thời
+    """
+    latencies, statuses = [], []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(payload):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                status = (await send(payload)).status_code
+            except Exception as e:
+                print(f"⚠️ {name}: {e}")
+                status = 0
+            latencies.append(time.perf_counter() - start)
+            statuses.append(status)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(p) for p in requests))
+    wall = time.perf_counter() - started
+
+    ok = [lat for lat, status in zip(latencies, statuses) if 200 <= status < 300]
+    rejected = sum(1 for s in statuses if s in (429, 503))
+    failed = Counter(s for s in statuses if not 200 <= s < 300)
+    if failed:
+        print(f"⚠️ {name}: mã lỗi {dict(failed)}")
+    return {
+        "phase": name,
+        "requests": len(statuses),
+        "ok": len(ok),
+        "rejected": rejected,
+        "errors": len(statuses) - len(ok) - rejected,
+        "wall_s": wall,
+        "throughput_rps": len(ok) / wall if wall > 0 else 0.0,
+        "p50_ms": percentile_ms(ok, 50) if ok else 0.0,
+        "p95_ms": percentile_ms(ok, 95) if ok else 0.0,
+        "p99_ms": percentile_ms(ok, 99) if ok else 0.0,
+        **rss_mb()
+    }
+
+
+async def run(args) -> list:
+    import httpx
+    import app.main as main
+
+    rng = random.Random(args.seed)
+    cvs = [(f"cv_{i}.pdf", make_pdf(synthetic_cv(i, rng))) for i in range(args.cvs)]
+    jds = [synthetic_jd(rng) for _ in range(args.jds or args.searches)]
+    searches = [jds[i % len(jds)] for i in range(args.searches)]
+
+    await main.startup_event()
+    rows = [{"phase": "startup", "requests": 0, "ok": 0, "rejected": 0, "errors": 0, "wall_s": 0.0,
+             "throughput_rps": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, **rss_mb()}]
+
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def upload(item):
+                filename, content = item
+                return await client.post("/api/candidates", files={"file": (filename, content, "application/pdf")})
+
+            async def search(item):
+                jd_text, min_exp = item
+                return await client.post("/api/search", data={
+                    "jd_text": jd_text,
+                    "min_exp": min_exp,
+                    "top_k": args.top_k,
+                    "mode": args.mode
+                })
+
+            print(f"📤 Upload {len(cvs)} CV, concurrency={args.concurrency}")
+            rows.append(await drive("upload", cvs, args.concurrency, upload))
+
+            print(f"🔎 Search {len(searches)} JD ({args.mode}), concurrency={args.search_concurrency or args.concurrency}")
+            rows.append(await drive("search", searches, args.search_concurrency or args.concurrency, search))
+    finally:
+        await main.shutdown_event()
+
+    return rows
+
+
+def compare(rows: list, baseline: dict, tolerance: float) -> list:
+    """
+    So sánh với baseline: throughput giảm hoặc p95 tăng quá `tolerance` là regression
+    """
+    regressions = []
+    base_rows = {r["phase"]: r for r in baseline.get("results", [])}
+    print(f"\n📏 So sánh với baseline ({baseline.get('created_at', '?')}), ngưỡng {tolerance:.0%}")
+    for row in rows:
+        base = base_rows.get(row["phase"])
+        if not base or not base.get("ok"):
+            continue
+        for metric, worse_if_higher in (("throughput_rps", False), ("p95_ms", True), ("peak_rss_mb", True)):
+            old, new = base.get(metric), row.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = change > tolerance if worse_if_higher else change < -tolerance
+            flag = "❌" if regressed else "✅"
+            print(f"  {flag} {row['phase']:<7} {metric:<15} {old:10.1f} -> {new:10.1f} ({change:+.1%})")
+            if regressed:
+                regressions.append(f"{row['phase']}.{metric}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cvs", type=int, default=100, help="Số CV upload")
+    parser.add_argument("--searches", type=int, default=300, help="Số request search")
+    parser.add_argument("--jds", type=int, default=0, help="Số JD khác nhau (mặc định = --searches, không trùng cache)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--search-concurrency", type=int, default=0, help="Mặc định = --concurrency")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--mode", default="vector", choices=["vector", "hybrid", "lexical", "sections"])
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--no-search-cache", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Thư mục dữ liệu (mặc định: thư mục tạm, xóa sau khi chạy)")
+    parser.add_argument("--save-baseline", help="Ghi kết quả thành baseline JSON")
+    parser.add_argument("--baseline", help="Baseline JSON để so sánh")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Ngưỡng regression (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="airecruiter-bench-")
+    save_path = os.path.abspath(args.save_baseline) if args.save_baseline else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    prepare_workdir(workdir, args)
+    fake_provider.install()
+
+    # app dùng đường dẫn tương đối (./data, ./app/services/config.yaml)
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        rows = asyncio.run(run(args))
+    finally:
+        os.chdir(cwd)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    print_table(rows)
+
+    params = {k: v for k, v in vars(args).items() if k not in ("workdir", "save_baseline", "baseline", "tolerance")}
+    if save_path:
+        with open(save_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "params": params,
+                "results": rows
+            }, f, ensure_ascii=False, indent=2)
+        print(f"💾 Đã lưu baseline: {save_path}")
+
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("params") != params:
+            print("⚠️ Tham số khác với baseline, kết quả so sánh có thể không tương đương")
+        regressions = compare(rows, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ Regression: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ Không có regression")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+LLM provider giả lập, tất định, đăng ký qua hook `_init_provider_<name>`
+của AIEngine: không cần OpenAI key hay model GGUF để đo upload.
+
+Trích xuất lại các trường từ CV do benchmarks.synthetic sinh ra và ngủ
+`latency_ms` (+/- `jitter_ms`) để mô phỏng thời gian gọi LLM. Cùng một CV
+luôn cho cùng kết quả và cùng độ trễ. Nhận CancelToken qua tham số `cancel`
+để dừng sớm khi request bị hủy (như callback dừng sinh token của GPT4All).
+
+Cấu hình (block providers.fake):
+    enabled: true
+    models: [{id: "fake-extractor"}]
+    latency_ms: 300
+    jitter_ms: 50
+    failure_rate: 0.0     # tỷ lệ trả về text không phải JSON (-> fallback regex)
+    seed: 0
+"""
+import re
+import json
+import time
+import random
+import hashlib
+from typing import Any, Dict, Optional
+
+from app.services.ai_engine import AIEngine
+
+PROVIDER_NAME = "fake"
+
+
+def provider_config(latency_ms: float = 300, jitter_ms: float = 50, failure_rate: float = 0.0, seed: int = 0) -> Dict:
+    return {
+        "enabled": True,
+        "models": [{"id": "fake-extractor"}],
+        "latency_ms": latency_ms,
+        "jitter_ms": jitter_ms,
+        "failure_rate": failure_rate,
+        "seed": seed,
+    }
+
+
+def _init_provider_fake(self: AIEngine, cfg: Dict[str, Any]) -> Dict[str, Any]:
+    latency = float(cfg.get("latency_ms", 300)) / 1000
+    jitter = float(cfg.get("jitter_ms", 0)) / 1000
+    failure_rate = float(cfg.get("failure_rate", 0.0))
+    seed = int(cfg.get("seed", 0))
+
+    def generate(prompt: str, model_id: Optional[str] = None, max_tokens: Optional[int] = None, cancel=None) -> str:
+        digest = hashlib.sha256(f"{seed}:{prompt}".encode("utf-8")).digest()
+        rng = random.Random(digest)
+
+        delay = latency + rng.uniform(-jitter, jitter)
+        if delay > 0:
+            if cancel is not None:
+                if cancel.wait(delay):
+                    return ""
+            else:
+                time.sleep(delay)
+
+        if rng.random() < failure_rate:
+            return "Xin lỗi, tôi không thể trích xuất CV này."
+        return json.dumps(extract_fields(prompt.split("CV TEXT:", 1)[-1]), ensure_ascii=False)
+
+    models = [m if isinstance(m, dict) else {"id": m} for m in cfg.get("models", [{"id": "fake-extractor"}])]
+    print(f"✔ Fake provider initialized ({latency * 1000:.0f}ms ± {jitter * 1000:.0f}ms)")
+    return {"models": models, "generate": generate}
+
+
+LABELS = ("Email", "Role", "Years of experience", "Skills", "Education", "Project", "Summary")
+
+
+def extract_fields(text: str) -> Dict[str, Any]:
+    """
+    Đọc lại các trường theo nhãn trong CV của benchmarks.synthetic (parser PDF
+    gộp khoảng trắng nên không dựa vào xuống dòng)
+    """
+    parts = re.split(rf"\b({'|'.join(LABELS)}):", text.strip())
+    name = parts[0].strip()
+    fields: Dict[str, list] = {}
+    for label, value in zip(parts[1::2], parts[2::2]):
+        fields.setdefault(label, []).append(value.strip())
+
+    def field(label: str) -> str:
+        return (fields.get(label) or [""])[0]
+
+    years = re.search(r"\d+", field("Years of experience"))
+    education = field("Education")
+    gpa = re.search(r"GPA\s*([\d.]+\d)", education)
+
+    projects = [
+        {
+            "name": project.split(" built with ")[0],
+            "description": project,
+            "score": int(hashlib.md5(project.encode("utf-8")).hexdigest(), 16) % 6 + 4
+        }
+        for project in fields.get("Project", [])
+    ]
+
+    return {
+        "full_name": name or "N/A",
+        "email": field("Email") or "N/A",
+        "role": field("Role") or "N/A",
+        "years_exp": int(years.group(0)) if years else 0,
+        "education": [{
+            "school": education.split(",")[0] if education else "",
+            "degree": "Bachelor",
+            "major": "Computer Science",
+            "gpa": float(gpa.group(1)) if gpa else None,
+            "time": ""
+        }],
+        "skills": [s.strip() for s in field("Skills").split(",") if s.strip()],
+        "projects": projects
+    }
+
+
+def install():
+    """
+    Gắn initializer vào AIEngine; gọi trước khi app khởi động
+    """
+    setattr(AIEngine, f"_init_provider_{PROVIDER_NAME}", _init_provider_fake)
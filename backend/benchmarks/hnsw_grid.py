@@ -0,0 +1,86 @@
+"""
+Benchmark tham số HNSW của Chroma: recall@k so với exact search,
+latency p50/p99 và thời gian build index trên một lưới tham số.
+
+Trong chromadb 0.4.x tham số HNSW cố định khi tạo collection, nên mỗi
+tổ hợp (M, construction_ef, search_ef) được build lại từ đầu.
+
+Ví dụ:
+    python -m benchmarks.hnsw_grid --n 50000 --M 8 16 32 --construction-ef 100 200 --search-ef 10 50 100
+    python -m benchmarks.hnsw_grid --embeddings exported.npy --csv hnsw_grid.csv
+"""
+import argparse
+import csv
+import itertools
+import tempfile
+
+import numpy as np
+
+from app.services.vector_backends import ChromaBackend
+from benchmarks.common import (
+    synthetic_embeddings, load_embeddings, split_queries, exact_topk,
+    recall_at_k, percentile_ms, print_table
+)
+from benchmarks.vector_backends import build_collection, run_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=50000, help="Số vector sinh giả lập")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--embeddings", help="File .npy embedding đã export (thay cho dữ liệu giả lập)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-exp", type=int, default=0, help="Bộ lọc years_exp >= min_exp")
+    parser.add_argument("--M", type=int, nargs="+", default=[16])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--csv", help="Ghi kết quả ra file CSV")
+    args = parser.parse_args()
+
+    vectors = load_embeddings(args.embeddings) if args.embeddings else synthetic_embeddings(args.n, args.dim)
+    years = np.random.default_rng(2).integers(0, 15, size=len(vectors))
+    queries, _ = split_queries(vectors, args.queries)
+    truth = exact_topk(vectors, queries, args.k, mask=years >= args.min_exp)
+
+    print(f"📊 {len(vectors)} vector x {vectors.shape[1]} chiều, {args.queries} query, k={args.k}")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = ChromaBackend(f"{tmp}/chroma")
+
+        for m, cef, sef in itertools.product(args.M, args.construction_ef, args.search_ef):
+            metadata = {
+                "hnsw:space": "cosine",
+                "hnsw:M": m,
+                "hnsw:construction_ef": cef,
+                "hnsw:search_ef": sef,
+            }
+            collection, build_s = build_collection(backend, vectors, years, metadata=metadata)
+            latencies, found = run_queries(collection, queries, args.k, args.min_exp)
+            backend.delete_collection("candidates")
+
+            row = {
+                "M": m,
+                "construction_ef": cef,
+                "search_ef": sef,
+                "build_s": build_s,
+                f"recall@{args.k}": recall_at_k(found, truth),
+                "p50_ms": percentile_ms(latencies, 50),
+                "p99_ms": percentile_ms(latencies, 99),
+            }
+            rows.append(row)
+            print(f"  M={m} construction_ef={cef} search_ef={sef}: recall={row[f'recall@{args.k}']:.4f}")
+
+    print_table(rows)
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"💾 Đã ghi kết quả: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark lưu vector lượng tử hóa trong NumPy backend: recall@k so với
+float32 (baseline), số byte mỗi vector, dung lượng đĩa và latency.
+
+Mỗi cấu hình là (dtype, rescore): rescore giữ thêm bản float32 trên đĩa và
+chỉ đọc nó cho shortlist n_results * rescore_overfetch.
+
+Ví dụ:
+    python -m benchmarks.quantization --n 100000 --k 10
+    python -m benchmarks.quantization --embeddings exported.npy --overfetch 2 4 8
+"""
+import os
+import argparse
+import tempfile
+
+import numpy as np
+
+from app.services.vector_backends import NumpyBackend
+from benchmarks.common import (
+    synthetic_embeddings, load_embeddings, split_queries, exact_topk,
+    recall_at_k, percentile_ms, print_table
+)
+from benchmarks.vector_backends import build_collection, run_queries
+
+
+def folder_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, f))
+        for root, _, files in os.walk(path)
+        for f in files
+        if f.endswith(".bin")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=50000, help="Số vector sinh giả lập")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--embeddings", help="File .npy embedding đã export (thay cho dữ liệu giả lập)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-exp", type=int, default=0, help="Bộ lọc years_exp >= min_exp")
+    parser.add_argument("--dtypes", nargs="+", default=["float16", "int8"])
+    parser.add_argument("--overfetch", type=int, nargs="+", default=[4], help="rescore_overfetch cần thử")
+    args = parser.parse_args()
+
+    vectors = load_embeddings(args.embeddings) if args.embeddings else synthetic_embeddings(args.n, args.dim)
+    years = np.random.default_rng(2).integers(0, 15, size=len(vectors))
+    queries, _ = split_queries(vectors, args.queries)
+    truth = exact_topk(vectors, queries, args.k, mask=years >= args.min_exp)
+
+    print(f"📊 {len(vectors)} vector x {vectors.shape[1]} chiều, {args.queries} query, k={args.k}")
+
+    configs = [("float32", False, 1)]
+    for dtype in args.dtypes:
+        configs.append((dtype, False, 1))
+        configs.extend((dtype, True, overfetch) for overfetch in args.overfetch)
+
+    rows = []
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for dtype, rescore, overfetch in configs:
+            label = f"{dtype}+rescore x{overfetch}" if rescore else dtype
+            path = os.path.join(tmp, label.replace(" ", "_").replace("+", "_"))
+            backend = NumpyBackend(path, dtype=dtype, rescore=rescore, rescore_overfetch=overfetch)
+
+            collection, build_s = build_collection(backend, vectors, years)
+            latencies, found = run_queries(collection, queries, args.k, args.min_exp)
+
+            scan_bytes = collection.dim * collection.dtype.itemsize + (4 if collection.quantized else 0)
+            row = {
+                "config": label,
+                "build_s": build_s,
+                f"recall@{args.k}": recall_at_k(found, truth),
+                "scan_B/vec": scan_bytes,
+                "disk_B/vec": collection.bytes_per_vector(),
+                "disk_MB": folder_size(path) / 2 ** 20,
+                "p50_ms": percentile_ms(latencies, 50),
+                "p99_ms": percentile_ms(latencies, 99),
+            }
+            if baseline is None:
+                baseline = row
+            row["scan_ratio"] = baseline["scan_B/vec"] / scan_bytes
+            row["recall_delta"] = row[f"recall@{args.k}"] - baseline[f"recall@{args.k}"]
+            rows.append(row)
+            collection.close()
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
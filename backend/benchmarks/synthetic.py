@@ -0,0 +1,93 @@
+"""
+Sinh CV (PDF) và JD giả lập cho benchmark end-to-end, không cần file thật.
+
+CV được viết theo bố cục cố định để fake provider (benchmarks.fake_provider)
+trích xuất lại được một cách tất định.
+"""
+import random
+from typing import List, Tuple
+
+FIRST_NAMES = ["Nguyen", "Tran", "Le", "Pham", "Hoang", "Vu", "Dang", "Bui", "Do", "Ngo"]
+MIDDLE_NAMES = ["Van", "Thi", "Minh", "Duc", "Thanh", "Quoc", "Ngoc", "Hai"]
+LAST_NAMES = ["An", "Binh", "Chau", "Dung", "Giang", "Hieu", "Khoa", "Linh", "Nam", "Phuong", "Quan", "Trang"]
+
+ROLES = {
+    "Backend Developer": ["python", "fastapi", "django", "postgresql", "redis", "docker", "kafka", "go"],
+    "Frontend Developer": ["javascript", "typescript", "react", "vue", "css", "html", "webpack", "nextjs"],
+    "Data Engineer": ["python", "spark", "airflow", "sql", "kafka", "aws", "dbt", "hadoop"],
+    "Machine Learning Engineer": ["python", "pytorch", "tensorflow", "scikit-learn", "mlflow", "docker", "numpy", "pandas"],
+    "DevOps Engineer": ["kubernetes", "docker", "terraform", "aws", "linux", "ansible", "prometheus", "ci/cd"],
+    "Mobile Developer": ["kotlin", "swift", "flutter", "react native", "firebase", "android", "ios", "dart"],
+}
+SCHOOLS = ["HUST", "UET", "PTIT", "HCMUT", "UIT", "FPT University", "NEU"]
+PROJECT_WORDS = ["platform", "pipeline", "dashboard", "service", "crawler", "recommender", "chatbot", "marketplace"]
+
+
+def synthetic_cv(index: int, rng: random.Random) -> List[str]:
+    """
+    Một CV giả lập (danh sách dòng, chỉ ký tự ASCII để dùng font PDF chuẩn)
+    """
+    role = rng.choice(list(ROLES))
+    skills = rng.sample(ROLES[role], k=rng.randint(3, 6))
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(MIDDLE_NAMES)} {rng.choice(LAST_NAMES)} {index}"
+    years = rng.randint(0, 12)
+    gpa = round(rng.uniform(2.5, 4.0), 2)
+
+    lines = [
+        name,
+        f"Email: candidate{index}@example.com",
+        f"Role: {role}",
+        f"Years of experience: {years}",
+        f"Skills: {', '.join(skills)}",
+        f"Education: {rng.choice(SCHOOLS)}, Bachelor of Computer Science, GPA {gpa}",
+    ]
+    for p in range(rng.randint(1, 3)):
+        tech = ", ".join(rng.sample(skills, k=min(2, len(skills))))
+        lines.append(f"Project: {rng.choice(PROJECT_WORDS)} {index}-{p} built with {tech}")
+    lines.append(f"Summary: {years} years working as {role.lower()} on production systems")
+    return lines
+
+
+def synthetic_jd(rng: random.Random) -> Tuple[str, int]:
+    """
+    Một JD giả lập và số năm kinh nghiệm tối thiểu tương ứng
+    """
+    role = rng.choice(list(ROLES))
+    skills = rng.sample(ROLES[role], k=3)
+    min_exp = rng.choice([0, 0, 1, 2, 3, 5])
+    text = (
+        f"We are hiring a {role} with at least {min_exp} years of experience. "
+        f"Required skills: {', '.join(skills)}. "
+        f"You will build and operate {rng.choice(PROJECT_WORDS)} systems."
+    )
+    return text, min_exp
+
+
+def make_pdf(lines: List[str]) -> bytes:
+    """
+    PDF một trang tối giản (font Helvetica chuẩn), đủ để pdfplumber đọc được
+    """
+    def escape(line: str) -> str:
+        return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    content = "BT /F1 11 Tf 50 780 Td 14 TL " + " ".join(f"({escape(l)}) Tj T*" for l in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        "/Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects):
+        offsets.append(len(out))
+        out += f"{i + 1} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF".encode()
+    return out
@@ -0,0 +1,91 @@
+"""
+So sánh recall / latency giữa Chroma (HNSW) và NumPy backend (exact search).
+
+Ví dụ:
+    python -m benchmarks.vector_backends --n 100000 --queries 200 --k 10
+    python -m benchmarks.vector_backends --embeddings exported.npy --dtypes float32 float16
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.vector_backends import ChromaBackend, NumpyBackend
+from benchmarks.common import (
+    synthetic_embeddings, load_embeddings, split_queries, exact_topk,
+    recall_at_k, percentile_ms, Timer, print_table
+)
+
+
+def build_collection(backend, vectors: np.ndarray, years: np.ndarray, batch_size: int = 5000, metadata=None):
+    collection = backend.get_or_create_collection("candidates", metadata=metadata or {"hnsw:space": "cosine"})
+    with Timer() as t:
+        for start in range(0, len(vectors), batch_size):
+            stop = min(start + batch_size, len(vectors))
+            collection.add(
+                ids=[str(i) for i in range(start, stop)],
+                embeddings=vectors[start:stop].tolist(),
+                metadatas=[{"years_exp": int(y)} for y in years[start:stop]]
+            )
+    return collection, t.elapsed
+
+
+def run_queries(collection, queries: np.ndarray, k: int, min_exp: int):
+    latencies, found = [], []
+    for q in queries:
+        start = time.perf_counter()
+        res = collection.query(
+            query_embeddings=[q.tolist()],
+            n_results=k,
+            where={"years_exp": {"$gte": min_exp}},
+            include=["distances"]
+        )
+        latencies.append(time.perf_counter() - start)
+        found.append([int(i) for i in res["ids"][0]])
+    return latencies, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=50000, help="Số vector sinh giả lập")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--embeddings", help="File .npy embedding đã export (thay cho dữ liệu giả lập)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-exp", type=int, default=0, help="Bộ lọc years_exp >= min_exp")
+    parser.add_argument("--dtypes", nargs="+", default=["float32", "float16"])
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    vectors = load_embeddings(args.embeddings) if args.embeddings else synthetic_embeddings(args.n, args.dim)
+    years = np.random.default_rng(2).integers(0, 15, size=len(vectors))
+    queries, _ = split_queries(vectors, args.queries)
+    truth = exact_topk(vectors, queries, args.k, mask=years >= args.min_exp)
+
+    print(f"📊 {len(vectors)} vector x {vectors.shape[1]} chiều, {args.queries} query, k={args.k}")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = []
+        if not args.skip_chroma:
+            backends.append(("chroma", ChromaBackend(f"{tmp}/chroma")))
+        for dtype in args.dtypes:
+            backends.append((f"numpy-{dtype}", NumpyBackend(f"{tmp}/numpy-{dtype}", dtype=dtype)))
+
+        for label, backend in backends:
+            collection, build_s = build_collection(backend, vectors, years)
+            latencies, found = run_queries(collection, queries, args.k, args.min_exp)
+            rows.append({
+                "backend": label,
+                "build_s": build_s,
+                f"recall@{args.k}": recall_at_k(found, truth),
+                "p50_ms": percentile_ms(latencies, 50),
+                "p99_ms": percentile_ms(latencies, 99),
+            })
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()